@@ -0,0 +1,460 @@
+"""
+Banco de dados local (SQLite) que substitui o SQL Server nos testes e benchmarks de extração.
+
+criar_banco_local gera as tabelas GV_* usadas pelas queries de vendas
+(querys/new e querys/templates) com dados sintéticos
+determinísticos. conectar devolve uma conexão com a interface do pyodbc usada
+pelo projeto (cursor, execute com marcadores '?', description, fetchmany,
+conversores de saída, rollback), de modo que executar_query,
+executar_query_para_parquet, a extração paralela e a incremental rodam sem
+alterações e sem acesso à produção.
+
+As queries são traduzidas do T-SQL apenas no necessário para essas queries
+(CONVERT de datas, CAST para texto, concatenação com '+' e GETDATE), e as
+funções BINARY_CHECKSUM e CHECKSUM_AGG da impressão digital das tabelas de
+origem são registradas na conexão com resultados equivalentes. Valores
+monetários são entregues como Decimal, ou passam pelos conversores de saída
+registrados para SQL_DECIMAL/SQL_NUMERIC, como no driver ODBC.
+"""
+
+import re
+import zlib
+import sqlite3
+from decimal import Decimal
+from datetime import date, datetime
+import numpy as np
+
+from benchmarks.dados_sinteticos import (
+    SEMENTE_PADRAO,
+    CENTROS,
+    COMBINACOES_SECAO_FAMILIA,
+    BAIRROS,
+    pesos_zipf,
+)
+
+# Códigos ODBC dos tipos numéricos exatos (iguais a pyodbc.SQL_NUMERIC e pyodbc.SQL_DECIMAL)
+SQL_NUMERIC = 2
+SQL_DECIMAL = 3
+
+QUANTIDADE_PRODUTOS = 3000
+QUANTIDADE_SUBFAMILIAS = 60
+
+# Combinações de produtos fora do relatório (descartadas pelo filtro da query)
+COMBINACOES_FORA_DO_RELATORIO = [
+    ('Farmacia', 'Medicamento', 25.0),
+    ('Clinica Medica', 'Vacina', 10.0),
+    ('Banho e Tosa', 'Estetica', 8.0),
+]
+
+# Tipo (Python, precisão, escala) informado em cursor.description para as colunas
+# de gv_vendas.sql; colunas não listadas têm o tipo inferido do primeiro registro
+TIPOS_COLUNAS = {
+    'Id': (int, 10, 0),
+    'IdCliente': (int, 10, 0),
+    'IdAnimal': (int, 10, 0),
+    'Quantidade': (Decimal, 19, 3),
+    'PrecoVenda': (Decimal, 19, 4),
+    'ValorVenda': (Decimal, 19, 4),
+    'PVP1': (Decimal, 19, 4),
+    'DescontoRS': (Decimal, 19, 4),
+    'ValorTotal': (Decimal, 19, 4),
+}
+
+ESQUEMA_TABELAS = """
+CREATE TABLE GV_Empresa (Id INTEGER PRIMARY KEY, sigla TEXT);
+CREATE TABLE GV_SeccaoProduto (Id INTEGER PRIMARY KEY, Descricao TEXT);
+CREATE TABLE GV_FamiliaProduto (Id INTEGER PRIMARY KEY, Descricao TEXT);
+CREATE TABLE GV_SubFamiliaProduto (Id INTEGER PRIMARY KEY, Descricao TEXT);
+CREATE TABLE GV_Produto (Numero INTEGER PRIMARY KEY, Codigo TEXT, Descricao TEXT,
+                         IdFamilia INTEGER, IdSeccao INTEGER, IdSubFamilia INTEGER);
+CREATE TABLE GV_ProdutoCentro (NumeroProduto INTEGER, IdCentro INTEGER, Pvp1 REAL, Pvp4 REAL,
+                               PRIMARY KEY (NumeroProduto, IdCentro));
+CREATE TABLE GV_Cliente (Numero INTEGER PRIMARY KEY, CEP TEXT, BairroMorada TEXT);
+CREATE TABLE GV_Animal (Numero INTEGER PRIMARY KEY);
+CREATE TABLE GV_CabecalhoDocumentoVenda (Id INTEGER PRIMARY KEY, Documento TEXT, Serie TEXT, Numero INTEGER,
+                                         Data TEXT, DataCriacao TEXT, NumeroCliente INTEGER, IdEmpresa INTEGER,
+                                         IdCentro INTEGER, Estado TEXT, NumeroAnimal INTEGER);
+CREATE TABLE GV_LinhaDocumentoVenda (Id INTEGER PRIMARY KEY, IdCabecalhoDocumentoVenda INTEGER, TipoLinha TEXT,
+                                     NumeroProduto INTEGER, Quantidade REAL, PV REAL, ValorTotal REAL,
+                                     SubTotalDescontos REAL, NumeroAnimal INTEGER, idlinhacarrinhovendas INTEGER);
+CREATE TABLE GV_LinhaCarrinhoVendas (id INTEGER PRIMARY KEY, DataCriacao TEXT);
+"""
+
+INDICES_TABELAS = """
+CREATE INDEX ix_linha_cabecalho ON GV_LinhaDocumentoVenda (IdCabecalhoDocumentoVenda);
+CREATE INDEX ix_cabecalho_data ON GV_CabecalhoDocumentoVenda (Data);
+CREATE INDEX ix_cabecalho_criacao ON GV_CabecalhoDocumentoVenda (DataCriacao);
+"""
+
+# Traduções de T-SQL para SQLite, aplicadas em ordem
+_TRADUCOES_TSQL = [
+    (re.compile(r"CONVERT\(\s*N?VARCHAR(?:\(\d+\))?\s*,\s*([\w.]+)\s*,\s*105\s*\)", re.IGNORECASE),
+     r"strftime('%d-%m-%Y', \1)"),
+    (re.compile(r"CONVERT\(\s*N?VARCHAR(?:\(\d+\))?\s*,\s*([\w.]+)\s*,\s*120\s*\)", re.IGNORECASE),
+     r"strftime('%Y-%m-%d %H:%M:%S', \1)"),
+    (re.compile(r"CAST\(\s*([\w.]+)\s+AS\s+N?VARCHAR(?:\(\d+\))?\s*\)", re.IGNORECASE), r"CAST(\1 AS TEXT)"),
+    (re.compile(r"GETDATE\(\)", re.IGNORECASE), "datetime('now', 'localtime')"),
+    # '+' ao lado de um literal de texto é concatenação
+    (re.compile(r"\s*\+\s*(?=')|(?<=')\s*\+\s*"), " || "),
+]
+
+def traduzir_tsql(query):
+    """
+    Traduz as construções T-SQL das queries de vendas para SQLite.
+
+    Args:
+        query (str): Query no dialeto do SQL Server.
+
+    Returns:
+        str: Query equivalente para o SQLite.
+    """
+    for padrao, substituicao in _TRADUCOES_TSQL:
+        query = padrao.sub(substituicao, query)
+    return query
+
+def _parametro_sqlite(valor):
+    """Converte datas e Decimal em valores aceitos pelo SQLite (datas em texto ISO)."""
+    if isinstance(valor, datetime):
+        return valor.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(valor, date):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return float(valor)
+    return valor
+
+class CursorLocal:
+    """
+    Cursor com a interface do pyodbc.Cursor sobre um cursor do SQLite.
+    """
+
+    def __init__(self, conexao):
+        """
+        Args:
+            conexao (ConexaoLocal): Conexão de origem (fornece os conversores de saída).
+        """
+        self._conexao = conexao
+        self._cursor = conexao._conn.cursor()
+        self._pendente = None
+        self._conversores_colunas = []
+        self.description = None
+        self.rowcount = -1
+
+    def execute(self, query, *parametros):
+        """
+        Executa uma query com marcadores '?'. Os parâmetros podem ser passados
+        em uma sequência ou como argumentos, como no pyodbc.
+
+        Returns:
+            CursorLocal: O próprio cursor.
+        """
+        if len(parametros) == 1 and isinstance(parametros[0], (list, tuple)):
+            parametros = parametros[0]
+        self._cursor.execute(traduzir_tsql(query), [_parametro_sqlite(valor) for valor in parametros])
+        self._pendente = None
+        self.description = None
+        self.rowcount = self._cursor.rowcount
+        if self._cursor.description is None:
+            return self
+
+        # O tipo das colunas sem tipo conhecido é inferido do primeiro registro
+        primeiro = self._cursor.fetchone()
+        self._pendente = [primeiro] if primeiro is not None else []
+        self.description = []
+        for indice, coluna in enumerate(self._cursor.description):
+            nome = coluna[0]
+            if nome in TIPOS_COLUNAS:
+                tipo, precisao, escala = TIPOS_COLUNAS[nome]
+            else:
+                valor = primeiro[indice] if primeiro is not None else None
+                tipo = type(valor) if valor is not None else str
+                precisao, escala = {int: (10, 0), float: (53, None)}.get(tipo, (None, None))
+            self.description.append((nome, tipo, None, None, precisao, escala, True))
+        self._conversores_colunas = self._montar_conversores()
+        return self
+
+    def _montar_conversores(self):
+        """
+        Monta a conversão de cada coluna DECIMAL: conversor de saída registrado
+        (recebe o valor em texto, em bytes) ou Decimal com a escala da coluna.
+
+        Returns:
+            list: Tuplas (índice, função) das colunas convertidas.
+        """
+        conversor = (self._conexao._conversores.get(SQL_DECIMAL)
+                     or self._conexao._conversores.get(SQL_NUMERIC))
+        conversores = []
+        for indice, (_, tipo, _, _, _, escala, _) in enumerate(self.description):
+            if tipo is not Decimal:
+                continue
+            formato = f"{{:.{escala}f}}"
+            if conversor is not None:
+                funcao = lambda valor, formato=formato: conversor(formato.format(valor).encode('ascii'))
+            else:
+                funcao = lambda valor, formato=formato: Decimal(formato.format(valor))
+            conversores.append((indice, funcao))
+        return conversores
+
+    def _converter(self, linhas):
+        """Aplica os conversores das colunas DECIMAL às linhas lidas do SQLite."""
+        if not self._conversores_colunas:
+            return linhas
+        convertidas = []
+        for linha in linhas:
+            linha = list(linha)
+            for indice, funcao in self._conversores_colunas:
+                if linha[indice] is not None:
+                    linha[indice] = funcao(linha[indice])
+            convertidas.append(tuple(linha))
+        return convertidas
+
+    def fetchmany(self, quantidade=1):
+        """Retorna até quantidade registros (lista vazia ao final)."""
+        linhas = []
+        if self._pendente:
+            linhas, self._pendente = self._pendente, []
+        if quantidade > len(linhas):
+            linhas += self._cursor.fetchmany(quantidade - len(linhas))
+        return self._converter(linhas)
+
+    def fetchone(self):
+        """Retorna o próximo registro, ou None ao final."""
+        linhas = self.fetchmany(1)
+        return linhas[0] if linhas else None
+
+    def fetchall(self):
+        """Retorna todos os registros restantes."""
+        linhas = self._pendente or []
+        self._pendente = []
+        return self._converter(linhas + self._cursor.fetchall())
+
+    def __iter__(self):
+        linha = self.fetchone()
+        while linha is not None:
+            yield linha
+            linha = self.fetchone()
+
+    def close(self):
+        """Fecha o cursor."""
+        self._cursor.close()
+
+def _inteiro_32_bits(valor):
+    """Interpreta os 32 bits menos significativos como inteiro com sinal (como o INT do SQL Server)."""
+    valor &= 0xFFFFFFFF
+    return valor - (1 << 32) if valor >= (1 << 31) else valor
+
+def _binary_checksum(*valores):
+    """Equivalente local de BINARY_CHECKSUM: hash de 32 bits dos valores da linha."""
+    return _inteiro_32_bits(zlib.crc32(repr(valores).encode('utf-8')))
+
+class _ChecksumAgg:
+    """Equivalente local de CHECKSUM_AGG: combinação por XOR dos valores não nulos."""
+
+    def __init__(self):
+        self._valor = 0
+
+    def step(self, valor):
+        if valor is not None:
+            self._valor ^= int(valor)
+
+    def finalize(self):
+        return _inteiro_32_bits(self._valor)
+
+class ConexaoLocal:
+    """
+    Conexão com a interface do pyodbc.Connection sobre um banco SQLite.
+    """
+
+    def __init__(self, caminho):
+        """
+        Args:
+            caminho (pathlib.Path ou str): Arquivo do banco criado por criar_banco_local.
+        """
+        # Os shards da extração paralela usam a conexão em threads do executor
+        self._conn = sqlite3.connect(str(caminho), check_same_thread=False)
+        self._conn.create_function('BINARY_CHECKSUM', -1, _binary_checksum, deterministic=True)
+        self._conn.create_aggregate('CHECKSUM_AGG', 1, _ChecksumAgg)
+        self._conversores = {}
+
+    def cursor(self):
+        """Cria um cursor."""
+        return CursorLocal(self)
+
+    def add_output_converter(self, tipo_sql, funcao):
+        """Registra um conversor de saída para um tipo SQL (ex.: SQL_DECIMAL)."""
+        self._conversores[tipo_sql] = funcao
+
+    def clear_output_converters(self):
+        """Remove os conversores de saída registrados."""
+        self._conversores.clear()
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        self._conn.close()
+
+def conectar(caminho):
+    """
+    Abre uma conexão com o banco local. Pode ser usada como fabrica_conexao
+    (ex.: functools.partial(conectar, caminho)).
+
+    Args:
+        caminho (pathlib.Path ou str): Arquivo do banco criado por criar_banco_local.
+
+    Returns:
+        ConexaoLocal: Conexão com o banco local.
+    """
+    return ConexaoLocal(caminho)
+
+def usar_banco_local(caminho):
+    """
+    Faz o pool compartilhado de data_access abrir conexões com o banco local,
+    para executar buscar_dados_vendas, a extração incremental e as demais
+    funções do projeto sem acesso à produção.
+
+    Args:
+        caminho (pathlib.Path ou str): Arquivo do banco criado por criar_banco_local.
+
+    Returns:
+        PoolConexoes: Pool compartilhado já redirecionado.
+    """
+    from src.data_access import obter_pool
+
+    pool = obter_pool()
+    pool.fechar()
+    pool.fabrica_conexao = lambda: conectar(caminho)
+    return pool
+
+def _datas_texto(segundos, unidade='s'):
+    """Converte segundos desde a época em textos 'AAAA-MM-DD HH:MM:SS' (ou 'AAAA-MM-DD' com unidade 'D')."""
+    textos = np.datetime_as_string(segundos.astype('datetime64[s]').astype(f'datetime64[{unidade}]'), unit=unidade)
+    return np.char.replace(textos, 'T', ' ').tolist()
+
+def _com_nulos(valores, nulos):
+    """Converte um array numpy em lista Python com None nas posições indicadas."""
+    lista = valores.tolist()
+    for indice in np.flatnonzero(nulos).tolist():
+        lista[indice] = None
+    return lista
+
+def criar_banco_local(caminho, linhas=200000, semente=SEMENTE_PADRAO,
+                      data_inicio='2023-01-01', data_fim='2025-06-30'):
+    """
+    Cria um banco SQLite com as tabelas GV_* preenchidas com dados sintéticos.
+
+    Cada documento (GV_CabecalhoDocumentoVenda) tem em média duas linhas. Uma
+    parte dos documentos é cancelada ou não é fatura, uma parte das linhas não
+    é de produto e uma parte dos produtos não pertence às seções e famílias do
+    relatório, de modo que os filtros da query descartam registros como em
+    produção.
+
+    Args:
+        caminho (pathlib.Path ou str): Arquivo do banco (não pode existir).
+        linhas (int): Quantidade de linhas de documento (GV_LinhaDocumentoVenda).
+        semente (int): Semente do gerador (mesma semente, mesmos dados).
+        data_inicio (str): Primeira data dos documentos.
+        data_fim (str): Última data dos documentos.
+
+    Returns:
+        pathlib.Path ou str: Caminho do banco criado.
+    """
+    rng = np.random.default_rng(semente)
+    conn = sqlite3.connect(str(caminho))
+    try:
+        conn.executescript(ESQUEMA_TABELAS)
+
+        conn.executemany("INSERT INTO GV_Empresa VALUES (?, ?)",
+                         [(indice + 1, sigla) for indice, sigla in enumerate(CENTROS)])
+
+        # Seções e famílias (inclusive descrições com espaços nas extremidades)
+        combinacoes = COMBINACOES_SECAO_FAMILIA + COMBINACOES_FORA_DO_RELATORIO
+        secoes = sorted({secao for secao, _, _ in combinacoes if secao is not None})
+        familias = sorted({familia for _, familia, _ in combinacoes if familia is not None})
+        id_secao = {secao: indice + 1 for indice, secao in enumerate(secoes)}
+        id_familia = {familia: indice + 1 for indice, familia in enumerate(familias)}
+        conn.executemany("INSERT INTO GV_SeccaoProduto VALUES (?, ?)", [(i, s) for s, i in id_secao.items()])
+        conn.executemany("INSERT INTO GV_FamiliaProduto VALUES (?, ?)", [(i, f) for f, i in id_familia.items()])
+        conn.executemany("INSERT INTO GV_SubFamiliaProduto VALUES (?, ?)",
+                         [(indice + 1, f"Subfamilia {indice}") for indice in range(QUANTIDADE_SUBFAMILIAS)])
+
+        # Produtos: cada um com uma combinação de seção e família
+        pesos = np.array([peso for _, _, peso in combinacoes])
+        combinacao_produto = rng.choice(len(combinacoes), QUANTIDADE_PRODUTOS, p=pesos / pesos.sum())
+        clube = rng.random(QUANTIDADE_PRODUTOS) < 0.02
+        produtos = []
+        for numero in range(1, QUANTIDADE_PRODUTOS + 1):
+            secao, familia, _ = combinacoes[combinacao_produto[numero - 1]]
+            descricao = f"Produto {numero}" + (" Clube" if clube[numero - 1] else "")
+            produtos.append((numero, f"P{numero}", descricao, id_familia.get(familia), id_secao.get(secao),
+                             numero % QUANTIDADE_SUBFAMILIAS + 1))
+        conn.executemany("INSERT INTO GV_Produto VALUES (?, ?, ?, ?, ?, ?)", produtos)
+
+        # Preço de cada produto em cada centro (Pvp4: preço do clube)
+        preco_base = np.round(rng.lognormal(5.0, 0.8, QUANTIDADE_PRODUTOS), 2)
+        fator_centro = rng.uniform(0.9, 1.2, len(CENTROS))
+        conn.executemany(
+            "INSERT INTO GV_ProdutoCentro VALUES (?, ?, ?, ?)",
+            [(numero + 1, centro + 1, round(float(preco_base[numero] * fator_centro[centro]), 2),
+              round(float(preco_base[numero] * fator_centro[centro] * 0.9), 2))
+             for numero in range(QUANTIDADE_PRODUTOS) for centro in range(len(CENTROS))]
+        )
+
+        # Clientes e animais
+        clientes = max(1000, linhas // 4)
+        bairros = np.array(BAIRROS, dtype=object)[rng.choice(len(BAIRROS), clientes, p=pesos_zipf(len(BAIRROS)))]
+        conn.executemany("INSERT INTO GV_Cliente VALUES (?, ?, ?)",
+                         zip(range(1, clientes + 1),
+                             rng.integers(1000000, 99999999, clientes).astype(str).tolist(), bairros.tolist()))
+        conn.executemany("INSERT INTO GV_Animal VALUES (?)", ((numero,) for numero in range(1, clientes * 3 + 1)))
+
+        # Documentos: volume crescente ao longo do período e centros com distribuição assimétrica
+        documentos = max(1, linhas // 2)
+        inicio = np.datetime64(data_inicio, 's').astype(np.int64)
+        fim = np.datetime64(data_fim, 's').astype(np.int64)
+        dia = (np.sqrt(rng.random(documentos)) * ((fim - inicio) // 86400)).astype(np.int64)
+        segundo_do_dia = np.clip(rng.normal(14 * 3600, 3 * 3600, documentos), 7 * 3600, 22 * 3600).astype(np.int64)
+        criacao = inicio + dia * 86400 + segundo_do_dia
+        centro = rng.choice(len(CENTROS), documentos, p=pesos_zipf(len(CENTROS), 0.8)) + 1
+        cliente = (rng.pareto(1.2, documentos) * 1000).astype(np.int64) % clientes + 1
+        animal = cliente * 3 - rng.integers(0, 3, documentos)
+        tipo_documento = np.where(rng.random(documentos) < 0.95, 'FAT', 'NC').astype(object)
+        estado = np.where(rng.random(documentos) < 0.02, 'A', 'F').astype(object)
+        conn.executemany(
+            "INSERT INTO GV_CabecalhoDocumentoVenda VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            zip(range(1, documentos + 1), tipo_documento.tolist(), ['A'] * documentos, range(1, documentos + 1),
+                _datas_texto(inicio + dia * 86400, 'D'), _datas_texto(criacao),
+                cliente.tolist(), centro.tolist(), centro.tolist(), estado.tolist(),
+                _com_nulos(animal, rng.random(documentos) < 0.3))
+        )
+
+        # Linhas dos documentos e do carrinho
+        documento_linha = np.sort(rng.integers(1, documentos + 1, linhas))
+        produto = rng.choice(QUANTIDADE_PRODUTOS, linhas, p=pesos_zipf(QUANTIDADE_PRODUTOS)) + 1
+        quantidade = np.where(rng.random(linhas) < 0.9, 1.0, rng.integers(2, 6, linhas).astype(float))
+        preco = np.round(preco_base[produto - 1] * rng.uniform(0.95, 1.05, linhas), 2)
+        desconto = np.where(rng.random(linhas) < 0.15, np.round(preco * rng.uniform(0.05, 0.2, linhas), 2), 0.0)
+        sem_carrinho = rng.random(linhas) < 0.1
+        conn.executemany(
+            "INSERT INTO GV_LinhaDocumentoVenda VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            zip(range(1, linhas + 1), documento_linha.tolist(),
+                np.where(rng.random(linhas) < 0.95, 'P', 'S').astype(object).tolist(),
+                produto.tolist(), quantidade.tolist(), preco.tolist(),
+                np.round(preco * quantidade - desconto, 2).tolist(), desconto.tolist(),
+                _com_nulos(cliente[documento_linha - 1] * 3, rng.random(linhas) < 0.5),
+                _com_nulos(np.arange(1, linhas + 1), sem_carrinho))
+        )
+        execucao = criacao[documento_linha - 1] + rng.integers(0, 3 * 3600, linhas)
+        conn.executemany(
+            "INSERT INTO GV_LinhaCarrinhoVendas VALUES (?, ?)",
+            zip(np.arange(1, linhas + 1)[~sem_carrinho].tolist(),
+                _datas_texto(execucao[~sem_carrinho]))
+        )
+
+        conn.executescript(INDICES_TABELAS)
+        conn.commit()
+    finally:
+        conn.close()
+    return caminho
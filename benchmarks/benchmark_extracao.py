@@ -0,0 +1,220 @@
+"""
+Benchmark da extração de vendas contra o banco local (SQLite), sem acesso à produção.
+
+Mede registros/s e pico de memória residente da leitura do resultado de
+querys/new/gv_vendas.sql no banco criado por benchmarks.banco_local, para cada
+combinação de tamanho de lote do fetchmany e estratégia de conversão:
+
+    somente_fetch   cursor.fetchmany sem montar resultado (custo do driver)
+    listas_float    executar_query com DECIMAL lido como float (padrão)
+    listas_decimal  executar_query com objetos Decimal
+    arrow_parquet   executar_query_para_parquet (colunas Arrow gravadas por lote)
+
+Uso (a partir da raiz do projeto):
+
+    python -m benchmarks.benchmark_extracao --linhas 500000 --tamanhos-lote 10000 50000 100000
+
+Por padrão o resultado da query é materializado uma vez em uma tabela do
+banco local e cada medida lê essa tabela, isolando o fetch e a conversão do
+tempo de execução dos joins no SQLite; --query-completa mede a query inteira.
+Os valores absolutos refletem o SQLite local, não o SQL Server; a comparação
+entre lotes e estratégias é o que orienta o ajuste da extração.
+"""
+
+import os
+import sys
+import json
+import time
+import pathlib
+import argparse
+import platform
+import sqlite3
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from datetime import datetime
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+
+from benchmarks.dados_sinteticos import SEMENTE_PADRAO
+from benchmarks.banco_local import criar_banco_local, conectar, traduzir_tsql
+from src.metrics import medir_etapa
+from src.data_access import executar_query, executar_query_para_parquet
+
+ESTRATEGIAS = ('somente_fetch', 'listas_float', 'listas_decimal', 'arrow_parquet')
+
+TAMANHOS_LOTE_PADRAO = [10000, 50000, 100000]
+
+CAMINHO_QUERY = pathlib.Path(__file__).resolve().parents[1] / "querys" / "new" / "gv_vendas.sql"
+
+# Tabela com o resultado materializado da query
+TABELA_EXTRAIDA = 'vendas_extraidas'
+
+def _caminho_banco(diretorio, linhas, semente):
+    """
+    Retorna o banco local de um tamanho, criando-o se ainda não existir.
+
+    Args:
+        diretorio (pathlib.Path): Diretório dos bancos gerados.
+        linhas (int): Quantidade de linhas de documento.
+        semente (int): Semente do gerador.
+
+    Returns:
+        pathlib.Path: Arquivo do banco SQLite.
+    """
+    diretorio.mkdir(parents=True, exist_ok=True)
+    caminho = diretorio / f"banco_local_{linhas}_{semente}.sqlite"
+    if not caminho.exists():
+        print(f"Criando banco local com {linhas} linhas de documento em {caminho}...")
+        inicio = time.perf_counter()
+        temporario = caminho.with_suffix('.tmp')
+        if temporario.exists():
+            temporario.unlink()
+        criar_banco_local(temporario, linhas, semente)
+        temporario.replace(caminho)
+        print(f"Banco criado em {time.perf_counter() - inicio:.1f}s")
+    return caminho
+
+def _materializar_resultado(caminho_banco):
+    """
+    Grava o resultado de CAMINHO_QUERY na tabela TABELA_EXTRAIDA, se ainda não existir.
+
+    Args:
+        caminho_banco (pathlib.Path): Banco local.
+
+    Returns:
+        str: Query que lê o resultado materializado.
+    """
+    conn = sqlite3.connect(str(caminho_banco))
+    try:
+        existe = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                              (TABELA_EXTRAIDA,)).fetchone()
+        if existe is None:
+            print("Materializando o resultado da query no banco local...")
+            query = traduzir_tsql(CAMINHO_QUERY.read_text(encoding='utf-8'))
+            conn.execute(f"CREATE TABLE {TABELA_EXTRAIDA} AS {query}")
+            conn.commit()
+    finally:
+        conn.close()
+    return f"SELECT * FROM {TABELA_EXTRAIDA}"
+
+def _somente_fetch(conn, query, tamanho_lote):
+    """Lê todos os registros com fetchmany, descartando cada lote."""
+    cursor = conn.cursor()
+    cursor.execute(query)
+    total = 0
+    while True:
+        linhas = cursor.fetchmany(tamanho_lote)
+        if not linhas:
+            break
+        total += len(linhas)
+    cursor.close()
+    return total
+
+def _medir_extracao(caminho_banco, query, estrategia, tamanho_lote):
+    """
+    Mede uma extração completa com a estratégia e o tamanho de lote informados.
+
+    Args:
+        caminho_banco (pathlib.Path): Banco local.
+        query (str): Query executada.
+        estrategia (str): Uma de ESTRATEGIAS.
+        tamanho_lote (int): Registros por fetchmany.
+
+    Returns:
+        dict: Medida da extração (ver src.metrics.medir_etapa).
+    """
+    medidas = []
+    conn = conectar(caminho_banco)
+    try:
+        with open(os.devnull, 'w', encoding='utf-8') as descarte, redirect_stdout(descarte), \
+                tempfile.TemporaryDirectory() as pasta:
+            with medir_etapa(estrategia, resultados=medidas, tamanho_lote=tamanho_lote) as medida:
+                if estrategia == 'somente_fetch':
+                    medida['linhas_saida'] = _somente_fetch(conn, query, tamanho_lote)
+                elif estrategia == 'arrow_parquet':
+                    medida['linhas_saida'] = executar_query_para_parquet(
+                        conn, query, pathlib.Path(pasta) / "extracao.parquet", tamanho_lote=tamanho_lote)
+                else:
+                    df = executar_query(conn, query, decimal_como_float=(estrategia == 'listas_float'),
+                                        tamanho_lote=tamanho_lote)
+                    medida['linhas_saida'] = len(df) if df is not None else None
+    finally:
+        conn.close()
+
+    return medidas[0]
+
+def executar_benchmark(linhas, tamanhos_lote, estrategias=ESTRATEGIAS, diretorio_dados=None,
+                       semente=SEMENTE_PADRAO, query_completa=False):
+    """
+    Mede todas as combinações de estratégia e tamanho de lote, cada uma em um processo novo.
+
+    Args:
+        linhas (int): Quantidade de linhas de documento do banco local.
+        tamanhos_lote (list): Tamanhos de lote do fetchmany.
+        estrategias (sequence): Estratégias de conversão medidas.
+        diretorio_dados (pathlib.Path, opcional): Diretório do banco local.
+        semente (int): Semente do gerador.
+        query_completa (bool): Se True, mede a execução da query inteira em vez
+            da leitura do resultado materializado.
+
+    Returns:
+        list: Medidas de cada combinação.
+    """
+    if diretorio_dados is None:
+        diretorio_dados = pathlib.Path().resolve() / "output" / "benchmarks"
+    caminho_banco = _caminho_banco(diretorio_dados, linhas, semente)
+    if query_completa:
+        query = CAMINHO_QUERY.read_text(encoding='utf-8')
+    else:
+        query = _materializar_resultado(caminho_banco)
+
+    medidas = []
+    contexto = multiprocessing.get_context('spawn')
+    for estrategia in estrategias:
+        for tamanho_lote in tamanhos_lote:
+            with ProcessPoolExecutor(max_workers=1, mp_context=contexto) as executor:
+                medida = executor.submit(_medir_extracao, caminho_banco, query, estrategia, tamanho_lote).result()
+            medidas.append(medida)
+            print(f"{estrategia:<16}{tamanho_lote:>10}{medida['segundos']:>10.2f}"
+                  f"{medida['linhas_por_segundo'] or 0:>14,}{medida['pico_mb']:>10.1f}{medida['incremento_mb']:>10.1f}")
+    return medidas
+
+def main(argumentos=None):
+    """Executa o benchmark de extração pela linha de comando."""
+    parser = argparse.ArgumentParser(description="Benchmark da extração de vendas com o banco local (SQLite).")
+    parser.add_argument('--linhas', type=int, default=200000,
+                        help="Linhas de documento geradas no banco local.")
+    parser.add_argument('--tamanhos-lote', type=int, nargs='+', default=TAMANHOS_LOTE_PADRAO,
+                        help="Tamanhos de lote do fetchmany.")
+    parser.add_argument('--estrategias', nargs='+', choices=ESTRATEGIAS, default=list(ESTRATEGIAS),
+                        help="Estratégias de conversão medidas.")
+    parser.add_argument('--query-completa', action='store_true',
+                        help="Mede a query inteira (joins no SQLite) em vez do resultado materializado.")
+    parser.add_argument('--semente', type=int, default=SEMENTE_PADRAO, help="Semente do gerador de dados.")
+    parser.add_argument('--diretorio-dados', type=pathlib.Path,
+                        default=pathlib.Path().resolve() / "output" / "benchmarks",
+                        help="Diretório do banco local e dos resultados.")
+    args = parser.parse_args(argumentos)
+
+    print(f"{'Estratégia':<16}{'Lote':>10}{'Segundos':>10}{'Linhas/s':>14}{'Pico MB':>10}{'Incr. MB':>10}")
+    medidas = executar_benchmark(args.linhas, args.tamanhos_lote, args.estrategias,
+                                 args.diretorio_dados, args.semente, args.query_completa)
+
+    conteudo = {
+        'criado_em': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'plataforma': platform.platform(),
+        'python': platform.python_version(),
+        'linhas_documento': args.linhas,
+        'semente': args.semente,
+        'query_completa': args.query_completa,
+        'medidas': medidas,
+    }
+    caminho_resultado = args.diretorio_dados / f"resultado_extracao_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    caminho_resultado.write_text(json.dumps(conteudo, indent=2), encoding='utf-8')
+    print(f"\nResultados gravados em: {caminho_resultado}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
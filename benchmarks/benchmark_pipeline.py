@@ -0,0 +1,282 @@
+"""
+Benchmark das etapas do pipeline de análise com dados sintéticos (sem banco de dados).
+
+Para cada tamanho são medidos o tempo e o pico de memória residente de:
+carregamento do Parquet, normalização de datas, classificar_vendas,
+preparar_dados, criar_tabelas_por_cluster, formatar_tabela_pivot e
+salvar_excel_simplificado. Os resultados podem ser gravados como baseline e
+as execuções seguintes apontam as etapas que ficaram mais lentas ou usaram
+mais memória que o limite de regressão.
+
+Uso (a partir da raiz do projeto):
+
+    python -m benchmarks.benchmark_pipeline --tamanhos 100000 1000000
+    python -m benchmarks.benchmark_pipeline --tamanhos 100000 1000000 10000000 --salvar-baseline
+
+As baselines dependem da máquina; devem ser gravadas e comparadas no mesmo equipamento.
+"""
+
+import os
+import sys
+import json
+import time
+import pathlib
+import argparse
+import platform
+import statistics
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from datetime import datetime
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+
+from benchmarks.dados_sinteticos import SEMENTE_PADRAO, gerar_arquivo_vendas
+from src.metrics import medir_etapa
+from src.data_access import carregar_do_parquet
+from src.date_normalization import normalizar_datas
+from src.data_processing import classificar_vendas, preparar_dados
+from src.analysis import criar_tabelas_por_cluster, formatar_tabela_pivot, salvar_excel_simplificado
+
+TAMANHOS_PADRAO = [100000, 1000000]
+
+# Execuções por tamanho: vale o menor tempo e a mediana da memória de cada etapa
+REPETICOES_PADRAO = 3
+
+# Variação máxima aceita em relação à baseline (0.25 = 25% mais lento ou com mais memória)
+LIMITE_REGRESSAO_PADRAO = 0.25
+
+# Etapas muito curtas ou com pouca memória variam demais para serem comparadas
+SEGUNDOS_MINIMOS_COMPARACAO = 0.05
+MEMORIA_MINIMA_COMPARACAO_MB = 16
+
+CAMINHO_BASELINE_PADRAO = pathlib.Path(__file__).resolve().parent / "baseline_pipeline.json"
+
+def _caminho_dados(diretorio, quantidade, semente):
+    """
+    Retorna o arquivo de dados sintéticos de um tamanho, gerando-o se ainda não existir.
+
+    Args:
+        diretorio (pathlib.Path): Diretório dos arquivos gerados.
+        quantidade (int): Quantidade de registros.
+        semente (int): Semente do gerador.
+
+    Returns:
+        pathlib.Path: Arquivo Parquet com os dados.
+    """
+    diretorio.mkdir(parents=True, exist_ok=True)
+    caminho = diretorio / f"vendas_sinteticas_{quantidade}_{semente}.parquet"
+    if not caminho.exists():
+        print(f"Gerando {quantidade} registros sintéticos em {caminho}...")
+        inicio = time.perf_counter()
+        temporario = caminho.with_suffix('.tmp')
+        gerar_arquivo_vendas(temporario, quantidade, semente)
+        temporario.replace(caminho)
+        print(f"Dados gerados em {time.perf_counter() - inicio:.1f}s")
+    return caminho
+
+def _medir_pipeline(caminho, quantidade):
+    """
+    Executa as etapas do pipeline sobre um arquivo sintético e mede cada uma.
+
+    Args:
+        caminho (pathlib.Path): Arquivo Parquet com os dados.
+        quantidade (int): Quantidade de registros do arquivo.
+
+    Returns:
+        list: Medidas das etapas (ver src.metrics.medir_etapa).
+    """
+    medidas = []
+
+    # As mensagens do pipeline são descartadas para não interferir nas medidas
+    with open(os.devnull, 'w', encoding='utf-8') as descarte, redirect_stdout(descarte), \
+            tempfile.TemporaryDirectory() as pasta_excel:
+        with medir_etapa('carregar_parquet', quantidade, resultados=medidas) as medida:
+            df = carregar_do_parquet(caminho)
+            medida['linhas_saida'] = len(df)
+
+        with medir_etapa('normalizar_datas', len(df), resultados=medidas) as medida:
+            df = normalizar_datas(df)
+            medida['linhas_saida'] = len(df)
+
+        with medir_etapa('classificar_vendas', len(df), resultados=medidas) as medida:
+            df = classificar_vendas(df)
+            medida['linhas_saida'] = len(df)
+
+        with medir_etapa('preparar_dados', len(df), resultados=medidas) as medida:
+            df = preparar_dados(df)
+            medida['linhas_saida'] = len(df)
+
+        with medir_etapa('criar_tabelas_por_cluster', len(df), resultados=medidas) as medida:
+            tabelas = criar_tabelas_por_cluster(df)
+            medida['linhas_saida'] = sum(len(tabela['contagem_detalhada']) for tabela in tabelas.values())
+
+        detalhadas = [(tabela['contagem_detalhada'], 'Contagem') for tabela in tabelas.values()]
+        detalhadas += [(tabela['horas_detalhadas'], 'Total_Horas') for tabela in tabelas.values()]
+        linhas_detalhadas = sum(len(tabela) for tabela, _ in detalhadas)
+        with medir_etapa('formatar_tabela_pivot', linhas_detalhadas, resultados=medidas) as medida:
+            pivots = [formatar_tabela_pivot(tabela, coluna) for tabela, coluna in detalhadas]
+            medida['linhas_saida'] = sum(len(pivot) for pivot in pivots if pivot is not None)
+
+        del df
+        with medir_etapa('salvar_excel_simplificado', medidas[-1]['linhas_saida'], resultados=medidas) as medida:
+            arquivo = salvar_excel_simplificado(None, pasta_saida=pasta_excel, incluir_detalhadas=True,
+                                                tabelas=tabelas)
+            medida['linhas_saida'] = medida['linhas_entrada'] if arquivo else 0
+
+    return medidas
+
+def _combinar_repeticoes(execucoes):
+    """
+    Combina as medidas de várias execuções: menor tempo e mediana da memória por etapa.
+
+    Args:
+        execucoes (list): Listas de medidas, uma por execução.
+
+    Returns:
+        list: Medidas combinadas, na ordem das etapas.
+    """
+    combinadas = []
+    for medidas_etapa in zip(*execucoes):
+        mais_rapida = min(medidas_etapa, key=lambda medida: medida['segundos'])
+        medida = dict(mais_rapida)
+        medida['pico_mb'] = statistics.median(m['pico_mb'] for m in medidas_etapa)
+        medida['incremento_mb'] = statistics.median(m['incremento_mb'] for m in medidas_etapa)
+        medida['repeticoes'] = len(medidas_etapa)
+        combinadas.append(medida)
+    return combinadas
+
+def executar_benchmark(quantidade, diretorio_dados, semente=SEMENTE_PADRAO, repeticoes=REPETICOES_PADRAO):
+    """
+    Mede as etapas do pipeline para um tamanho de dados.
+
+    Cada execução roda em um processo novo, para que a memória já reservada
+    pela geração dos dados ou por execuções anteriores não altere os resultados.
+
+    Args:
+        quantidade (int): Quantidade de registros.
+        diretorio_dados (pathlib.Path): Diretório dos arquivos sintéticos.
+        semente (int): Semente do gerador.
+        repeticoes (int): Quantidade de execuções combinadas.
+
+    Returns:
+        list: Medidas das etapas (ver src.metrics.medir_etapa).
+    """
+    caminho = _caminho_dados(diretorio_dados, quantidade, semente)
+    execucoes = []
+    for _ in range(max(1, repeticoes)):
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+            execucoes.append(executor.submit(_medir_pipeline, caminho, quantidade).result())
+    return _combinar_repeticoes(execucoes)
+
+def comparar_com_baseline(resultados, baseline, limite=LIMITE_REGRESSAO_PADRAO):
+    """
+    Compara as medidas atuais com a baseline.
+
+    Args:
+        resultados (dict): Medidas por tamanho (str) e etapa.
+        baseline (dict): Conteúdo do arquivo de baseline.
+        limite (float): Aumento relativo máximo aceito em tempo e em memória.
+
+    Returns:
+        list: Regressões encontradas (tamanho, etapa, métrica, baseline, atual, variação).
+    """
+    regressoes = []
+    for tamanho, etapas in resultados.items():
+        etapas_baseline = baseline.get('resultados', {}).get(tamanho, {})
+        for etapa, medida in etapas.items():
+            referencia = etapas_baseline.get(etapa)
+            if referencia is None:
+                continue
+            for metrica, minimo in (('segundos', SEGUNDOS_MINIMOS_COMPARACAO),
+                                    ('incremento_mb', MEMORIA_MINIMA_COMPARACAO_MB)):
+                anterior = referencia.get(metrica)
+                atual = medida.get(metrica)
+                if anterior is None or atual is None or max(anterior, atual) < minimo:
+                    continue
+                variacao = (atual - anterior) / max(anterior, minimo)
+                if variacao > limite:
+                    regressoes.append({
+                        'tamanho': tamanho, 'etapa': etapa, 'metrica': metrica,
+                        'baseline': anterior, 'atual': atual, 'variacao': round(variacao, 3),
+                    })
+    return regressoes
+
+def _imprimir_medidas(quantidade, medidas):
+    """Imprime as medidas de um tamanho em formato de tabela."""
+    print(f"\n{quantidade} registros")
+    print(f"{'Etapa':<28}{'Segundos':>10}{'Linhas/s':>14}{'Pico MB':>10}{'Incr. MB':>10}")
+    for medida in medidas:
+        linhas_por_segundo = medida['linhas_por_segundo'] or 0
+        print(f"{medida['etapa']:<28}{medida['segundos']:>10.3f}{linhas_por_segundo:>14,}"
+              f"{medida['pico_mb']:>10.1f}{medida['incremento_mb']:>10.1f}")
+
+def main(argumentos=None):
+    """
+    Executa o benchmark pela linha de comando.
+
+    Returns:
+        int: 0 sem regressões, 1 se alguma etapa ultrapassou o limite.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark do pipeline de análise com dados sintéticos.")
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=TAMANHOS_PADRAO,
+                        help="Quantidades de registros (ex.: 100000 1000000 10000000).")
+    parser.add_argument('--semente', type=int, default=SEMENTE_PADRAO, help="Semente do gerador de dados.")
+    parser.add_argument('--repeticoes', type=int, default=REPETICOES_PADRAO,
+                        help="Execuções por tamanho (menor tempo e mediana da memória).")
+    parser.add_argument('--diretorio-dados', type=pathlib.Path,
+                        default=pathlib.Path().resolve() / "output" / "benchmarks",
+                        help="Diretório dos dados sintéticos e dos resultados.")
+    parser.add_argument('--baseline', type=pathlib.Path, default=CAMINHO_BASELINE_PADRAO,
+                        help="Arquivo de baseline.")
+    parser.add_argument('--salvar-baseline', action='store_true',
+                        help="Grava as medidas desta execução como nova baseline.")
+    parser.add_argument('--limite-regressao', type=float, default=LIMITE_REGRESSAO_PADRAO,
+                        help="Aumento relativo máximo aceito (0.25 = 25%%).")
+    args = parser.parse_args(argumentos)
+
+    resultados = {}
+    for quantidade in args.tamanhos:
+        medidas = executar_benchmark(quantidade, args.diretorio_dados, args.semente, args.repeticoes)
+        _imprimir_medidas(quantidade, medidas)
+        resultados[str(quantidade)] = {medida['etapa']: medida for medida in medidas}
+
+    conteudo = {
+        'criado_em': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'plataforma': platform.platform(),
+        'python': platform.python_version(),
+        'semente': args.semente,
+        'repeticoes': args.repeticoes,
+        'resultados': resultados,
+    }
+    caminho_resultado = args.diretorio_dados / f"resultado_pipeline_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    caminho_resultado.write_text(json.dumps(conteudo, indent=2), encoding='utf-8')
+    print(f"\nResultados gravados em: {caminho_resultado}")
+
+    if args.salvar_baseline:
+        temporario = args.baseline.with_suffix('.tmp')
+        temporario.write_text(json.dumps(conteudo, indent=2), encoding='utf-8')
+        temporario.replace(args.baseline)
+        print(f"Baseline gravada em: {args.baseline}")
+        return 0
+
+    if not args.baseline.exists():
+        print("Nenhuma baseline encontrada. Use --salvar-baseline para gravar a atual.")
+        return 0
+
+    baseline = json.loads(args.baseline.read_text(encoding='utf-8'))
+    regressoes = comparar_com_baseline(resultados, baseline, args.limite_regressao)
+    if not regressoes:
+        print(f"Sem regressões em relação à baseline de {baseline.get('criado_em')} "
+              f"(limite de {args.limite_regressao:.0%}).")
+        return 0
+
+    print(f"\nAVISO: {len(regressoes)} regressões acima de {args.limite_regressao:.0%}:")
+    for regressao in regressoes:
+        print(f"- {regressao['tamanho']} registros, {regressao['etapa']}, {regressao['metrica']}: "
+              f"{regressao['baseline']} -> {regressao['atual']} (+{regressao['variacao']:.0%})")
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,187 @@
+"""
+Gerador determinístico de dados sintéticos no formato de querys/new/gv_vendas.sql.
+
+Os dados imitam o resultado real da extração: datas em texto no formato
+CONVERT 120, valores monetários DECIMAL, centros, produtos e clientes com
+distribuição assimétrica (poucos itens concentram a maior parte das
+vendas), combinações de Secao/Familia que cobrem todas as regras de
+classificação e de horas, e uma pequena fração de valores nulos ou com
+espaços nas extremidades.
+
+A geração é feita em blocos com numpy/pyarrow, sem objetos Python por
+linha, para que 10 milhões de registros possam ser gerados e gravados em
+Parquet com memória limitada a um bloco.
+"""
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+SEMENTE_PADRAO = 42
+
+# Tamanho dos blocos gerados e dos grupos de linhas gravados (igual ao lote da extração)
+TAMANHO_BLOCO = 1000000
+TAMANHO_GRUPO_LINHAS = 50000
+
+TIPO_DECIMAL = pa.decimal128(19, 4)
+
+CENTROS = ['RB', 'SP', 'BL', 'BT', 'CB', 'MA', 'PN', 'VM', 'MO', 'SA', 'JD', 'AL', 'TT', 'IB', 'PI',
+           'CG', 'CP', 'SC', 'RP', 'SJ', 'BR', 'GO', 'CT', 'FL', 'PA']
+
+# (Secao, Familia, peso): combinações que cobrem as regras de data_processing
+COMBINACOES_SECAO_FAMILIA = [
+    ('Clinica Medica', 'Consulta', 30.0),
+    ('Clinica Medica', 'Retorno', 18.0),
+    ('Clinica Medica', 'Consultas', 4.0),
+    ('Cardiologia', 'Ecocardiograma', 8.0),
+    ('Cardiologia', 'Eletrocardiograma', 5.0),
+    ('Cardiologia', 'Consulta', 3.0),
+    ('Cardiologia', 'Retorno', 1.5),
+    ('Imagem', 'Ultrassonografia', 12.0),
+    ('Imagem', 'Raio X', 9.0),
+    ('Imagem', 'Tomografia', 1.0),
+    ('Anestesia', 'Cirurgia', 2.0),
+    ('Cirurgia Geral', 'Cirurgia', 4.0),
+    ('Ortopedia', 'Cirurgia', 1.0),
+    ('Especialidades', 'Retorno', 1.0),
+    (' Imagem ', 'Raio X', 0.2),
+    (None, 'Consulta', 0.2),
+    ('Cardiologia', None, 0.1),
+]
+
+BAIRROS = [f'Bairro {indice:03d}' for indice in range(400)]
+
+def pesos_zipf(quantidade, expoente=1.1):
+    """Pesos normalizados de uma distribuição de Zipf para quantidade itens."""
+    pesos = 1.0 / np.arange(1, quantidade + 1) ** expoente
+    return pesos / pesos.sum()
+
+def _texto(valores):
+    """Converte um array numpy de textos (com None) em um array Arrow de strings."""
+    return pa.array(valores, type=pa.string())
+
+def _datas_texto(segundos):
+    """Converte segundos desde a época em textos 'AAAA-MM-DD HH:MM:SS'."""
+    return pc.strftime(pa.array(segundos.astype('datetime64[s]')), format='%Y-%m-%d %H:%M:%S')
+
+def _decimal(valores):
+    """Converte valores float em DECIMAL com 4 casas, como retornado pelo SQL Server."""
+    return pa.array(np.round(valores, 2)).cast(TIPO_DECIMAL)
+
+def gerar_bloco(quantidade, rng, data_inicio='2023-01-01', data_fim='2025-06-30'):
+    """
+    Gera um bloco de registros de vendas sintéticos.
+
+    Args:
+        quantidade (int): Quantidade de registros.
+        rng (numpy.random.Generator): Gerador de números aleatórios do bloco.
+        data_inicio (str): Primeira data de criação.
+        data_fim (str): Última data de criação.
+
+    Returns:
+        pyarrow.Table: Registros com as colunas de gv_vendas.sql.
+    """
+    # Centros: poucos centros concentram a maior parte das vendas
+    centros = np.array(CENTROS, dtype=object)[rng.choice(len(CENTROS), quantidade, p=pesos_zipf(len(CENTROS), 0.8))]
+
+    combinacoes = rng.choice(len(COMBINACOES_SECAO_FAMILIA), quantidade,
+                             p=np.array([peso for _, _, peso in COMBINACOES_SECAO_FAMILIA]) /
+                               sum(peso for _, _, peso in COMBINACOES_SECAO_FAMILIA))
+    secoes = np.array([secao for secao, _, _ in COMBINACOES_SECAO_FAMILIA], dtype=object)[combinacoes]
+    familias = np.array([familia for _, familia, _ in COMBINACOES_SECAO_FAMILIA], dtype=object)[combinacoes]
+
+    # Datas: volume crescente ao longo do período e concentração no horário comercial
+    inicio = np.datetime64(data_inicio, 's').astype(np.int64)
+    fim = np.datetime64(data_fim, 's').astype(np.int64)
+    dias = (fim - inicio) // 86400
+    dia = (np.sqrt(rng.random(quantidade)) * dias).astype(np.int64)
+    segundo_do_dia = np.clip(rng.normal(14 * 3600, 3 * 3600, quantidade), 7 * 3600, 22 * 3600).astype(np.int64)
+    criacao = inicio + dia * 86400 + segundo_do_dia
+    execucao = criacao + rng.integers(0, 3 * 3600, quantidade)
+
+    data_criacao = _datas_texto(criacao)
+    # Uma pequena fração de registros sem data de criação
+    sem_data = rng.random(quantidade) < 0.0005
+    data_criacao = pc.if_else(pa.array(sem_data), pa.scalar(None, pa.string()), data_criacao)
+
+    # Produtos e clientes com distribuição assimétrica
+    produtos = rng.choice(3000, quantidade, p=pesos_zipf(3000))
+    clientes = (rng.pareto(1.2, quantidade) * 1000).astype(np.int64) % 250000 + 1
+    animais = clientes * 3 + rng.integers(0, 3, quantidade)
+
+    quantidade_item = np.where(rng.random(quantidade) < 0.9, 1.0, rng.integers(2, 6, quantidade).astype(float))
+    preco = np.round(rng.lognormal(5.0, 0.8, quantidade), 2)
+    desconto = np.where(rng.random(quantidade) < 0.15, np.round(preco * rng.uniform(0.05, 0.2, quantidade), 2), 0.0)
+    valor_venda = preco * quantidade_item - desconto
+
+    documento = rng.integers(1, 999999, quantidade)
+    data_documento = pc.strftime(pa.array((criacao // 86400 * 86400).astype('datetime64[s]')), format='%d-%m-%Y')
+
+    return pa.table({
+        'Centro': _texto(centros),
+        'DtDocumento': data_documento,
+        'Documento': pc.binary_join_element_wise('FAT A/', pc.cast(pa.array(documento), pa.string()), ''),
+        'DataCriacao': data_criacao,
+        'IdCliente': pa.array(clientes, type=pa.int64()),
+        'CepCliente': pc.cast(pa.array(rng.integers(1000000, 99999999, quantidade)), pa.string()),
+        'BairroCliente': _texto(np.array(BAIRROS, dtype=object)[rng.choice(len(BAIRROS), quantidade, p=pesos_zipf(len(BAIRROS)))]),
+        'IdAnimal': pa.array(animais, type=pa.int64()),
+        'Secao': _texto(secoes),
+        'Familia': _texto(familias),
+        'SubFamilia': pc.binary_join_element_wise('Subfamilia ', pc.cast(pa.array(produtos % 60), pa.string()), ''),
+        'CodProduto': pc.binary_join_element_wise('P', pc.cast(pa.array(produtos), pa.string()), ''),
+        'Produto': pc.binary_join_element_wise('Produto ', pc.cast(pa.array(produtos), pa.string()), ''),
+        'Quantidade': _decimal(quantidade_item),
+        'PrecoVenda': _decimal(preco),
+        'ValorVenda': _decimal(valor_venda),
+        'PVP1': _decimal(preco),
+        'DescontoRS': _decimal(desconto),
+        'ValorTotal': _decimal(preco * quantidade_item),
+        'DataExecucao': _datas_texto(execucao),
+    })
+
+def gerar_vendas_sinteticas(quantidade, semente=SEMENTE_PADRAO):
+    """
+    Gera um DataFrame de vendas sintéticas como retornado por executar_query
+    (valores monetários como objetos Decimal).
+
+    Args:
+        quantidade (int): Quantidade de registros.
+        semente (int): Semente do gerador (mesma semente, mesmos dados).
+
+    Returns:
+        pandas.DataFrame: Registros com as colunas de gv_vendas.sql.
+    """
+    blocos = []
+    for indice, semente_bloco in enumerate(np.random.SeedSequence(semente).spawn(-(-quantidade // TAMANHO_BLOCO))):
+        tamanho = min(TAMANHO_BLOCO, quantidade - indice * TAMANHO_BLOCO)
+        blocos.append(gerar_bloco(tamanho, np.random.default_rng(semente_bloco)))
+    return pa.concat_tables(blocos).to_pandas()
+
+def gerar_arquivo_vendas(caminho, quantidade, semente=SEMENTE_PADRAO):
+    """
+    Gera registros de vendas sintéticos diretamente em um arquivo Parquet, bloco a bloco.
+
+    Args:
+        caminho (pathlib.Path ou str): Arquivo Parquet de destino.
+        quantidade (int): Quantidade de registros.
+        semente (int): Semente do gerador (mesma semente, mesmos dados).
+
+    Returns:
+        int: Quantidade de registros gravados.
+    """
+    escritor = None
+    total = 0
+    try:
+        for indice, semente_bloco in enumerate(np.random.SeedSequence(semente).spawn(-(-quantidade // TAMANHO_BLOCO))):
+            tamanho = min(TAMANHO_BLOCO, quantidade - indice * TAMANHO_BLOCO)
+            bloco = gerar_bloco(tamanho, np.random.default_rng(semente_bloco))
+            if escritor is None:
+                escritor = pq.ParquetWriter(caminho, bloco.schema, compression='snappy')
+            escritor.write_table(bloco, row_group_size=TAMANHO_GRUPO_LINHAS)
+            total += tamanho
+    finally:
+        if escritor is not None:
+            escritor.close()
+    return total
@@ -1,11 +1,17 @@
 """
 Versão simplificada do módulo principal para carregar parquet e gerar Excel com tabelas específicas
+
+Sem argumentos as opções são perguntadas interativamente. Com --fonte o mesmo
+pipeline é executado sem perguntas, por exemplo:
+
+    python main.py --fonte parquet --snapshot output/dados_vendas_20240101.parquet --perfil amostragem
+    python main.py --fonte banco --data-inicio 2024-01-01 --silencioso --saida output/relatorios
 """
 
 import sys
 import pathlib
+import argparse
 from datetime import datetime
-import pandas as pd
 
 # Adicionando o diretório raiz ao path para importações corretas
 notebook_dir = str(pathlib.Path().resolve())
@@ -13,8 +19,33 @@ sys.path.append(notebook_dir)
 
 # Importação das funções para acesso aos dados
 from src.data_processing import classificar_vendas, preparar_dados
+from src.date_normalization import normalizar_datas
 from src.data_access import carregar_do_parquet, buscar_dados_vendas
-from src.analysis import salvar_excel_simplificado
+from src.analysis import salvar_excel_simplificado, criar_tabelas_por_cluster, montar_tabelas_por_classificacao
+from src.checkpoint import chave_checkpoint, carregar_checkpoint, salvar_checkpoint
+from src.incremental import buscar_dados_vendas_incremental, JANELA_PADRAO_DIAS
+from src.parallel_extraction import buscar_dados_vendas_paralelo, MAX_CONEXOES_PADRAO
+from src.parallel_processing import criar_tabelas_em_paralelo
+from src.pushdown import buscar_celulas_agregadas, verificar_paridade
+from src.metrics import iniciar_execucao, finalizar_execucao, progresso
+from src.profiling import MODOS_PERFIL, INTERVALO_AMOSTRAGEM_PADRAO, iniciar_perfil, encerrar_perfil
+from src.snapshot_manifest import listar_snapshots, remover_do_manifesto
+
+def descrever_snapshot(registro):
+    """
+    Resume um snapshot do manifesto para a listagem (data, registros, período e tamanho).
+    
+    Args:
+        registro (dict): Registro retornado por src.snapshot_manifest.listar_snapshots.
+        
+    Returns:
+        str: Descrição do snapshot.
+    """
+    periodo = "período desconhecido"
+    if registro.get('data_criacao_min') and registro.get('data_criacao_max'):
+        periodo = f"{registro['data_criacao_min'][:10]} a {registro['data_criacao_max'][:10]}"
+    return (f"{registro['nome']} (Criado: {registro.get('criado_em')}, {registro.get('linhas', 0)} registros, "
+            f"{periodo}, {registro.get('bytes', 0) / (1024*1024):.1f} MB)")
 
 def main():
     """
@@ -28,18 +59,21 @@ def main():
     # Define o diretório raiz
     diretorio_raiz = pathlib.Path().resolve()
     
-    # Busca arquivos Parquet existentes
-    arquivos_parquet = list((diretorio_raiz / "output").glob("*.parquet"))
+    # Métricas de cada etapa gravadas em output/metricas_execucoes.jsonl
+    silencioso = input("Modo silencioso (sem mensagens por lote e por registro)? (s/n): ").strip().lower() == 's'
+    iniciar_execucao(diretorio_raiz / "output", silencioso=silencioso)
     
     # Apresenta as opções ao usuário
     print("\nOpções disponíveis:")
     print("1. Usar arquivo Parquet existente")
     print("2. Criar novo arquivo Parquet a partir do banco de dados")
+    print("3. Gerar relatório com agregação no banco de dados (sem transferir as linhas)")
     
-    opcao = input("\nEscolha uma opção (1 ou 2): ").strip()
+    opcao = input("\nEscolha uma opção (1, 2 ou 3): ").strip()
     
     df_vendas = None
     caminho_parquet = None
+    filtros = {'data_inicio': None, 'data_fim': None, 'centros': None}
     
     if opcao == "2":
         print("\n" + "=" * 80)
@@ -75,10 +109,49 @@ def main():
         else:
             caminho_sql = None
         
+        # Extração incremental disponível apenas para a query padrão de vendas
+        usar_incremental = False
+        janela_dias = JANELA_PADRAO_DIAS
+        if caminho_sql is None:
+            usar_incremental = input("\nUsar extração incremental (apenas registros novos ou alterados)? (s/n): ").strip().lower() == 's'
+            if usar_incremental:
+                resposta_janela = input(f"Janela de reprocessamento em dias (Enter para {JANELA_PADRAO_DIAS}): ").strip()
+                if resposta_janela.isdigit():
+                    janela_dias = int(resposta_janela)
+        
         try:
             # Buscar dados do banco de dados
             print("\nConectando ao banco de dados e executando a consulta...")
-            resultado = buscar_dados_vendas(caminho_query=caminho_sql, salvar_parquet=True)
+            usar_paralelo = (caminho_sql is None and not usar_incremental and
+                             input("\nExtrair em paralelo por mês (várias conexões)? (s/n): ").strip().lower() == 's')
+            if usar_incremental:
+                resultado = buscar_dados_vendas_incremental(janela_dias=janela_dias)
+            elif usar_paralelo:
+                data_inicio = input("Data inicial (AAAA-MM-DD, Enter para 2023-01-01): ").strip() or '2023-01-01'
+                data_fim = input("Data final (AAAA-MM-DD, Enter para hoje): ").strip() or None
+                resposta_conexoes = input(f"Conexões simultâneas (Enter para {MAX_CONEXOES_PADRAO}): ").strip()
+                max_conexoes = int(resposta_conexoes) if resposta_conexoes.isdigit() and int(resposta_conexoes) > 0 else MAX_CONEXOES_PADRAO
+                resultado = buscar_dados_vendas_paralelo(data_inicio=data_inicio, data_fim=data_fim,
+                                                         max_conexoes=max_conexoes)
+            else:
+                particionar = input("\nSalvar como dataset particionado por Ano/Mês? (s/n): ").strip().lower() == 's'
+                particionar_por_centro = particionar and input("Particionar também por Centro? (s/n): ").strip().lower() == 's'
+                # Cache de consultas: reutiliza o resultado de uma execução recente da mesma query
+                modo_cache = input("Cache de consultas - Enter para usar, 'i' para ignorar, 'a' para atualizar: ").strip().lower()
+                pular_sem_alteracoes = input("Reutilizar o último snapshot se as tabelas de origem não mudaram? (s/n): ").strip().lower() == 's'
+                # Filtros da query padrão, ligados como parâmetros (mesmo plano de execução para qualquer período)
+                filtros_template = None
+                if caminho_sql is None:
+                    data_inicio = input("Data inicial (AAAA-MM-DD, Enter para 2023-01-01): ").strip() or None
+                    data_fim = input("Data final (AAAA-MM-DD, Enter para hoje): ").strip() or None
+                    resposta_centros = input("Centros separados por vírgula (Enter para todos): ").strip()
+                    centros = [centro.strip() for centro in resposta_centros.split(",") if centro.strip()] or None
+                    filtros_template = {'data_inicio': data_inicio, 'data_fim': data_fim, 'centros': centros}
+                resultado = buscar_dados_vendas(caminho_query=caminho_sql, salvar_parquet=True, streaming=True,
+                                                particionar=particionar, particionar_por_centro=particionar_por_centro,
+                                                usar_cache=modo_cache != 'i', atualizar_cache=modo_cache == 'a',
+                                                filtros_template=filtros_template,
+                                                pular_sem_alteracoes=pular_sem_alteracoes)
             
             if isinstance(resultado, tuple) and len(resultado) == 2:
                 df_vendas, caminho_parquet = resultado
@@ -95,36 +168,105 @@ def main():
             return None
             
     elif opcao == "1":
-        # Verificar se existem arquivos Parquet
-        if not arquivos_parquet:
+        # Snapshots Parquet e datasets particionados do manifesto (mais recente primeiro)
+        snapshots = listar_snapshots(diretorio_raiz / "output")
+        if not snapshots:
             print("ERRO: Nenhum arquivo Parquet encontrado no diretório 'output'.")
             return None
         
-        # Ordena por data de modificação (mais recente primeiro)
-        arquivos_parquet.sort(key=lambda x: x.stat().st_mtime, reverse=True)
-        
         # Lista os arquivos Parquet disponíveis
         print("\nArquivos Parquet disponíveis:")
-        for i, arquivo in enumerate(arquivos_parquet):
-            print(f"{i+1}. {arquivo.name} (Modificado: {datetime.fromtimestamp(arquivo.stat().st_mtime).strftime('%Y-%m-%d %H:%M:%S')})")
+        for i, registro in enumerate(snapshots):
+            print(f"{i+1}. {descrever_snapshot(registro)}")
         
         # Seleção do arquivo a ser utilizado
         resposta = input("\nSelecione o número do arquivo a ser carregado (ou pressione Enter para o mais recente): ").strip()
         
-        if resposta and resposta.isdigit() and 1 <= int(resposta) <= len(arquivos_parquet):
+        if resposta and resposta.isdigit() and 1 <= int(resposta) <= len(snapshots):
             indice = int(resposta) - 1
         else:
             indice = 0  # Usa o mais recente por padrão
         
-        caminho_parquet = arquivos_parquet[indice]
+        caminho_parquet = snapshots[indice]['caminho']
+        if not caminho_parquet.exists():
+            print(f"ERRO: Snapshot removido do diretório 'output': {caminho_parquet.name}")
+            remover_do_manifesto(caminho_parquet)
+            return None
         print(f"\nCarregando arquivo: {caminho_parquet}")
         
+        # Filtros opcionais: apenas as partições, grupos de linhas e colunas necessários são lidos
+        data_inicio = input("Data inicial (AAAA-MM-DD, Enter para todas): ").strip() or None
+        data_fim = input("Data final (AAAA-MM-DD, Enter para todas): ").strip() or None
+        resposta_centros = input("Centros separados por vírgula (Enter para todos): ").strip()
+        centros = [centro.strip() for centro in resposta_centros.split(",") if centro.strip()] or None
+        
+        # Reutiliza as tabelas de um processamento anterior do mesmo snapshot, se houver
+        filtros = {'data_inicio': data_inicio, 'data_fim': data_fim, 'centros': centros}
+        chave = chave_checkpoint(caminho_parquet, filtros)
+        checkpoint = carregar_checkpoint(chave) if chave else None
+        if checkpoint is not None:
+            print("\nSnapshot já processado com as regras atuais. Gerando relatório a partir do checkpoint...")
+            return gerar_relatorio(None, tabelas=checkpoint['tabelas'])
+
+        # Snapshots maiores que a memória disponível são processados grupo de linhas a grupo de linhas
+        if input("Processar em lotes, sem carregar o arquivo inteiro em memória? (s/n): ").strip().lower() == 's':
+            # Em máquinas com vários núcleos os grupos de linhas são distribuídos entre processos
+            resposta_processos = input("Processos paralelos (Enter para automático, 1 para série): ").strip()
+            max_processos = int(resposta_processos) if resposta_processos.isdigit() and int(resposta_processos) > 0 else None
+            tabelas = criar_tabelas_em_paralelo(caminho_parquet, data_inicio=data_inicio, data_fim=data_fim,
+                                                centros=centros, max_processos=max_processos)
+            if not tabelas:
+                print("ERRO: Não foi possível criar as tabelas a partir do arquivo Parquet.")
+                return None
+            if chave:
+                salvar_checkpoint(chave, tabelas)
+            return gerar_relatorio(None, tabelas=tabelas)
+
         # Carrega o arquivo Parquet
-        df_vendas = carregar_do_parquet(caminho_parquet)
+        df_vendas = carregar_do_parquet(caminho_parquet, data_inicio=data_inicio, data_fim=data_fim, centros=centros)
+    elif opcao == "3":
+        # O SQL Server devolve apenas as células (Classificacao, Centro, Ano, Mes) do relatório
+        data_inicio = input("Data inicial (AAAA-MM-DD, Enter para 2023-01-01): ").strip() or '2023-01-01'
+        data_fim = input("Data final (AAAA-MM-DD, Enter para hoje): ").strip() or None
+        verificar = input("Verificar paridade com o processamento local no mesmo período? (s/n): ").strip().lower() == 's'
+        celulas = buscar_celulas_agregadas(data_inicio, data_fim)
+        if celulas is None or celulas.empty:
+            print("ERRO: Nenhuma célula retornada pela agregação no banco de dados.")
+            return None
+        if verificar:
+            divergencias = verificar_paridade(data_inicio, data_fim, celulas_servidor=celulas)
+            if divergencias is None or not divergencias.empty:
+                print("ERRO: A agregação no banco de dados não corresponde ao processamento local.")
+                return None
+        tabelas = montar_tabelas_por_classificacao(celulas)
+        if not tabelas:
+            print("ERRO: Não foi possível criar as tabelas a partir da agregação no banco de dados.")
+            return None
+        return gerar_relatorio(None, tabelas=tabelas)
     else:
         print("Opção inválida. Saindo do programa.")
         return None
     
+    return processar_e_gerar_relatorio(df_vendas, caminho_parquet, filtros)
+
+
+def processar_e_gerar_relatorio(df_vendas, caminho_parquet, filtros, usar_checkpoint=True,
+                                incluir_detalhadas=None, pasta_saida='output'):
+    """
+    Normaliza, classifica e prepara os dados carregados, cria as tabelas por
+    classificação (guardando o checkpoint do snapshot) e gera o relatório.
+    
+    Args:
+        df_vendas (pandas.DataFrame): Dados carregados do Parquet ou do banco de dados.
+        caminho_parquet (pathlib.Path): Snapshot de origem dos dados (None se não houver).
+        filtros (dict): Filtros aplicados na leitura (data_inicio, data_fim, centros).
+        usar_checkpoint (bool): Se False, o checkpoint do snapshot não é gravado.
+        incluir_detalhadas (bool, opcional): Ver gerar_relatorio.
+        pasta_saida (pathlib.Path ou str): Pasta do relatório Excel.
+        
+    Returns:
+        str: Caminho do arquivo Excel gerado, ou None em caso de erro.
+    """
     # Verificar se o DataFrame foi carregado corretamente
     if df_vendas is None or df_vendas.empty:
         print("ERRO: Não foi possível carregar dados do arquivo Parquet ou do banco de dados.")
@@ -132,6 +274,10 @@ def main():
     
     print(f"\nDataFrame carregado com {len(df_vendas)} registros e {len(df_vendas.columns)} colunas.")
     
+    # Datas convertidas uma única vez; as etapas seguintes usam o resultado
+    print("\nNormalizando colunas de data...")
+    df_vendas = normalizar_datas(df_vendas)
+    
     # MODIFICADO: Chamar as funções de classificação e preparação logo após o carregamento
     print("\nClassificando vendas...")
     df_vendas = classificar_vendas(df_vendas)
@@ -148,27 +294,40 @@ def main():
     # Mostrar as colunas disponíveis
     print("\nColunas disponíveis no DataFrame após processamento:")
     for i, coluna in enumerate(df_vendas.columns):
-        print(f"{i+1}. {coluna} ({df_vendas[coluna].dtype})")
+        progresso(f"{i+1}. {coluna} ({df_vendas[coluna].dtype})")
     
-    # Verificar diretamente se a coluna DataExecucao é uma coluna de data
-    if 'DataExecucao' in df_vendas.columns:
-        print("\nVerificando coluna DataExecucao:")
-        try:
-            # Tentar converter DataExecucao para datetime se não for
-            if not pd.api.types.is_datetime64_dtype(df_vendas['DataExecucao']):
-                print("Convertendo DataExecucao para datetime...")
-                # Mostrar exemplos de valores
-                print(f"Exemplos de valores: {df_vendas['DataExecucao'].head(3).tolist()}")
-                
-                # Tentar converter
-                df_vendas['DataExecucao'] = pd.to_datetime(df_vendas['DataExecucao'], errors='coerce')
-                print(f"Conversão realizada. Tipo atual: {df_vendas['DataExecucao'].dtype}")
-        except Exception as e:
-            print(f"Erro ao converter DataExecucao: {e}")
+    # Criar as tabelas e guardar o checkpoint para as próximas execuções
+    print("\nCriando tabelas separadas por classificação (Cardiologia, Imagem, etc.)...")
+    tabelas = criar_tabelas_por_cluster(df_vendas)
+    if tabelas and caminho_parquet is not None and usar_checkpoint:
+        chave = chave_checkpoint(caminho_parquet, filtros)
+        if chave:
+            salvar_checkpoint(chave, tabelas)
+    
+    return gerar_relatorio(df_vendas, tabelas=tabelas or None, incluir_detalhadas=incluir_detalhadas,
+                           pasta_saida=pasta_saida)
+
+
+def gerar_relatorio(df_vendas, tabelas=None, incluir_detalhadas=None, pasta_saida='output'):
+    """
+    Gera o relatório Excel simplificado a partir dos dados preparados ou das tabelas já calculadas.
     
+    Args:
+        df_vendas (pandas.DataFrame): Dados classificados e preparados (pode ser None se tabelas for informado).
+        tabelas (dict, opcional): Tabelas por classificação já calculadas.
+        incluir_detalhadas (bool, opcional): Inclui as tabelas detalhadas no relatório.
+            Se None, a opção é perguntada ao usuário.
+        pasta_saida (pathlib.Path ou str): Pasta do relatório Excel.
+        
+    Returns:
+        str: Caminho do arquivo Excel gerado, ou None em caso de erro.
+    """
     # Gerar o relatório simplificado com as tabelas solicitadas
     print("\nGerando relatório simplificado com tabelas de centro por mês e horas por mês...")
-    caminho_excel = salvar_excel_simplificado(df_vendas)
+    if incluir_detalhadas is None:
+        incluir_detalhadas = input("Incluir também as tabelas detalhadas no relatório? (s/n): ").strip().lower() == 's'
+    caminho_excel = salvar_excel_simplificado(df_vendas, pasta_saida=str(pasta_saida),
+                                              incluir_detalhadas=incluir_detalhadas, tabelas=tabelas)
     
     if caminho_excel:
         print("\n" + "=" * 80)
@@ -180,5 +339,206 @@ def main():
         return None
 
 
+
+def interpretar_argumentos(argumentos=None):
+    """
+    Interpreta as opções da linha de comando.
+    
+    Args:
+        argumentos (list, opcional): Argumentos (padrão: sys.argv[1:]).
+        
+    Returns:
+        argparse.Namespace: Opções informadas (fonte é None no modo interativo).
+    """
+    parser = argparse.ArgumentParser(
+        description="Gera o relatório por classificação. Sem --fonte, as opções são perguntadas interativamente.")
+    parser.add_argument('--fonte', choices=('parquet', 'banco', 'agregado'),
+                        help="Origem dos dados: snapshot Parquet, extração do banco de dados ou "
+                             "agregação no banco de dados (sem transferir as linhas).")
+    parser.add_argument('--snapshot', type=pathlib.Path,
+                        help="Arquivo Parquet ou dataset particionado (fonte parquet). Padrão: o mais recente "
+                             "em output/ que cobre o período de --data-inicio/--data-fim.")
+    parser.add_argument('--query', type=pathlib.Path,
+                        help="Arquivo SQL personalizado (fonte banco). Padrão: a query de vendas.")
+    parser.add_argument('--extracao', choices=('completa', 'incremental', 'paralela'), default='completa',
+                        help="Modo de extração da query padrão (fonte banco). A paralela não aceita "
+                             "--centros nem --particionar.")
+    parser.add_argument('--janela-dias', type=int, default=JANELA_PADRAO_DIAS,
+                        help="Janela de reprocessamento da extração incremental.")
+    parser.add_argument('--conexoes', type=int, default=MAX_CONEXOES_PADRAO,
+                        help="Conexões simultâneas da extração paralela.")
+    parser.add_argument('--particionar', action='store_true',
+                        help="Salva a extração como dataset particionado por Ano/Mês.")
+    parser.add_argument('--particionar-por-centro', action='store_true',
+                        help="Particiona também por Centro (com --particionar).")
+    parser.add_argument('--cache', choices=('usar', 'ignorar', 'atualizar'), default='usar',
+                        help="Uso do cache de consultas na extração.")
+    parser.add_argument('--pular-sem-alteracoes', action='store_true',
+                        help="Reutiliza o último snapshot da mesma consulta quando as tabelas de origem "
+                             "não mudaram no período (extração completa com a query padrão).")
+    parser.add_argument('--data-inicio', help="Data inicial (AAAA-MM-DD).")
+    parser.add_argument('--data-fim', help="Data final (AAAA-MM-DD).")
+    parser.add_argument('--centros', nargs='+', help="Centros considerados (padrão: todos).")
+    parser.add_argument('--lotes', action='store_true',
+                        help="Processa o snapshot em lotes, sem carregá-lo inteiro em memória (fonte parquet).")
+    parser.add_argument('--processos', type=int,
+                        help="Processos paralelos do processamento em lotes (padrão: automático).")
+    parser.add_argument('--verificar-paridade', action='store_true',
+                        help="Compara a agregação no banco de dados com o processamento local (fonte agregado).")
+    parser.add_argument('--sem-checkpoint', action='store_true',
+                        help="Não lê nem grava o checkpoint do snapshot (fonte parquet).")
+    parser.add_argument('--detalhadas', action='store_true',
+                        help="Inclui as tabelas detalhadas no relatório.")
+    parser.add_argument('--saida', type=pathlib.Path, default=pathlib.Path().resolve() / "output",
+                        help="Diretório do relatório Excel, do log de métricas e dos perfis.")
+    parser.add_argument('--silencioso', action='store_true',
+                        help="Sem mensagens por lote e por registro.")
+    parser.add_argument('--perfil', choices=MODOS_PERFIL,
+                        help="Grava o perfil de cada etapa (pontos quentes e pilhas para flame graph) em <saida>/perfis.")
+    parser.add_argument('--intervalo-amostragem', type=float, default=INTERVALO_AMOSTRAGEM_PADRAO * 1000,
+                        help="Milissegundos entre amostras do perfil por amostragem.")
+    args = parser.parse_args(argumentos)
+
+    # O modo interativo não usa as demais opções: informá-las sem --fonte seria ignorado sem aviso
+    if args.fonte is None:
+        informadas = [f"--{nome.replace('_', '-')}" for nome, valor in vars(args).items()
+                      if nome != 'fonte' and valor != parser.get_default(nome)]
+        if informadas:
+            parser.error(f"{', '.join(informadas)} exige --fonte (sem --fonte as opções são perguntadas interativamente)")
+    return args
+
+
+def executar_sem_interacao(args):
+    """
+    Executa o pipeline com as opções da linha de comando, sem perguntas ao usuário.
+    
+    Args:
+        args (argparse.Namespace): Opções retornadas por interpretar_argumentos.
+        
+    Returns:
+        str: Caminho do arquivo Excel gerado, ou None em caso de erro.
+    """
+    print("=" * 80)
+    print(f"Análise Simplificada - Início: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print("=" * 80)
+    
+    filtros = {'data_inicio': args.data_inicio, 'data_fim': args.data_fim, 'centros': args.centros}
+    caminho_parquet = None
+    
+    if args.fonte == 'agregado':
+        data_inicio = args.data_inicio or '2023-01-01'
+        celulas = buscar_celulas_agregadas(data_inicio, args.data_fim)
+        if celulas is None or celulas.empty:
+            print("ERRO: Nenhuma célula retornada pela agregação no banco de dados.")
+            return None
+        if args.verificar_paridade:
+            divergencias = verificar_paridade(data_inicio, args.data_fim, celulas_servidor=celulas)
+            if divergencias is None or not divergencias.empty:
+                print("ERRO: A agregação no banco de dados não corresponde ao processamento local.")
+                return None
+        tabelas = montar_tabelas_por_classificacao(celulas)
+        if not tabelas:
+            print("ERRO: Não foi possível criar as tabelas a partir da agregação no banco de dados.")
+            return None
+        return gerar_relatorio(None, tabelas=tabelas, incluir_detalhadas=args.detalhadas, pasta_saida=args.saida)
+    
+    if args.fonte == 'banco':
+        if args.query is not None and args.extracao != 'completa':
+            print("ERRO: As extrações incremental e paralela usam apenas a query padrão de vendas.")
+            return None
+        if args.extracao == 'paralela' and (args.centros or args.particionar):
+            print("ERRO: A extração paralela não aceita --centros nem --particionar.")
+            return None
+        try:
+            if args.extracao == 'incremental':
+                resultado = buscar_dados_vendas_incremental(janela_dias=args.janela_dias)
+            elif args.extracao == 'paralela':
+                resultado = buscar_dados_vendas_paralelo(data_inicio=args.data_inicio or '2023-01-01',
+                                                         data_fim=args.data_fim,
+                                                         max_conexoes=max(args.conexoes, 1))
+            else:
+                filtros_template = filtros if args.query is None else None
+                resultado = buscar_dados_vendas(caminho_query=args.query, salvar_parquet=True, streaming=True,
+                                                particionar=args.particionar,
+                                                particionar_por_centro=args.particionar and args.particionar_por_centro,
+                                                usar_cache=args.cache != 'ignorar',
+                                                atualizar_cache=args.cache == 'atualizar',
+                                                filtros_template=filtros_template,
+                                                pular_sem_alteracoes=args.pular_sem_alteracoes)
+        except Exception as e:
+            print(f"\nERRO ao criar novo arquivo Parquet: {e}")
+            import traceback
+            traceback.print_exc()
+            return None
+        
+        if resultado is None:
+            print("ERRO: Não foi possível obter os dados do banco de dados.")
+            return None
+        if not (isinstance(resultado, tuple) and len(resultado) == 2):
+            print("ERRO: Dados obtidos do banco de dados, mas o arquivo Parquet não foi salvo.")
+            return None
+        df_vendas, caminho_parquet = resultado
+        # Os filtros já foram aplicados na extração; o snapshot gravado é lido inteiro
+        filtros = {'data_inicio': None, 'data_fim': None, 'centros': None}
+        print(f"\nArquivo Parquet criado com sucesso: {caminho_parquet}")
+    else:
+        caminho_parquet = args.snapshot
+        if caminho_parquet is None:
+            # Snapshot mais recente cuja DataCriacao cobre o período pedido (apenas o manifesto é lido)
+            diretorio_saida = pathlib.Path().resolve() / "output"
+            snapshots = listar_snapshots(diretorio_saida, args.data_inicio, args.data_fim)
+            if not snapshots and (args.data_inicio or args.data_fim):
+                snapshots = listar_snapshots(diretorio_saida)
+                if snapshots:
+                    print("AVISO: Nenhum snapshot cobre todo o período pedido. Usando o mais recente.")
+            if not snapshots:
+                print("ERRO: Nenhum arquivo Parquet encontrado no diretório 'output'.")
+                return None
+            print(f"\nSnapshot selecionado: {descrever_snapshot(snapshots[0])}")
+            caminho_parquet = snapshots[0]['caminho']
+        if not caminho_parquet.exists():
+            print(f"ERRO: Snapshot não encontrado: {caminho_parquet}")
+            return None
+        print(f"\nCarregando arquivo: {caminho_parquet}")
+        
+        chave = None if args.sem_checkpoint else chave_checkpoint(caminho_parquet, filtros)
+        checkpoint = carregar_checkpoint(chave) if chave else None
+        if checkpoint is not None:
+            print("\nSnapshot já processado com as regras atuais. Gerando relatório a partir do checkpoint...")
+            return gerar_relatorio(None, tabelas=checkpoint['tabelas'], incluir_detalhadas=args.detalhadas,
+                                   pasta_saida=args.saida)
+        
+        if args.lotes:
+            tabelas = criar_tabelas_em_paralelo(caminho_parquet, data_inicio=args.data_inicio, data_fim=args.data_fim,
+                                                centros=args.centros, max_processos=args.processos)
+            if not tabelas:
+                print("ERRO: Não foi possível criar as tabelas a partir do arquivo Parquet.")
+                return None
+            if chave:
+                salvar_checkpoint(chave, tabelas)
+            return gerar_relatorio(None, tabelas=tabelas, incluir_detalhadas=args.detalhadas, pasta_saida=args.saida)
+        
+        df_vendas = carregar_do_parquet(caminho_parquet, data_inicio=args.data_inicio, data_fim=args.data_fim,
+                                        centros=args.centros)
+    
+    return processar_e_gerar_relatorio(df_vendas, caminho_parquet, filtros, usar_checkpoint=not args.sem_checkpoint,
+                                       incluir_detalhadas=args.detalhadas, pasta_saida=args.saida)
+
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = interpretar_argumentos()
+    if args.fonte is None:
+        try:
+            main()
+        finally:
+            finalizar_execucao()
+    else:
+        iniciar_execucao(args.saida, silencioso=args.silencioso)
+        perfil = iniciar_perfil(args.perfil, args.intervalo_amostragem / 1000) if args.perfil else None
+        try:
+            caminho_excel = executar_sem_interacao(args)
+        finally:
+            if perfil is not None:
+                encerrar_perfil(perfil, args.saida)
+            finalizar_execucao()
+        sys.exit(0 if caminho_excel else 1)
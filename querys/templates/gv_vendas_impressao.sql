@@ -0,0 +1,37 @@
+-- Impressão digital das tabelas de origem de gv_vendas.sql no período (ver src/change_detection.py)
+-- Cabeçalhos cancelados e linhas de outros tipos entram na contagem: qualquer alteração muda o resultado
+-- @param data_inicio data = 2023-01-01
+-- @param data_fim data = amanha
+SELECT
+    c.Documentos,
+    c.MaxIdCabecalho,
+    c.MaxDataCriacao,
+    c.ChecksumCabecalho,
+    l.Linhas,
+    l.MaxIdLinha,
+    l.ChecksumLinha
+FROM (
+    SELECT
+        COUNT(*) AS Documentos,
+        MAX(cdv.Id) AS MaxIdCabecalho,
+        MAX(cdv.DataCriacao) AS MaxDataCriacao,
+        CHECKSUM_AGG(BINARY_CHECKSUM(cdv.Id, cdv.Serie, cdv.Numero, cdv.Data, cdv.DataCriacao, cdv.Estado,
+                                     cdv.NumeroCliente, cdv.NumeroAnimal, cdv.IdEmpresa, cdv.IdCentro)) AS ChecksumCabecalho
+    FROM GV_CabecalhoDocumentoVenda cdv
+    WHERE cdv.Documento = 'FAT'
+      AND cdv.Data >= :data_inicio
+      AND cdv.Data < :data_fim
+) c
+CROSS JOIN (
+    SELECT
+        COUNT(*) AS Linhas,
+        MAX(ldv.Id) AS MaxIdLinha,
+        CHECKSUM_AGG(BINARY_CHECKSUM(ldv.Id, ldv.IdCabecalhoDocumentoVenda, ldv.TipoLinha, ldv.NumeroProduto,
+                                     ldv.Quantidade, ldv.PV, ldv.ValorTotal, ldv.SubTotalDescontos,
+                                     ldv.NumeroAnimal, ldv.IdLinhaCarrinhoVendas)) AS ChecksumLinha
+    FROM GV_LinhaDocumentoVenda ldv
+    INNER JOIN GV_CabecalhoDocumentoVenda cdv ON cdv.Id = ldv.IdCabecalhoDocumentoVenda
+    WHERE cdv.Documento = 'FAT'
+      AND cdv.Data >= :data_inicio
+      AND cdv.Data < :data_fim
+) l
@@ -5,11 +5,15 @@ from src.data_processing import classificar_vendas, preparar_dados
 import pandas as pd
 import os
 from datetime import datetime
+from src.report_writer import escrever_excel
+from src.date_normalization import normalizar_datas, remover_fuso_texto
+from src.metrics import etapa, progresso
 
 def converter_colunas_data(df):
     """
     Converte todas as colunas de data para formato sem timezone.
-    Versão melhorada para garantir a remoção do timezone.
+    Usa a etapa única de normalização (src.date_normalization): colunas já
+    normalizadas não são convertidas novamente.
     
     Args:
         df (pandas.DataFrame): DataFrame com colunas de data.
@@ -20,48 +24,7 @@ def converter_colunas_data(df):
     if df is None or df.empty:
         return df
     
-    df_convertido = df.copy()
-    
-    # Listar colunas com timezone para debug
-    colunas_com_tz = []
-    
-    # Procurar por todas as colunas datetime
-    for coluna in df_convertido.columns:
-        if pd.api.types.is_datetime64_dtype(df_convertido[coluna]):
-            # Verificar se a coluna tem timezone
-            if hasattr(df_convertido[coluna].dt, 'tz') and df_convertido[coluna].dt.tz is not None:
-                print(f"Removendo timezone da coluna {coluna}")
-                colunas_com_tz.append(coluna)
-                # Usando método explícito de conversão para remover timezone
-                df_convertido[coluna] = df_convertido[coluna].dt.tz_localize(None)
-    
-    # Verificação específica para DataExecucao que está causando problemas
-    if 'DataExecucao' in df_convertido.columns and pd.api.types.is_datetime64_dtype(df_convertido['DataExecucao']):
-        if hasattr(df_convertido['DataExecucao'].dt, 'tz') and df_convertido['DataExecucao'].dt.tz is not None:
-            print("Verificando conversão de timezone para DataExecucao usando método alternativo")
-            # Usando um método alternativo se o primeiro falhar
-            try:
-                # Primeiro método: converter para string e depois para datetime
-                df_convertido['DataExecucao'] = df_convertido['DataExecucao'].astype(str)
-                df_convertido['DataExecucao'] = pd.to_datetime(df_convertido['DataExecucao'], errors='coerce', utc=False)
-            except:
-                # Segundo método: valor nulo
-                print("Não foi possível converter DataExecucao. Substituindo por valores nulos.")
-                df_convertido['DataExecucao'] = pd.NaT
-    
-    # Verificação final para garantir que não há timezone em nenhuma coluna
-    for coluna in df_convertido.columns:
-        if pd.api.types.is_datetime64_dtype(df_convertido[coluna]):
-            if hasattr(df_convertido[coluna].dt, 'tz') and df_convertido[coluna].dt.tz is not None:
-                print(f"ALERTA: Coluna {coluna} ainda possui timezone. Convertendo para string.")
-                # Se ainda tiver timezone, converter para string como último recurso
-                df_convertido[coluna] = df_convertido[coluna].astype(str)
-    
-    # Informar as colunas que foram convertidas
-    if colunas_com_tz:
-        print(f"Colunas com timezone convertidas: {', '.join(colunas_com_tz)}")
-    
-    return df_convertido
+    return normalizar_datas(df.copy(), derivar_periodo=False)
 
 """
 Função criar_tabela_unidade_por_mes corrigida para garantir que Ano e Mês sejam inteiros
@@ -96,11 +59,11 @@ def criar_tabela_unidade_por_mes(df):
     print(f"Primeiros valores de Ano: {df['Ano'].head(3).tolist()}")
     
     # Agrupar por centro, ano e mês para contagem - garantindo que são inteiros antes
-    tabela_contagem = df.groupby([centro_col, 'Ano', 'Mes']).size().reset_index(name='Contagem')
+    tabela_contagem = df.groupby([centro_col, 'Ano', 'Mes'], observed=True).size().reset_index(name='Contagem')
     
     # Criar coluna de período para melhor visualização - COM VERIFICAÇÃO DE TIPO
     # Use str() explicitamente para converter para string antes de concatenar
-    tabela_contagem['Periodo'] = tabela_contagem['Ano'].apply(lambda x: str(int(x))) + '-' + tabela_contagem['Mes'].apply(lambda x: str(int(x)).zfill(2))
+    tabela_contagem = _adicionar_periodo(tabela_contagem)
     
     # Ordenar por período
     tabela_contagem = tabela_contagem.sort_values(['Ano', 'Mes', centro_col]).reset_index(drop=True)
@@ -183,12 +146,12 @@ def criar_tabela_horas_por_mes(df):
             hora_col = 'temp_valor'
     
     # Agrupar por centro, ano e mês para soma de horas
-    tabela_horas = df.groupby([centro_col, 'Ano', 'Mes']).agg({
+    tabela_horas = df.groupby([centro_col, 'Ano', 'Mes'], observed=True).agg({
         hora_col: 'sum'
     }).reset_index()
     
     # Criar coluna de período para melhor visualização - COM VERIFICAÇÃO DE TIPO
-    tabela_horas['Periodo'] = tabela_horas['Ano'].apply(lambda x: str(int(x))) + '-' + tabela_horas['Mes'].apply(lambda x: str(int(x)).zfill(2))
+    tabela_horas = _adicionar_periodo(tabela_horas)
     
     # Ordenar por período
     tabela_horas = tabela_horas.sort_values(['Ano', 'Mes', centro_col]).reset_index(drop=True)
@@ -201,7 +164,8 @@ def criar_tabela_horas_por_mes(df):
     
     return tabela_horas
 
-def salvar_excel_simplificado(df, pasta_saida='output'):
+def salvar_excel_simplificado(df, pasta_saida='output', incluir_detalhadas=False, motor_excel='auto',
+                              tabelas=None):
     """
     Função que salva as tabelas em Excel, com abas separadas por classificação.
     Assume que df já foi classificado e preparado com horas.
@@ -209,6 +173,12 @@ def salvar_excel_simplificado(df, pasta_saida='output'):
     Args:
         df (pandas.DataFrame): DataFrame com os dados já classificados e preparados.
         pasta_saida (str): Pasta onde o arquivo será salvo.
+        incluir_detalhadas (bool): Se True, grava também as tabelas detalhadas
+            (contagem_detalhada e horas_detalhadas) de cada classificação.
+        motor_excel (str): Motor de escrita do Excel (ver src.report_writer.MOTORES_EXCEL).
+            O padrão grava as linhas em disco com memória constante.
+        tabelas (dict, opcional): Tabelas por classificação já calculadas (ex.: de um
+            checkpoint). Quando informado, df não é utilizado.
     
     Returns:
         str: Caminho do arquivo Excel salvo.
@@ -224,21 +194,29 @@ def salvar_excel_simplificado(df, pasta_saida='output'):
     arquivo_excel = os.path.join(pasta_saida, f'relatorio_por_classificacao_{timestamp}.xlsx')
     
     try:
-        # Verificar se as colunas essenciais já existem
-        if 'Classificacao' not in df.columns:
-            print("AVISO: Coluna 'Classificacao' não encontrada. O DataFrame deve ser classificado antes.")
-            return None
+        if tabelas is not None:
+            print("Usando tabelas por classificação já calculadas.")
+            tabelas_por_classificacao = tabelas
+        else:
+            # Verificar se as colunas essenciais já existem
+            if 'Classificacao' not in df.columns:
+                print("AVISO: Coluna 'Classificacao' não encontrada. O DataFrame deve ser classificado antes.")
+                return None
+                
+            if 'hora' not in df.columns:
+                print("AVISO: Coluna 'hora' não encontrada. O DataFrame deve ser preparado antes.")
+                return None
             
-        if 'hora' not in df.columns:
-            print("AVISO: Coluna 'hora' não encontrada. O DataFrame deve ser preparado antes.")
-            return None
+            # Criar as tabelas por classificação
+            print("Criando tabelas separadas por classificação (Cardiologia, Imagem, etc.)...")
+            tabelas_por_classificacao = criar_tabelas_por_cluster(df)
         
         # Remover timezones para evitar problemas
         df_limpo = df
         
-        # Criar as tabelas por classificação
-        print("Criando tabelas separadas por classificação (Cardiologia, Imagem, etc.)...")
-        tabelas_por_classificacao = criar_tabelas_por_cluster(df_limpo)
+        if not tabelas_por_classificacao and df_limpo is None:
+            print("AVISO: Nenhuma tabela por classificação disponível para o relatório.")
+            return None
         
         if not tabelas_por_classificacao:
             print("AVISO: Não foi possível criar tabelas por classificação. Usando método anterior...")
@@ -249,37 +227,38 @@ def salvar_excel_simplificado(df, pasta_saida='output'):
             tabela_horas_pivot = formatar_tabela_pivot(tabela_horas, 'Total_Horas')
             
             # Salvar em Excel
-            with pd.ExcelWriter(arquivo_excel, engine='openpyxl') as writer:
-                if tabela_unidades_pivot is not None:
-                    tabela_unidades_pivot.to_excel(writer, sheet_name='Contagem_por_Periodo', index=False)
-                    print("Tabela 'Contagem por Período' salva com sucesso.")
-                
-                if tabela_horas_pivot is not None:
-                    tabela_horas_pivot.to_excel(writer, sheet_name='Horas_por_Periodo', index=False)
-                    print("Tabela 'Horas por Período' salva com sucesso.")
+            abas = []
+            if tabela_unidades_pivot is not None:
+                abas.append(('Contagem_por_Periodo', tabela_unidades_pivot))
+            if tabela_horas_pivot is not None:
+                abas.append(('Horas_por_Periodo', tabela_horas_pivot))
+            escrever_excel(arquivo_excel, abas, motor=motor_excel)
             
             print(f"Relatório simplificado salvo em: {arquivo_excel}")
             return arquivo_excel
         
         # Salvar em Excel com abas por classificação
         print(f"\nCriando arquivo Excel com abas por classificação: {arquivo_excel}")
-        with pd.ExcelWriter(arquivo_excel, engine='openpyxl') as writer:
-            # Salvar cada conjunto de tabelas em abas separadas por classificação
-            for classificacao, tabelas in tabelas_por_classificacao.items():
-                # Limitar o nome da classificação para evitar problemas com nomes de abas
-                classificacao_abreviada = str(classificacao)[:15].replace('/', '_').replace('\\', '_')
-                
-                # Salvar a tabela de contagem pivotada
-                if 'contagem' in tabelas and tabelas['contagem'] is not None:
-                    nome_aba = f"{classificacao_abreviada}_Contagem"
-                    tabelas['contagem'].to_excel(writer, sheet_name=nome_aba, index=False)
-                    print(f"Tabela de contagem para '{classificacao}' salva na aba '{nome_aba}'.")
-                
-                # Salvar a tabela de horas pivotada
-                if 'horas' in tabelas and tabelas['horas'] is not None:
-                    nome_aba = f"{classificacao_abreviada}_Horas"
-                    tabelas['horas'].to_excel(writer, sheet_name=nome_aba, index=False)
-                    print(f"Tabela de horas para '{classificacao}' salva na aba '{nome_aba}'.")
+        # Montar a lista de abas: cada conjunto de tabelas em abas separadas por classificação
+        abas = []
+        for classificacao, tabelas in tabelas_por_classificacao.items():
+            # Limitar o nome da classificação para evitar problemas com nomes de abas
+            classificacao_abreviada = str(classificacao)[:15].replace('/', '_').replace('\\', '_')
+            
+            # Tabelas pivotadas de contagem e horas
+            if 'contagem' in tabelas and tabelas['contagem'] is not None:
+                abas.append((f"{classificacao_abreviada}_Contagem", tabelas['contagem']))
+            if 'horas' in tabelas and tabelas['horas'] is not None:
+                abas.append((f"{classificacao_abreviada}_Horas", tabelas['horas']))
+            
+            # Tabelas detalhadas (formato longo), opcionais
+            if incluir_detalhadas:
+                if tabelas.get('contagem_detalhada') is not None:
+                    abas.append((f"{classificacao_abreviada}_ContDet", tabelas['contagem_detalhada']))
+                if tabelas.get('horas_detalhadas') is not None:
+                    abas.append((f"{classificacao_abreviada}_HorasDet", tabelas['horas_detalhadas']))
+        
+        escrever_excel(arquivo_excel, abas, motor=motor_excel)
         
         print(f"\nRelatório por classificação salvo em: {arquivo_excel}")
         return arquivo_excel
@@ -324,6 +303,10 @@ def remover_todos_timezones(df):
     Tratamento específico para o formato '2023-03-09 04:40:17 -03'.
     Corrige o problema de formatação do ano (2,023).
     
+    As colunas de data conhecidas passam pela etapa única de normalização
+    (src.date_normalization); nas demais colunas de texto que parecem datas o
+    deslocamento de fuso é removido com operações vetorizadas.
+    
     Args:
         df (pandas.DataFrame): O DataFrame original
         
@@ -331,191 +314,136 @@ def remover_todos_timezones(df):
         pandas.DataFrame: DataFrame limpo sem nenhum timezone
     """
     # Criar uma cópia para não modificar o original
-    df_limpo = df.copy()
-    
-    # Primeiro, converter qualquer coluna datetime com timezone para objeto (string)
-    print("Convertendo todas as colunas datetime com timezone para string...")
-    for coluna in df_limpo.columns:
-        if pd.api.types.is_datetime64_dtype(df_limpo[coluna]):
-            if hasattr(df_limpo[coluna].dt, 'tz') and df_limpo[coluna].dt.tz is not None:
-                print(f"  - Convertendo {coluna} para string")
-                df_limpo[coluna] = df_limpo[coluna].dt.strftime('%Y-%m-%d %H:%M:%S')
-    
-    # Para colunas que são do tipo objeto (string), verificar se contêm datas com timezone
-    # e tratá-las especificamente
+    df_limpo = normalizar_datas(df.copy())
+    
+    # Para colunas de texto fora da normalização, verificar se contêm datas com timezone
     print("Verificando colunas de texto para formatos de data com timezone...")
     colunas_processadas = []
     
-    for coluna in df_limpo.select_dtypes(include=['object']).columns:
-        # Amostra para verificar se parece com data
-        amostra = df_limpo[coluna].dropna().head(5).tolist()
-        parece_data = False
-        
-        if amostra:
-            for valor in amostra:
-                if isinstance(valor, str) and ('-03' in valor or '+00' in valor or 'GMT' in valor):
-                    parece_data = True
-                    break
-        
-        if parece_data:
-            print(f"  - Processando {coluna} com formato específico de data")
-            # Tentar remover o timezone mantendo apenas a data e hora
-            try:
-                # Para o formato específico '2023-03-09 04:40:17 -03'
-                def limpar_data(texto):
-                    if not isinstance(texto, str):
-                        return texto
-                    
-                    # Remover a parte do timezone
-                    if ' -03' in texto:
-                        return texto.split(' -03')[0]
-                    elif ' +00' in texto:
-                        return texto.split(' +00')[0]
-                    elif ' GMT' in texto:
-                        return texto.split(' GMT')[0]
-                    return texto
-                
-                df_limpo[coluna] = df_limpo[coluna].apply(limpar_data)
-                colunas_processadas.append(coluna)
-            except Exception as e:
-                print(f"    Erro ao processar {coluna}: {e}")
-    
-    # Verificar DataExecucao novamente, caso ainda seja um problema
-    if 'DataExecucao' in df_limpo.columns:
-        if pd.api.types.is_datetime64_dtype(df_limpo['DataExecucao']):
-            print("Tratamento especial para DataExecucao")
-            df_limpo['DataExecucao'] = df_limpo['DataExecucao'].astype(str)
-    
-    # Verificar DataCriacao, caso exista
-    if 'DataCriacao' in df_limpo.columns:
-        print("Tratamento especial para DataCriacao")
-        if not pd.api.types.is_datetime64_dtype(df_limpo['DataCriacao']):
-            # Se for string, extrair Ano e Mês
-            try:
-                # Primeiro verifica se tem o formato específico "2023-03-09 04:40:17 -03"
-                amostra = df_limpo['DataCriacao'].iloc[0] if not df_limpo['DataCriacao'].empty else ""
-                if isinstance(amostra, str) and '-03' in amostra:
-                    print(f"  - Formato detectado: '2023-03-09 04:40:17 -03'")
-                    # Extrai apenas a parte da data, ignorando o timezone
-                    df_limpo['DataCriacao'] = df_limpo['DataCriacao'].apply(
-                        lambda x: str(x).split(' -03')[0] if isinstance(x, str) and ' -03' in x else x
-                    )
-                    
-                # Agora tenta converter para datetime
-                df_limpo['DataCriacao'] = pd.to_datetime(df_limpo['DataCriacao'], errors='coerce')
-            except Exception as e:
-                print(f"  - Erro ao processar DataCriacao: {e}")
-    
-    # Adicionar colunas Ano e Mês garantindo que sejam inteiros
-    if 'DataCriacao' in df_limpo.columns:
-        try:
-            if pd.api.types.is_datetime64_dtype(df_limpo['DataCriacao']):
-                # Extrair ano e mês da coluna datetime e garantir que sejam inteiros
-                df_limpo['Ano'] = df_limpo['DataCriacao'].dt.year.astype('int32')  # Forçar como inteiro
-                df_limpo['Mes'] = df_limpo['DataCriacao'].dt.month.astype('int32')  # Forçar como inteiro
-                print(f"  - Ano e Mês extraídos de DataCriacao. Amostra Ano: {df_limpo['Ano'].head(3).tolist()}")
-            else:
-                # Se ainda for string, fazer extração baseada em texto
-                def extrair_ano(texto):
-                    if isinstance(texto, str) and len(texto) >= 4:
-                        try:
-                            return int(texto[:4])  # Garantir que é inteiro
-                        except:
-                            return 2023  # Valor padrão
-                    return 2023  # Valor padrão
-                
-                def extrair_mes(texto):
-                    if isinstance(texto, str) and len(texto) >= 7 and texto[4] == '-':
-                        try:
-                            return int(texto[5:7])  # Garantir que é inteiro
-                        except:
-                            return 1  # Valor padrão
-                    return 1  # Valor padrão
-                
-                df_limpo['Ano'] = df_limpo['DataCriacao'].apply(extrair_ano)
-                df_limpo['Mes'] = df_limpo['DataCriacao'].apply(extrair_mes)
-                print(f"  - Ano e Mês extraídos de texto. Amostra Ano: {df_limpo['Ano'].head(3).tolist()}")
-        except Exception as e:
-            print(f"Erro ao extrair Ano e Mês: {e}")
-            df_limpo['Ano'] = 2023  # Valor padrão como inteiro
-            df_limpo['Mes'] = 1  # Valor padrão como inteiro
+    for coluna in df_limpo.select_dtypes(include=['object', 'string']).columns:
+        amostra = df_limpo[coluna].dropna().head(5).astype(str)
+        if amostra.str.contains(r'-03|\+00|GMT').any():
+            progresso(f"  - Processando {coluna} com formato específico de data")
+            df_limpo[coluna] = remover_fuso_texto(df_limpo[coluna].astype('string')).astype(object)
+            colunas_processadas.append(coluna)
     
-    # Garantir que Ano e Mês sejam inteiros se já existirem no DataFrame
-    if 'Ano' in df_limpo.columns:
-        try:
-            # Converter para int32 para evitar formatação com vírgula
-            df_limpo['Ano'] = pd.to_numeric(df_limpo['Ano'], errors='coerce').fillna(2023).astype('int32')
-            print(f"  - Coluna Ano convertida para inteiro. Amostra: {df_limpo['Ano'].head(3).tolist()}")
-        except Exception as e:
-            print(f"  - Erro ao converter Ano para inteiro: {e}")
-    
-    if 'Mes' in df_limpo.columns:
-        try:
-            # Converter para int32 para garantir que seja inteiro
-            df_limpo['Mes'] = pd.to_numeric(df_limpo['Mes'], errors='coerce').fillna(1).astype('int32')
-        except Exception as e:
-            print(f"  - Erro ao converter Mes para inteiro: {e}")
+    # Garantir que Ano e Mês sejam inteiros (evita a formatação com vírgula)
+    for coluna, padrao in (('Ano', 2023), ('Mes', 1)):
+        if coluna in df_limpo.columns:
+            df_limpo[coluna] = pd.to_numeric(df_limpo[coluna], errors='coerce').fillna(padrao).astype('int32')
     
     print(f"Processamento concluído. Colunas tratadas: {colunas_processadas}")
-    return df_limpo      
+    return df_limpo
 
-def criar_tabelas_por_cluster(df):
+def resolver_coluna_centro(df):
     """
-    Cria tabelas separadas para cada classificação (Cardiologia, Imagem, etc.)
-    Assume que o DataFrame já possui as colunas 'Classificacao' e 'hora'.
+    Identifica a coluna que representa o centro (unidade) no DataFrame.
     
     Args:
-        df (pandas.DataFrame): DataFrame com os dados já classificados e preparados
+        df (pandas.DataFrame): DataFrame com os dados classificados.
         
     Returns:
-        dict: Dicionário com DataFrames para cada classificação
+        str: Nome da coluna de centro ('Classificacao' se nenhuma for encontrada).
     """
-    # Inicializar o dicionário de tabelas
-    tabelas_por_classificacao = {}
+    if 'Centro' in df.columns:
+        return 'Centro'
+    possiveis_colunas = [col for col in df.columns if 'centr' in col.lower() or 'unit' in col.lower()]
+    if possiveis_colunas:
+        print(f"Usando coluna alternativa: {possiveis_colunas[0]}")
+        return possiveis_colunas[0]
+    print("Nenhuma coluna de centro encontrada. Usando 'Classificacao' como substituto.")
+    return 'Classificacao'
+
+def formatar_rotulo_periodo(chaves):
+    """
+    Converte chaves inteiras de período (AAAAMM) em rótulos 'AAAA-MM'.
     
-    # Verificar se df é None
-    if df is None or df.empty:
-        print("AVISO: DataFrame vazio ou None fornecido para criar_tabelas_por_cluster.")
-        return tabelas_por_classificacao
+    Args:
+        chaves (array-like): Chaves de período no formato AAAAMM.
+        
+    Returns:
+        pandas.Index: Rótulos formatados.
+    """
+    chaves = pd.Index(chaves).astype('int64')
+    return (chaves // 100).astype(str) + '-' + (chaves % 100).astype(str).str.zfill(2)
+
+def _chave_periodo(tabela):
+    """Chaves inteiras de período (AAAAMM) das colunas Ano e Mes de uma tabela."""
+    return (tabela['Ano'].astype('int64') * 100 + tabela['Mes'].astype('int64')).astype('int32')
+
+def _adicionar_periodo(tabela):
+    """
+    Adiciona a coluna 'Periodo' (AAAA-MM) a uma tabela agregada com as colunas Ano e Mes.
     
-    # Limpar e remover timezones
-    df_limpo = df.copy()
+    Args:
+        tabela (pandas.DataFrame): Tabela agregada.
+        
+    Returns:
+        pandas.DataFrame: Tabela com a coluna 'Periodo'.
+    """
+    tabela['Periodo'] = formatar_rotulo_periodo(_chave_periodo(tabela))
+    return tabela
+
+@etapa('agregar')
+def agregar_por_classificacao(df):
+    """
+    Calcula a contagem de registros e a soma de horas de todas as células
+    (Classificacao, Centro, Ano, Mes) em um único groupby.
     
-    # Verificar se existem as colunas necessárias
-    colunas_obrigatorias = ['Classificacao', 'hora']
-    for coluna in colunas_obrigatorias:
-        if coluna not in df_limpo.columns:
-            print(f"AVISO: Coluna '{coluna}' não encontrada. DataFrame deve ser processado previamente.")
-            return {}
+    Args:
+        df (pandas.DataFrame): DataFrame com as colunas 'Classificacao', 'hora', 'Ano' e 'Mes'.
+        
+    Returns:
+        pandas.DataFrame: Tabela com as colunas Classificacao, Centro, Ano, Mes, Contagem e Total_Horas.
+    """
+    centro_col = resolver_coluna_centro(df)
+    chaves = ['Classificacao', 'Ano', 'Mes'] if centro_col == 'Classificacao' else ['Classificacao', centro_col, 'Ano', 'Mes']
     
-    # Identificar todas as classificações únicas
-    classificacoes = sorted(df_limpo['Classificacao'].dropna().unique())
+    agregado = df.groupby(chaves, sort=True, observed=True).agg(
+        Contagem=('hora', 'size'),
+        Total_Horas=('hora', 'sum')
+    ).reset_index()
     
-    print(f"Classificações identificadas: {classificacoes}")
+    # Chaves categóricas voltam a texto para que as tabelas sigam a ordem alfabética
+    for coluna in chaves:
+        if isinstance(agregado[coluna].dtype, pd.CategoricalDtype):
+            agregado[coluna] = agregado[coluna].astype(object)
     
-    # Criar tabelas separadas para cada classificação
-    tabelas_por_classificacao = {}
+    if centro_col == 'Classificacao':
+        agregado.insert(1, 'Centro', agregado['Classificacao'])
+    else:
+        agregado.rename(columns={centro_col: 'Centro'}, inplace=True)
     
-    for classificacao in classificacoes:
-        print(f"\nProcessando classificação: {classificacao}")
-        
-        # Filtrar dados pela classificação
-        df_classificado = df_limpo[df_limpo['Classificacao'] == classificacao].copy()
-        
-        if df_classificado.empty:
-            print(f"AVISO: Não há dados para a classificação '{classificacao}'. Ignorando.")
-            continue
+    print(f"Agregação por classificação, centro e mês concluída: {len(agregado)} células.")
+    return agregado
+
+@etapa('pivotar')
+def montar_tabelas_por_classificacao(agregado):
+    """
+    Monta as tabelas de contagem e horas de cada classificação a partir das
+    células agregadas por agregar_por_classificacao.
+    
+    Args:
+        agregado (pandas.DataFrame): Tabela com as colunas Classificacao, Centro, Ano, Mes, Contagem e Total_Horas.
         
-        print(f"Registros para a classificação '{classificacao}': {len(df_classificado)}")
+    Returns:
+        dict: Dicionário com DataFrames para cada classificação
+    """
+    tabelas_por_classificacao = {}
+    
+    for classificacao, celulas in agregado.groupby('Classificacao', sort=True, observed=True):
+        progresso(f"\nProcessando classificação: {classificacao}")
+        progresso(f"Registros para a classificação '{classificacao}': {int(celulas['Contagem'].sum())}")
         
-        # Criar tabelas para esta classificação
         try:
+            celulas = celulas.sort_values(['Ano', 'Mes', 'Centro']).reset_index(drop=True)
+            
             # Tabela de contagem
-            tabela_unidades = criar_tabela_unidade_por_mes(df_classificado)
+            tabela_unidades = _adicionar_periodo(celulas[['Centro', 'Ano', 'Mes', 'Contagem']].copy())
             tabela_unidades_pivot = formatar_tabela_pivot(tabela_unidades, 'Contagem')
             
             # Tabela de horas
-            tabela_horas = criar_tabela_horas_por_mes(df_classificado)
+            tabela_horas = _adicionar_periodo(celulas[['Centro', 'Ano', 'Mes', 'Total_Horas']].copy())
             tabela_horas_pivot = formatar_tabela_pivot(tabela_horas, 'Total_Horas')
             
             # Armazenar no dicionário
@@ -526,7 +454,7 @@ def criar_tabelas_por_cluster(df):
                 'horas_detalhadas': tabela_horas
             }
             
-            print(f"Tabelas criadas para a classificação '{classificacao}' com sucesso.")
+            progresso(f"Tabelas criadas para a classificação '{classificacao}' com sucesso.")
         except Exception as e:
             print(f"ERRO ao criar tabelas para a classificação '{classificacao}': {e}")
             import traceback
@@ -534,12 +462,47 @@ def criar_tabelas_por_cluster(df):
     
     return tabelas_por_classificacao
 
+def criar_tabelas_por_cluster(df):
+    """
+    Cria tabelas separadas para cada classificação (Cardiologia, Imagem, etc.)
+    Assume que o DataFrame já possui as colunas 'Classificacao' e 'hora'.
+    
+    A contagem e as horas de todas as classificações são calculadas em uma
+    única agregação; as tabelas de cada classificação são recortes do
+    resultado agregado.
+    
+    Args:
+        df (pandas.DataFrame): DataFrame com os dados já classificados e preparados
+        
+    Returns:
+        dict: Dicionário com DataFrames para cada classificação
+    """
+    # Verificar se df é None
+    if df is None or df.empty:
+        print("AVISO: DataFrame vazio ou None fornecido para criar_tabelas_por_cluster.")
+        return {}
+    
+    # Verificar se existem as colunas necessárias
+    colunas_obrigatorias = ['Classificacao', 'hora']
+    for coluna in colunas_obrigatorias:
+        if coluna not in df.columns:
+            print(f"AVISO: Coluna '{coluna}' não encontrada. DataFrame deve ser processado previamente.")
+            return {}
+    
+    # Identificar todas as classificações únicas
+    classificacoes = sorted(df['Classificacao'].dropna().unique())
+    print(f"Classificações identificadas: {classificacoes}")
+    
+    agregado = agregar_por_classificacao(df)
+    return montar_tabelas_por_classificacao(agregado)
+
 def formatar_tabela_pivot(df_tabela, valor_col='Contagem'):
     """
     Reformata uma tabela para ter unidades como linhas e períodos como colunas.
     
     Args:
-        df_tabela (pandas.DataFrame): DataFrame com as colunas 'Centro', 'Ano', 'Mes', 'Periodo' e uma coluna de valor
+        df_tabela (pandas.DataFrame): DataFrame com as colunas 'Centro', 'Ano', 'Mes', 'Periodo' e uma coluna de valor.
+            Com Ano e Mes, o pivot é feito sobre as chaves inteiras AAAAMM.
         valor_col (str): Nome da coluna que contém os valores (ex: 'Contagem' ou 'Total_Horas')
         
     Returns:
@@ -557,31 +520,44 @@ def formatar_tabela_pivot(df_tabela, valor_col='Contagem'):
             print(f"ERRO: Coluna '{col}' não encontrada na tabela.")
             return df_tabela  # Retorna a tabela original se faltarem colunas
     
-    # Converter para formato pivotado usando pandas pivot_table
+    # Converter para formato pivotado
     try:
-        print(f"Reformatando tabela para ter períodos como colunas...")
-        tabela_pivot = df_tabela.pivot_table(
-            index='Centro',
-            columns='Periodo',
-            values=valor_col,
-            aggfunc='sum',
-            fill_value=0
-        ).reset_index()
+        progresso(f"Reformatando tabela para ter períodos como colunas...")
+        pivot_por_chave = 'Ano' in df_tabela.columns and 'Mes' in df_tabela.columns
+        if pivot_por_chave:
+            # Pivot por unstack sobre chaves inteiras; os rótulos são formatados só no final
+            indice = pd.MultiIndex.from_arrays([df_tabela['Centro'], _chave_periodo(df_tabela)],
+                                               names=['Centro', 'PeriodoChave'])
+            valores = pd.Series(df_tabela[valor_col].to_numpy(), index=indice)
+            if not valores.index.is_unique:
+                valores = valores.groupby(level=['Centro', 'PeriodoChave'], observed=True).sum()
+            tabela_pivot = valores.sort_index().unstack('PeriodoChave', fill_value=0)
+            tabela_pivot.columns = pd.Index(formatar_rotulo_periodo(tabela_pivot.columns), name='Periodo')
+            tabela_pivot = tabela_pivot.reset_index()
+        else:
+            tabela_pivot = df_tabela.pivot_table(
+                index='Centro',
+                columns='Periodo',
+                values=valor_col,
+                aggfunc='sum',
+                fill_value=0
+            ).reset_index()
         
         # Verificar se há colunas além de 'Centro'
         if len(tabela_pivot.columns) <= 1:
             print("AVISO: Não há períodos para formatar como colunas.")
             return df_tabela
         
-        # Ordenar as colunas de período cronologicamente
         colunas_periodo = [col for col in tabela_pivot.columns if col != 'Centro']
-        colunas_periodo.sort()  # Ordem alfanumérica ordenará 2023-01, 2023-02, etc.
-        
-        # Reorganizar as colunas: primeiro Centro, depois períodos ordenados
-        colunas_ordenadas = ['Centro'] + colunas_periodo
-        tabela_pivot = tabela_pivot[colunas_ordenadas]
+        if not pivot_por_chave:
+            # Ordenar as colunas de período cronologicamente
+            colunas_periodo.sort()  # Ordem alfanumérica ordenará 2023-01, 2023-02, etc.
+            
+            # Reorganizar as colunas: primeiro Centro, depois períodos ordenados
+            colunas_ordenadas = ['Centro'] + colunas_periodo
+            tabela_pivot = tabela_pivot[colunas_ordenadas]
         
-        print(f"Tabela reformatada com sucesso: {len(tabela_pivot)} linhas, {len(colunas_periodo)} períodos.")
+        progresso(f"Tabela reformatada com sucesso: {len(tabela_pivot)} linhas, {len(colunas_periodo)} períodos.")
         return tabela_pivot
     
     except Exception as e:
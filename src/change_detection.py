@@ -0,0 +1,107 @@
+"""
+Módulo de detecção de alterações nas tabelas de origem das vendas.
+
+Antes de uma extração completa, uma consulta leve (querys/templates/
+gv_vendas_impressao.sql) calcula a impressão digital das tabelas de origem no
+período: quantidade de documentos e de linhas, maiores Id e DataCriacao e
+CHECKSUM_AGG de GV_CabecalhoDocumentoVenda e GV_LinhaDocumentoVenda. A
+impressão é guardada no registro do snapshot gravado (manifesto de
+snapshots); se a próxima extração com o mesmo escopo (mesma query e mesmos
+filtros além do período) encontrar a mesma impressão, o snapshot existente é
+reutilizado sem extrair os dados novamente. As datas não precisam coincidir:
+a impressão já cobre o período, de modo que uma atualização diária com o fim
+padrão (amanhã) é dispensada enquanto nada mudar.
+
+A impressão cobre apenas as tabelas de documentos e linhas: alterações
+somente em cadastros (preços, descrições de produtos, clientes) não são
+detectadas, e o CHECKSUM_AGG admite colisões raras. Nesses casos a extração
+deve ser feita sem a verificação.
+"""
+
+import sys
+import pathlib
+import traceback
+from datetime import date, datetime
+from decimal import Decimal
+
+from src import query_templates, snapshot_manifest
+from src.metrics import etapa
+
+CAMINHO_QUERY_IMPRESSAO = pathlib.Path("querys") / "templates" / "gv_vendas_impressao.sql"
+
+def _valor_serializavel(valor):
+    """Converte um valor retornado pelo banco em um valor gravável no manifesto (JSON)."""
+    if valor is None or isinstance(valor, (bool, int, str)):
+        return valor
+    if isinstance(valor, Decimal) and valor == valor.to_integral_value():
+        return int(valor)
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat(sep=' ') if isinstance(valor, datetime) else valor.isoformat()
+    return str(valor)
+
+@etapa('impressao_digital')
+def calcular_impressao_digital(conn, filtros_template=None, caminho_query=None):
+    """
+    Executa a consulta de impressão digital das tabelas de origem no período.
+
+    Args:
+        conn (pyodbc.Connection): Objeto de conexão com o banco de dados.
+        filtros_template (dict, opcional): Filtros da extração (apenas data_inicio
+            e data_fim são usados; os demais filtros não alteram a impressão).
+        caminho_query (pathlib.Path ou str, opcional): Template da consulta de impressão.
+
+    Returns:
+        dict: Valores da impressão digital por coluna, ou None em caso de erro.
+    """
+    caminho_query = pathlib.Path(caminho_query or pathlib.Path().resolve() / CAMINHO_QUERY_IMPRESSAO)
+    try:
+        texto = caminho_query.read_text(encoding='utf-8')
+        declaracoes = query_templates.declaracoes_parametros(texto)
+        filtros = {nome: valor for nome, valor in (filtros_template or {}).items()
+                   if nome in ('data_inicio', 'data_fim')}
+        valores = query_templates.valores_template_vendas(conn, nomes=declaracoes, **filtros)
+        query, parametros = query_templates.renderizar_template(texto, valores)
+
+        cursor = conn.cursor()
+        try:
+            cursor.execute(query, parametros)
+            colunas = [coluna[0] for coluna in cursor.description]
+            linha = cursor.fetchone()
+        finally:
+            cursor.close()
+        if linha is None:
+            return None
+        return {coluna: _valor_serializavel(valor) for coluna, valor in zip(colunas, linha)}
+    except Exception as e:
+        print(f"AVISO: Não foi possível calcular a impressão digital das tabelas de origem: {e}")
+        traceback.print_exc(file=sys.stdout)
+        return None
+
+def snapshot_sem_alteracoes(query, parametros, impressao_digital, particionar=False, particionar_por_centro=False,
+                            diretorio=None):
+    """
+    Procura o snapshot mais recente do mesmo escopo gravado com a mesma impressão digital.
+
+    Args:
+        query (str): Query renderizada da extração.
+        parametros (sequence): Parâmetros da query (as datas não fazem parte do escopo).
+        impressao_digital (dict): Impressão digital calculada antes da extração.
+        particionar (bool): Se True, apenas datasets particionados são aceitos.
+        particionar_por_centro (bool): Se True, apenas datasets particionados também por Centro.
+        diretorio (pathlib.Path ou str, opcional): Diretório dos snapshots (padrão: output).
+
+    Returns:
+        dict: Registro do manifesto (com 'caminho'), ou None se não houver snapshot equivalente.
+    """
+    if not query or not impressao_digital:
+        return None
+    escopo = snapshot_manifest.escopo_query(query, parametros)
+    tipo = 'dataset' if particionar else 'arquivo'
+    for registro in snapshot_manifest.listar_snapshots(diretorio):
+        if (registro.get('escopo') == escopo
+                and registro.get('impressao_digital') == impressao_digital
+                and registro.get('tipo') == tipo
+                and ('Centro' in registro.get('particoes', [])) == (particionar and particionar_por_centro)
+                and registro['caminho'].exists()):
+            return registro
+    return None
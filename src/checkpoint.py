@@ -0,0 +1,254 @@
+"""
+Módulo de checkpoints do pipeline principal.
+
+As tabelas agregadas são armazenadas em output/checkpoints/<chave>/, onde a
+chave combina o hash do conteúdo do snapshot de entrada, os filtros de
+carregamento e a versão das regras de classificação e de horas. Uma nova execução sobre o mesmo snapshot reutiliza
+as tabelas sem reprocessar os dados. Checkpoints antigos são removidos quando
+o espaço total ultrapassa o limite configurado.
+"""
+
+import sys
+import json
+import shutil
+import hashlib
+import inspect
+import pathlib
+import traceback
+from datetime import datetime
+import pandas as pd
+
+from src import data_processing, analysis, date_normalization
+
+# Espaço máximo ocupado pelos checkpoints antes da remoção dos menos usados
+LIMITE_PADRAO_BYTES = 2 * 1024 ** 3
+
+ARQUIVO_HASHES = "hashes_snapshots.json"
+ARQUIVO_MANIFESTO = "manifesto.json"
+
+def _diretorio_checkpoints():
+    """
+    Retorna o diretório raiz dos checkpoints.
+
+    Returns:
+        pathlib.Path: Diretório output/checkpoints.
+    """
+    diretorio = pathlib.Path().resolve() / "output" / "checkpoints"
+    diretorio.mkdir(parents=True, exist_ok=True)
+    return diretorio
+
+def _escrever_json(caminho, conteudo):
+    """Grava um arquivo JSON de forma atômica."""
+    temporario = caminho.with_suffix('.tmp')
+    temporario.write_text(json.dumps(conteudo, indent=2, ensure_ascii=False), encoding='utf-8')
+    temporario.replace(caminho)
+
+def versao_regras():
+    """
+    Calcula a versão das regras a partir do código-fonte das funções de
+    normalização de datas, classificação, horas e agregação, e das funções
+    que escolhem as colunas passadas às regras e as aplicam. Qualquer
+    alteração nelas invalida os checkpoints existentes.
+
+    Returns:
+        str: Hash curto da versão das regras.
+    """
+    funcoes = [
+        date_normalization.normalizar_datas,
+        date_normalization.converter_data_hora,
+        data_processing.determinar_classificacao,
+        data_processing.determinar_hora,
+        data_processing.aplicar_regra_por_chave,
+        data_processing.classificar_vendas,
+        data_processing.preparar_dados,
+        analysis.agregar_por_classificacao,
+        analysis.montar_tabelas_por_classificacao,
+        analysis.formatar_tabela_pivot,
+    ]
+    digest = hashlib.sha256()
+    for funcao in funcoes:
+        digest.update(inspect.getsource(funcao).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+def arquivos_snapshot(caminho):
+    """Lista os arquivos de um snapshot (arquivo único ou dataset particionado) em ordem estável."""
+    if caminho.is_dir():
+        return sorted(caminho.rglob('*.parquet'))
+    return [caminho]
+
+def hash_snapshot(caminho_snapshot):
+    """
+    Calcula o hash do conteúdo de um snapshot Parquet. O resultado é
+    memorizado por caminho, tamanho e data de modificação para evitar reler
+    arquivos que não mudaram.
+
+    Args:
+        caminho_snapshot (pathlib.Path ou str): Arquivo Parquet ou diretório de dataset.
+
+    Returns:
+        str: Hash SHA-256 do conteúdo.
+    """
+    caminho = pathlib.Path(caminho_snapshot).resolve()
+    arquivos = arquivos_snapshot(caminho)
+    assinatura = [[str(arquivo.relative_to(caminho) if caminho.is_dir() else arquivo.name),
+                   arquivo.stat().st_size, arquivo.stat().st_mtime_ns] for arquivo in arquivos]
+
+    caminho_hashes = _diretorio_checkpoints() / ARQUIVO_HASHES
+    try:
+        hashes = json.loads(caminho_hashes.read_text(encoding='utf-8')) if caminho_hashes.exists() else {}
+    except ValueError:
+        hashes = {}
+
+    memorizado = hashes.get(str(caminho))
+    if memorizado and memorizado.get('assinatura') == assinatura:
+        return memorizado['hash']
+
+    print(f"Calculando hash do conteúdo de {caminho.name}...")
+    digest = hashlib.sha256()
+    for arquivo in arquivos:
+        digest.update(str(arquivo.relative_to(caminho) if caminho.is_dir() else '').encode('utf-8'))
+        with open(arquivo, 'rb') as f:
+            for bloco in iter(lambda: f.read(8 * 1024 * 1024), b''):
+                digest.update(bloco)
+
+    hashes[str(caminho)] = {'assinatura': assinatura, 'hash': digest.hexdigest()}
+    _escrever_json(caminho_hashes, hashes)
+    return digest.hexdigest()
+
+def chave_checkpoint(caminho_snapshot, filtros=None):
+    """
+    Monta a chave de checkpoint de um snapshot.
+
+    Args:
+        caminho_snapshot (pathlib.Path ou str): Arquivo Parquet ou diretório de dataset.
+        filtros (dict, opcional): Filtros usados no carregamento (período, centros, etc.).
+
+    Returns:
+        str: Chave do checkpoint, ou None se o hash não puder ser calculado.
+    """
+    try:
+        conteudo = {
+            'snapshot': hash_snapshot(caminho_snapshot),
+            'regras': versao_regras(),
+            'filtros': filtros or {},
+        }
+        return hashlib.sha256(json.dumps(conteudo, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:32]
+    except Exception as e:
+        print(f"AVISO: Não foi possível calcular a chave de checkpoint: {e}")
+        return None
+
+def salvar_checkpoint(chave, tabelas, limite_bytes=LIMITE_PADRAO_BYTES):
+    """
+    Armazena as tabelas agregadas de um snapshot. Os dados preparados não são
+    guardados: o relatório é gerado apenas a partir das tabelas.
+
+    Args:
+        chave (str): Chave do checkpoint.
+        tabelas (dict): Tabelas por classificação, como retornado por criar_tabelas_por_cluster.
+        limite_bytes (int): Espaço máximo dos checkpoints após a gravação.
+
+    Returns:
+        pathlib.Path: Diretório do checkpoint, ou None em caso de erro.
+    """
+    diretorio = _diretorio_checkpoints() / chave
+    try:
+        if diretorio.exists():
+            shutil.rmtree(diretorio)
+        (diretorio / "tabelas").mkdir(parents=True)
+
+        indice_tabelas = []
+        for posicao, (classificacao, tabelas_classe) in enumerate(tabelas.items()):
+            arquivos = {}
+            for tipo, tabela in tabelas_classe.items():
+                if tabela is None:
+                    continue
+                nome_arquivo = f"{posicao:03d}_{tipo}.parquet"
+                tabela.to_parquet(diretorio / "tabelas" / nome_arquivo, index=False)
+                arquivos[tipo] = nome_arquivo
+            indice_tabelas.append({'classificacao': classificacao, 'arquivos': arquivos})
+
+        agora = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        _escrever_json(diretorio / ARQUIVO_MANIFESTO, {
+            'chave': chave,
+            'versao_regras': versao_regras(),
+            'criado_em': agora,
+            'ultimo_uso': agora,
+            'tabelas': indice_tabelas,
+        })
+        print(f"Checkpoint salvo: {diretorio}")
+
+        limpar_checkpoints(limite_bytes, preservar=chave)
+        return diretorio
+    except Exception as e:
+        print(f"Erro ao salvar checkpoint: {e}")
+        traceback.print_exc(file=sys.stdout)
+        shutil.rmtree(diretorio, ignore_errors=True)
+        return None
+
+def carregar_checkpoint(chave):
+    """
+    Carrega um checkpoint existente.
+
+    Args:
+        chave (str): Chave do checkpoint.
+
+    Returns:
+        dict: {'tabelas': dict}, ou None se não existir.
+    """
+    diretorio = _diretorio_checkpoints() / chave
+    caminho_manifesto = diretorio / ARQUIVO_MANIFESTO
+    if not caminho_manifesto.exists():
+        return None
+    try:
+        manifesto = json.loads(caminho_manifesto.read_text(encoding='utf-8'))
+
+        tabelas = {}
+        for item in manifesto['tabelas']:
+            tabelas[item['classificacao']] = {
+                tipo: pd.read_parquet(diretorio / "tabelas" / nome_arquivo)
+                for tipo, nome_arquivo in item['arquivos'].items()
+            }
+
+        manifesto['ultimo_uso'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        _escrever_json(caminho_manifesto, manifesto)
+
+        print(f"Checkpoint encontrado (criado em {manifesto['criado_em']}): {len(tabelas)} classificações")
+        return {'tabelas': tabelas}
+    except Exception as e:
+        print(f"AVISO: Checkpoint inválido ({e}). Ele será ignorado.")
+        return None
+
+def limpar_checkpoints(limite_bytes=LIMITE_PADRAO_BYTES, preservar=None):
+    """
+    Remove os checkpoints menos usados até que o espaço total fique abaixo do limite.
+
+    Args:
+        limite_bytes (int): Espaço máximo ocupado pelos checkpoints.
+        preservar (str, opcional): Chave que nunca deve ser removida.
+
+    Returns:
+        int: Quantidade de bytes liberados.
+    """
+    checkpoints = []
+    for diretorio in _diretorio_checkpoints().iterdir():
+        if not diretorio.is_dir():
+            continue
+        tamanho = sum(arquivo.stat().st_size for arquivo in diretorio.rglob('*') if arquivo.is_file())
+        try:
+            ultimo_uso = json.loads((diretorio / ARQUIVO_MANIFESTO).read_text(encoding='utf-8'))['ultimo_uso']
+        except (OSError, ValueError, KeyError):
+            ultimo_uso = ''  # Checkpoints incompletos são os primeiros a sair
+        checkpoints.append((ultimo_uso, diretorio, tamanho))
+
+    total = sum(tamanho for _, _, tamanho in checkpoints)
+    liberado = 0
+    for ultimo_uso, diretorio, tamanho in sorted(checkpoints, key=lambda item: item[0]):
+        if total <= limite_bytes:
+            break
+        if diretorio.name == preservar:
+            continue
+        shutil.rmtree(diretorio, ignore_errors=True)
+        total -= tamanho
+        liberado += tamanho
+        print(f"Checkpoint removido por limite de espaço: {diretorio.name} ({tamanho / (1024*1024):.2f} MB)")
+    return liberado
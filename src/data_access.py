@@ -3,13 +3,28 @@ Módulo responsável pelo acesso aos dados no SQL Server com autenticação Micr
 """
 
 import sys
+import time
+import shutil
+import atexit
+import threading
 import traceback
+from contextlib import contextmanager
 import pyodbc
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
 import pathlib
-from datetime import datetime
+from datetime import date, datetime, timedelta
+from decimal import Decimal
 from config.database import get_connection_string, get_sql_auth_connection_string
+from src.data_processing import aplicar_regra_por_chave, determinar_classificacao
+from src import change_detection, query_cache, query_templates, snapshot_manifest
+from src.metrics import etapa, medir_etapa, progresso
 
+@etapa('conectar')
 def estabelecer_conexao():
     """
     Estabelece conexão com o banco de dados SQL Server na Azure usando autenticação Azure AD com MFA.
@@ -36,6 +51,184 @@ def estabelecer_conexao():
             print("   Este método requer uma interface gráfica para login. Não é suportado em ambientes sem GUI.")
         return None
 
+# Limites padrão do pool de conexões
+MAX_CONEXOES_POOL = 4
+MAX_OCIOSO_SEGUNDOS = 300
+
+class PoolConexoes:
+    """
+    Pool de conexões reutilizáveis com o banco de dados.
+
+    As conexões devolvidas ficam ociosas no pool e são entregues novamente nas
+    próximas consultas, evitando repetir o login (TLS e autenticação) a cada
+    extração. Antes de ser entregue, uma conexão ociosa é verificada com
+    'SELECT 1'; conexões ociosas há mais de max_ocioso_segundos são fechadas.
+    O número de conexões em uso ao mesmo tempo é limitado por max_conexoes.
+    """
+
+    def __init__(self, fabrica_conexao=None, max_conexoes=MAX_CONEXOES_POOL,
+                 max_ocioso_segundos=MAX_OCIOSO_SEGUNDOS):
+        """
+        Args:
+            fabrica_conexao (callable, opcional): Função que cria uma nova conexão
+                (padrão: estabelecer_conexao).
+            max_conexoes (int): Quantidade máxima de conexões em uso simultâneo.
+            max_ocioso_segundos (float): Tempo máximo que uma conexão pode ficar ociosa.
+        """
+        self.fabrica_conexao = fabrica_conexao or estabelecer_conexao
+        self.max_conexoes = max_conexoes
+        self.max_ocioso_segundos = max_ocioso_segundos
+        self._ociosas = []  # Pilha de (conexão, instante da devolução)
+        self._trava = threading.Lock()
+        self._vagas = threading.BoundedSemaphore(max_conexoes)
+
+    @staticmethod
+    def _fechar(conn):
+        """Fecha uma conexão ignorando erros (conexão já encerrada pelo servidor, etc.)."""
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    @staticmethod
+    def _conexao_ativa(conn):
+        """Verifica se a conexão ainda responde ao servidor."""
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def _retirar_ociosa(self):
+        """
+        Retira do pool a conexão ociosa mais recente que ainda esteja válida.
+
+        Returns:
+            pyodbc.Connection: Conexão reutilizável, ou None se não houver.
+        """
+        while True:
+            with self._trava:
+                if not self._ociosas:
+                    return None
+                conn, devolvida_em = self._ociosas.pop()
+
+            if time.monotonic() - devolvida_em > self.max_ocioso_segundos:
+                self._fechar(conn)
+                continue
+            if self._conexao_ativa(conn):
+                return conn
+            print("AVISO: Conexão inativa descartada do pool.")
+            self._fechar(conn)
+
+    def adquirir(self):
+        """
+        Obtém uma conexão do pool, criando uma nova se não houver conexão ociosa válida.
+        Bloqueia enquanto max_conexoes conexões estiverem em uso.
+
+        Returns:
+            pyodbc.Connection: Conexão com o banco de dados, ou None em caso de erro.
+        """
+        self._vagas.acquire()
+        try:
+            conn = self._retirar_ociosa()
+            if conn is None:
+                conn = self.fabrica_conexao()
+            else:
+                print("Reutilizando conexão do pool.")
+        except Exception:
+            self._vagas.release()
+            raise
+
+        if conn is None:
+            self._vagas.release()
+        return conn
+
+    def liberar(self, conn, descartar=False):
+        """
+        Devolve uma conexão ao pool.
+
+        Args:
+            conn (pyodbc.Connection): Conexão obtida com adquirir().
+            descartar (bool): Se True, a conexão é fechada em vez de reutilizada.
+        """
+        try:
+            if not descartar:
+                try:
+                    # Encerra a transação implícita aberta pelas consultas
+                    conn.rollback()
+                except Exception:
+                    descartar = True
+
+            if descartar:
+                self._fechar(conn)
+            else:
+                with self._trava:
+                    self._ociosas.append((conn, time.monotonic()))
+        finally:
+            self._vagas.release()
+        self.remover_ociosas_expiradas()
+
+    @contextmanager
+    def conexao(self):
+        """
+        Gerenciador de contexto que obtém uma conexão e a devolve ao final.
+        A conexão é descartada se o bloco terminar com exceção.
+
+        Yields:
+            pyodbc.Connection: Conexão com o banco de dados, ou None se não foi possível conectar.
+        """
+        conn = self.adquirir()
+        if conn is None:
+            yield None
+            return
+        try:
+            yield conn
+        except BaseException:
+            self.liberar(conn, descartar=True)
+            raise
+        self.liberar(conn)
+
+    def remover_ociosas_expiradas(self):
+        """Fecha as conexões ociosas há mais de max_ocioso_segundos."""
+        agora = time.monotonic()
+        with self._trava:
+            expiradas = [conn for conn, devolvida_em in self._ociosas
+                         if agora - devolvida_em > self.max_ocioso_segundos]
+            self._ociosas = [(conn, devolvida_em) for conn, devolvida_em in self._ociosas
+                             if agora - devolvida_em <= self.max_ocioso_segundos]
+        for conn in expiradas:
+            self._fechar(conn)
+
+    def fechar(self):
+        """Fecha todas as conexões ociosas do pool."""
+        with self._trava:
+            ociosas, self._ociosas = self._ociosas, []
+        for conn, _ in ociosas:
+            self._fechar(conn)
+        if ociosas:
+            print(f"Pool de conexões encerrado ({len(ociosas)} conexões fechadas).")
+
+_pool_padrao = None
+_trava_pool_padrao = threading.Lock()
+
+def obter_pool():
+    """
+    Retorna o pool de conexões compartilhado pelas funções de extração.
+    O pool é criado no primeiro uso e fechado ao final do programa.
+
+    Returns:
+        PoolConexoes: Pool de conexões padrão.
+    """
+    global _pool_padrao
+    with _trava_pool_padrao:
+        if _pool_padrao is None:
+            _pool_padrao = PoolConexoes()
+            atexit.register(_pool_padrao.fechar)
+        return _pool_padrao
+
 def ler_arquivo_query(caminho_arquivo):
     """
     Lê o conteúdo de um arquivo SQL.
@@ -68,7 +261,7 @@ def ler_arquivo_query(caminho_arquivo):
         print(f"Erro ao ler o arquivo SQL: {e}")
         return None
 
-def executar_query(conn, query):
+def executar_query(conn, query, parametros=None, decimal_como_float=True, tamanho_lote=50000):
     """
     Executa uma query SQL e retorna os resultados como um DataFrame.
     Otimizado para grandes conjuntos de dados.
@@ -76,6 +269,9 @@ def executar_query(conn, query):
     Args:
         conn (pyodbc.Connection): Objeto de conexão com o banco de dados.
         query (str): Query SQL a ser executada.
+        parametros (sequence, opcional): Valores para os marcadores '?' da query.
+        decimal_como_float (bool): Se True, DECIMAL/NUMERIC são lidos diretamente como float.
+        tamanho_lote (int): Quantidade de registros buscados por vez.
         
     Returns:
         pandas.DataFrame: DataFrame com os resultados da query.
@@ -84,76 +280,422 @@ def executar_query(conn, query):
         print("Iniciando execução da query...")
         
         # Usar cursor para executar a query
-        cursor = conn.cursor()
-        cursor.execute(query)
+        with conversores_numericos(conn, decimal_como_float):
+            cursor = conn.cursor()
+            with medir_etapa('executar_query'):
+                if parametros:
+                    cursor.execute(query, parametros)
+                else:
+                    cursor.execute(query)
+            
+            # Verificar se temos resultados
+            if cursor.description is None:
+                print("A query não retornou colunas")
+                return pd.DataFrame()
+            
+            # Obter nomes das colunas
+            columns = [column[0] for column in cursor.description]
+            print(f"Colunas detectadas: {len(columns)}")
+            
+            # Processar resultados em lotes
+            print("Processando resultados em lotes...")
+            all_data = []
+            total_rows = 0
+            
+            with medir_etapa('buscar_registros', tamanho_lote=tamanho_lote) as medida:
+                while True:
+                    rows = cursor.fetchmany(tamanho_lote)
+                    if not rows:
+                        break
+                        
+                    # Converter cada linha para uma lista (mais eficiente que dicionário)
+                    batch_data = [list(row) for row in rows]
+                    all_data.extend(batch_data)
+                    
+                    total_rows += len(rows)
+                    progresso(f"Processados {total_rows} registros até o momento")
+                
+                print(f"Total de registros: {total_rows}")
+                
+                # Criar DataFrame 
+                df = pd.DataFrame(all_data, columns=columns)
+                medida['linhas_saida'] = total_rows
+            
+            print(f"DataFrame criado com sucesso. Dimensões: {df.shape}")
+            return df
+    except Exception as e:
+        print(f"Erro ao executar a query: {e}")
+        traceback.print_exc(file=sys.stdout)
+        return None
+
+# Tipos Arrow correspondentes aos tipos Python informados em cursor.description
+TIPOS_ARROW_POR_TIPO_PYTHON = {
+    str: pa.string(),
+    int: pa.int64(),
+    float: pa.float64(),
+    bool: pa.bool_(),
+    datetime: pa.timestamp('us'),
+    date: pa.date32(),
+    bytes: pa.binary(),
+    bytearray: pa.binary(),
+}
+
+# Tipo Arrow das colunas de texto com poucos valores distintos (category no pandas)
+TIPO_CATEGORIA = pa.dictionary(pa.int32(), pa.string())
+
+# Esquema declarado das colunas de gv_vendas, aplicado durante a extração e
+# gravado no Parquet. Colunas não listadas mantêm o tipo informado pelo driver.
+ESQUEMA_GV_VENDAS = {
+    'Centro': TIPO_CATEGORIA,
+    'BairroCliente': TIPO_CATEGORIA,
+    'Secao': TIPO_CATEGORIA,
+    'Familia': TIPO_CATEGORIA,
+    'SubFamilia': TIPO_CATEGORIA,
+    'Produto': TIPO_CATEGORIA,
+    'IdCliente': pa.int32(),
+    'IdAnimal': pa.int32(),
+    'Quantidade': pa.float32(),  # Quantidades pequenas com até 3 casas decimais
+    # Valores monetários: float64 (ver _decimal_para_float sobre a precisão)
+    'PrecoVenda': pa.float64(),
+    'ValorVenda': pa.float64(),
+    'PVP1': pa.float64(),
+    'DescontoRS': pa.float64(),
+    'ValorTotal': pa.float64(),
+}
+
+def _decimal_para_float(valor):
+    """
+    Conversor de saída do pyodbc para colunas DECIMAL/NUMERIC: converte o valor
+    recebido do driver diretamente para float, sem criar objetos Decimal.
+    
+    O driver entrega o valor como texto ('123.45') ou como SQL_NUMERIC_STRUCT
+    (precisão, escala, sinal e mantissa de 16 bytes little-endian); os dois
+    formatos são distinguidos pelo primeiro byte, que na estrutura é a precisão
+    (no máximo 38) e no texto é um dígito, sinal ou ponto.
+    
+    Garantia de precisão: o resultado é o float64 mais próximo do valor exato.
+    Valores com até 15 dígitos significativos (ex.: DECIMAL(15,4) até
+    99.999.999.999,9999) são recuperados exatamente com round(valor, escala);
+    as somas do pandas (soma em pares) têm erro relativo da ordem de
+    log2(n) x 1e-16, muito abaixo do centavo nos totais do relatório.
+    
+    Args:
+        valor (bytes): Valor bruto recebido do driver (None para nulo).
         
-        # Verificar se temos resultados
-        if cursor.description is None:
-            print("A query não retornou colunas")
-            return pd.DataFrame()
+    Returns:
+        float: Valor convertido.
+    """
+    if valor is None:
+        return None
+    if valor[0] > 38:
+        return float(valor)
+    escala = int.from_bytes(valor[1:2], 'little', signed=True)
+    mantissa = int.from_bytes(valor[3:19], 'little')
+    # Divisão inteira exata seguida de um único arredondamento para float
+    resultado = mantissa / 10 ** escala if escala >= 0 else float(mantissa * 10 ** -escala)
+    return resultado if valor[2] else -resultado
+
+@contextmanager
+def conversores_numericos(conn, ativo=True):
+    """
+    Registra na conexão os conversores que leem DECIMAL/NUMERIC como float
+    durante o bloco e os remove ao final (a conexão volta ao pool sem eles).
+    Conexões sem suporte a conversores de saída não são alteradas.
+    
+    Args:
+        conn (pyodbc.Connection): Conexão com o banco de dados.
+        ativo (bool): Se False, os valores continuam sendo lidos como Decimal.
         
-        # Obter nomes das colunas
-        columns = [column[0] for column in cursor.description]
-        print(f"Colunas detectadas: {len(columns)}")
+    Yields:
+        bool: True se os conversores foram registrados.
+    """
+    if not ativo or not hasattr(conn, 'add_output_converter'):
+        yield False
+        return
+    for tipo_sql in (pyodbc.SQL_DECIMAL, pyodbc.SQL_NUMERIC):
+        conn.add_output_converter(tipo_sql, _decimal_para_float)
+    try:
+        yield True
+    finally:
+        conn.clear_output_converters()
+
+def _tipos_arrow_da_descricao(descricao, decimal_como_float=False):
+    """
+    Converte o cursor.description em uma lista de tipos Arrow.
+    
+    Args:
+        descricao (list): Valor de cursor.description.
+        decimal_como_float (bool): Se True, colunas DECIMAL/NUMERIC são float64
+            (valores lidos com conversores_numericos).
         
-        # Processar resultados em lotes
-        print("Processando resultados em lotes...")
-        all_data = []
-        batch_size = 50000
-        total_rows = 0
+    Returns:
+        list: Tipo Arrow de cada coluna, ou None quando o tipo não é informado pelo driver.
+    """
+    tipos = []
+    for coluna in descricao:
+        tipo_python = coluna[1]
+        if tipo_python is Decimal and decimal_como_float:
+            tipos.append(pa.float64())
+        elif tipo_python is Decimal:
+            precisao, escala = coluna[4], coluna[5]
+            if precisao and escala is not None and 0 < precisao <= 38:
+                tipos.append(pa.decimal128(precisao, escala))
+            else:
+                tipos.append(None)
+        else:
+            tipos.append(TIPOS_ARROW_POR_TIPO_PYTHON.get(tipo_python))
+    return tipos
+
+def _aplicar_esquema_declarado(descricao, tipos, esquema_declarado=ESQUEMA_GV_VENDAS):
+    """
+    Substitui os tipos Arrow das colunas presentes no esquema declarado, desde que
+    o tipo informado pelo driver seja compatível (texto para categorias, inteiros
+    de até 10 dígitos para int32 e números para float).
+    
+    Args:
+        descricao (list): Valor de cursor.description.
+        tipos (list): Tipos Arrow obtidos de _tipos_arrow_da_descricao.
+        esquema_declarado (dict, opcional): Tipo Arrow por nome de coluna.
         
-        while True:
-            rows = cursor.fetchmany(batch_size)
-            if not rows:
-                break
-                
-            # Converter cada linha para uma lista (mais eficiente que dicionário)
-            batch_data = [list(row) for row in rows]
-            all_data.extend(batch_data)
-            
-            total_rows += len(rows)
-            print(f"Processados {total_rows} registros até o momento")
+    Returns:
+        list: Tipos Arrow ajustados.
+    """
+    if not esquema_declarado:
+        return tipos
+    
+    ajustados = []
+    for coluna, tipo in zip(descricao, tipos):
+        declarado = esquema_declarado.get(coluna[0])
+        tipo_python = coluna[1]
+        if declarado is None:
+            ajustados.append(tipo)
+        elif pa.types.is_dictionary(declarado) and tipo_python is str:
+            ajustados.append(declarado)
+        elif pa.types.is_int32(declarado) and tipo_python is int and (coluna[4] or 0) <= 10:
+            # int do SQL Server tem precisão 10; bigint (19) continua como int64
+            ajustados.append(declarado)
+        elif pa.types.is_floating(declarado) and tipo_python in (float, Decimal):
+            ajustados.append(declarado)
+        else:
+            ajustados.append(tipo)
+    return ajustados
+
+def aplicar_esquema_vendas(df, esquema_declarado=ESQUEMA_GV_VENDAS):
+    """
+    Aplica o esquema declarado às colunas de um DataFrame (categorias, inteiros
+    de 32 bits e float32). Usado nos dados montados em memória; as tabelas
+    lidas de snapshots passam antes por tabela_para_pandas.
+    
+    Args:
+        df (pandas.DataFrame): DataFrame com os dados de vendas.
+        esquema_declarado (dict, opcional): Tipo Arrow por nome de coluna.
         
-        print(f"Total de registros: {total_rows}")
+    Returns:
+        pandas.DataFrame: DataFrame com os tipos ajustados.
+    """
+    for coluna, declarado in esquema_declarado.items():
+        if coluna not in df.columns:
+            continue
+        serie = df[coluna]
+        try:
+            if pa.types.is_dictionary(declarado):
+                if not isinstance(serie.dtype, pd.CategoricalDtype):
+                    df[coluna] = serie.astype('category')
+            elif pa.types.is_int32(declarado):
+                if serie.dtype in ('int32', 'Int32') or not pd.api.types.is_numeric_dtype(serie):
+                    continue
+                limites = np.iinfo(np.int32)
+                if serie.min() < limites.min or serie.max() > limites.max:
+                    continue
+                # Colunas com nulos usam o inteiro anulável do pandas em vez de float64
+                df[coluna] = serie.astype('Int32' if serie.isna().any() else 'int32')
+            elif pa.types.is_floating(declarado):
+                if serie.dtype == declarado.to_pandas_dtype():
+                    continue
+                df[coluna] = pd.to_numeric(serie, errors='coerce').astype(declarado.to_pandas_dtype())
+        except (TypeError, ValueError) as e:
+            print(f"AVISO: Tipo declarado não aplicado à coluna '{coluna}': {e}")
+    return df
+
+def tabela_para_pandas(tabela, esquema_declarado=ESQUEMA_GV_VENDAS):
+    """
+    Converte uma tabela Arrow lida de um snapshot em DataFrame com o esquema declarado.
+    
+    Colunas decimal128 (snapshots gravados antes do esquema declarado) com tipo
+    declarado float são convertidas ainda no Arrow: no pandas elas chegariam
+    como objetos Decimal, convertidos um a um por aplicar_esquema_vendas.
+    
+    Args:
+        tabela (pyarrow.Table): Dados lidos do arquivo ou dataset.
+        esquema_declarado (dict, opcional): Tipo Arrow por nome de coluna.
         
-        # Criar DataFrame 
-        df = pd.DataFrame(all_data, columns=columns)
+    Returns:
+        pandas.DataFrame: DataFrame com os tipos ajustados.
+    """
+    for indice, campo in enumerate(tabela.schema):
+        declarado = esquema_declarado.get(campo.name)
+        if declarado is not None and pa.types.is_floating(declarado) and pa.types.is_decimal(campo.type):
+            # Via texto: a conversão direta de decimal para float do Arrow não arredonda
+            # corretamente (ex.: 1.2345 -> 1.2345000000000002), a leitura do texto sim
+            convertida = pc.cast(pc.cast(tabela.column(indice), pa.string()), declarado)
+            tabela = tabela.set_column(indice, campo.name, convertida)
+    return aplicar_esquema_vendas(tabela.to_pandas())
+
+def _converter_coluna_arrow(valores, tipo):
+    """
+    Converte os valores de uma coluna de um lote em um array Arrow do tipo informado.
+    
+    Args:
+        valores (sequence): Valores da coluna no lote.
+        tipo (pyarrow.DataType): Tipo Arrow de destino (None para inferir).
         
-        print(f"DataFrame criado com sucesso. Dimensões: {df.shape}")
-        return df
+    Returns:
+        pyarrow.Array: Array com os valores convertidos.
+    """
+    if tipo is None:
+        return pa.array(valores)
+    try:
+        return pa.array(valores, type=tipo)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError):
+        # Ex.: Decimal com escala diferente da declarada - infere e converte
+        return pa.array(valores).cast(tipo)
+
+def executar_query_para_parquet(conn, query, caminho_arquivo, tamanho_lote=50000, parametros=None,
+                                esquema_declarado=ESQUEMA_GV_VENDAS, decimal_como_float=True):
+    """
+    Executa uma query SQL gravando cada lote retornado diretamente em um arquivo Parquet.
+    O uso de memória fica limitado a um lote, independentemente do volume total.
+    As colunas do esquema declarado são gravadas já com o tipo compacto.
+    
+    Args:
+        conn (pyodbc.Connection): Objeto de conexão com o banco de dados.
+        query (str): Query SQL a ser executada.
+        caminho_arquivo (pathlib.Path ou str): Caminho do arquivo Parquet de saída.
+        tamanho_lote (int): Quantidade de registros buscados por vez.
+        parametros (sequence, opcional): Valores para os marcadores '?' da query.
+        esquema_declarado (dict, opcional): Tipo Arrow por nome de coluna (None para desativar).
+        decimal_como_float (bool): Se True, DECIMAL/NUMERIC são lidos diretamente como
+            float64, sem objetos Decimal (ver _decimal_para_float).
+        
+    Returns:
+        int: Total de registros gravados, ou None em caso de erro.
+    """
+    writer = None
+    try:
+        print("Iniciando execução da query (modo streaming)...")
+        
+        with conversores_numericos(conn, decimal_como_float) as decimal_float:
+            cursor = conn.cursor()
+            with medir_etapa('executar_query'):
+                if parametros:
+                    cursor.execute(query, parametros)
+                else:
+                    cursor.execute(query)
+            
+            if cursor.description is None:
+                print("A query não retornou colunas")
+                return None
+            
+            columns = [column[0] for column in cursor.description]
+            tipos = _aplicar_esquema_declarado(
+                cursor.description, _tipos_arrow_da_descricao(cursor.description, decimal_float), esquema_declarado)
+            print(f"Colunas detectadas: {len(columns)}")
+            
+            esquema = None
+            total_rows = 0
+            
+            print(f"Gravando resultados em lotes no arquivo Parquet: {caminho_arquivo}")
+            # Busca, conversão para Arrow e gravação de cada lote formam uma única etapa
+            with medir_etapa('buscar_registros', tamanho_lote=tamanho_lote, destino='parquet') as medida:
+                while True:
+                    rows = cursor.fetchmany(tamanho_lote)
+                    if not rows:
+                        break
+                    
+                    # Transpor o lote de linhas para colunas e converter para Arrow
+                    valores_colunas = list(zip(*rows))
+                    arrays = [_converter_coluna_arrow(valores, tipo) for valores, tipo in zip(valores_colunas, tipos)]
+                    
+                    if writer is None:
+                        # O esquema é definido no primeiro lote; colunas só com nulos viram texto
+                        tipos = [array.type if not pa.types.is_null(array.type) else pa.string() for array in arrays]
+                        arrays = [array.cast(tipo) for array, tipo in zip(arrays, tipos)]
+                        esquema = pa.schema([pa.field(nome, tipo) for nome, tipo in zip(columns, tipos)])
+                        writer = pq.ParquetWriter(caminho_arquivo, esquema, compression='snappy')
+                    
+                    writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=esquema))
+                    
+                    total_rows += len(rows)
+                    progresso(f"Processados {total_rows} registros até o momento")
+                medida['linhas_saida'] = total_rows
+            
+            if writer is None:
+                # Nenhum registro: grava apenas o esquema
+                esquema = pa.schema([pa.field(nome, tipo or pa.string()) for nome, tipo in zip(columns, tipos)])
+                writer = pq.ParquetWriter(caminho_arquivo, esquema, compression='snappy')
+            
+            print(f"Total de registros: {total_rows}")
+            return total_rows
     except Exception as e:
         print(f"Erro ao executar a query: {e}")
         traceback.print_exc(file=sys.stdout)
         return None
+    finally:
+        if writer is not None:
+            writer.close()
 
-def salvar_como_parquet(df, nome_arquivo=None):
+def caminho_saida_parquet(nome_arquivo=None, extensao=".parquet"):
     """
-    Salva o DataFrame em formato Parquet para acesso eficiente.
+    Monta o caminho de um arquivo Parquet (ou diretório de dataset) no diretório de saída.
+    
+    Args:
+        nome_arquivo (str, opcional): Nome do arquivo sem extensão.
+        extensao (str): Extensão do arquivo ('' para diretórios de dataset).
+        
+    Returns:
+        pathlib.Path: Caminho completo do arquivo.
+    """
+    # Criar diretório de saída se não existir
+    diretorio_saida = pathlib.Path().resolve() / "output"
+    diretorio_saida.mkdir(parents=True, exist_ok=True)
+    
+    # Gerar nome de arquivo com timestamp se não fornecido
+    if nome_arquivo is None:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        nome_arquivo = f"dados_vendas_{timestamp}"
+        # Outro snapshot gravado no mesmo segundo não pode ser sobrescrito
+        sequencia = 1
+        while (diretorio_saida / f"{nome_arquivo}{extensao}").exists():
+            sequencia += 1
+            nome_arquivo = f"dados_vendas_{timestamp}_{sequencia}"
+    
+    return diretorio_saida / f"{nome_arquivo}{extensao}"
+
+@etapa('gravar_parquet')
+def salvar_como_parquet(df, nome_arquivo=None, query=None, parametros=None, forma_extracao=None):
+    """
+    Salva o DataFrame em formato Parquet para acesso eficiente e registra o
+    arquivo no manifesto de snapshots (src/snapshot_manifest).
     
     Args:
         df (pandas.DataFrame): DataFrame a ser salvo.
         nome_arquivo (str, opcional): Nome do arquivo sem extensão.
+        query (str, opcional): Query que gerou os dados (registrada pelo hash).
+        parametros (sequence, opcional): Parâmetros da query.
+        forma_extracao (str, opcional): Forma de extração registrada no manifesto.
         
     Returns:
         pathlib.Path: Caminho para o arquivo salvo.
     """
     try:
-                
-        # Criar diretório de saída se não existir
-        diretorio_saida = pathlib.Path().resolve() / "output"
-        diretorio_saida.mkdir(parents=True, exist_ok=True)
-        
-        # Gerar nome de arquivo com timestamp se não fornecido
-        if nome_arquivo is None:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            nome_arquivo = f"dados_vendas_{timestamp}"
-        
         # Caminho completo do arquivo
-        caminho_arquivo = diretorio_saida / f"{nome_arquivo}.parquet"
+        caminho_arquivo = caminho_saida_parquet(nome_arquivo)
         
         # Salvar como Parquet
         print(f"Salvando DataFrame em formato Parquet: {caminho_arquivo}")
+        df = aplicar_esquema_vendas(df)
         df.to_parquet(caminho_arquivo, engine='pyarrow', compression='snappy')
+        snapshot_manifest.registrar_snapshot(caminho_arquivo, query, parametros, forma_extracao)
         
         print(f"Arquivo salvo com sucesso ({caminho_arquivo.stat().st_size / (1024*1024):.2f} MB)")
         return caminho_arquivo
@@ -162,58 +704,505 @@ def salvar_como_parquet(df, nome_arquivo=None):
         traceback.print_exc(file=sys.stdout)
         return None
 
-def buscar_dados_vendas(caminho_query=None, salvar_parquet=True):
+def _adicionar_colunas_particao(lote, coluna_data='DataCriacao'):
+    """
+    Adiciona (ou substitui) as colunas Ano e Mes de um lote Arrow a partir da data de criação.
+    
+    Args:
+        lote (pyarrow.RecordBatch ou pyarrow.Table): Dados a particionar.
+        coluna_data (str): Coluna de data usada para derivar Ano e Mes.
+        
+    Returns:
+        pyarrow.Table: Tabela com as colunas Ano e Mes (int32).
+    """
+    tabela = pa.Table.from_batches([lote]) if isinstance(lote, pa.RecordBatch) else lote
+    datas = tabela.column(coluna_data)
+    
+    if not pa.types.is_timestamp(datas.type) and not pa.types.is_date(datas.type):
+        # Formato 'AAAA-MM-DD HH:MM:SS' (CONVERT 120): a parte da data basta para Ano/Mes
+        datas = pc.strptime(pc.utf8_slice_codeunits(datas.cast(pa.string()), 0, 10),
+                            format='%Y-%m-%d', unit='s', error_is_null=True)
+    
+    for nome, valores in (('Ano', pc.year(datas)), ('Mes', pc.month(datas))):
+        valores = valores.cast(pa.int32())
+        if nome in tabela.column_names:
+            tabela = tabela.set_column(tabela.column_names.index(nome), nome, valores)
+        else:
+            tabela = tabela.append_column(nome, valores)
+    return tabela
+
+@etapa('gravar_dataset_particionado')
+def salvar_como_dataset_particionado(origem, nome_dataset=None, particionar_por_centro=False,
+                                     linhas_por_lote=250000, query=None, parametros=None, forma_extracao=None):
+    """
+    Salva os dados como um dataset Parquet particionado no estilo Hive
+    (Ano=AAAA/Mes=M[/Centro=XX]), permitindo que o carregamento leia apenas
+    as partições e grupos de linhas necessários. O dataset é registrado no
+    manifesto de snapshots.
+    
+    Args:
+        origem (pandas.DataFrame ou pathlib.Path ou str): DataFrame ou arquivo Parquet a particionar.
+            Arquivos são lidos em lotes, sem carregar todo o conteúdo em memória.
+        nome_dataset (str, opcional): Nome do diretório do dataset.
+        particionar_por_centro (bool): Se True, particiona também por Centro.
+        linhas_por_lote (int): Quantidade de registros lidos por vez de um arquivo de origem.
+        query (str, opcional): Query que gerou os dados (registrada pelo hash).
+        parametros (sequence, opcional): Parâmetros da query.
+        forma_extracao (str, opcional): Forma de extração registrada no manifesto.
+        
+    Returns:
+        pathlib.Path: Caminho do diretório do dataset.
+    """
+    try:
+        caminho_dataset = caminho_saida_parquet(nome_dataset, extensao="")
+        
+        if isinstance(origem, pd.DataFrame):
+            tabela = _adicionar_colunas_particao(pa.Table.from_pandas(origem, preserve_index=False))
+            esquema = tabela.schema
+            lotes = tabela.to_batches()
+        else:
+            arquivo = pq.ParquetFile(origem)
+            esquema = _adicionar_colunas_particao(arquivo.schema_arrow.empty_table()).schema
+            lotes = (lote
+                     for registro in arquivo.iter_batches(batch_size=linhas_por_lote)
+                     for lote in _adicionar_colunas_particao(registro).to_batches())
+        
+        campos_particao = [pa.field('Ano', pa.int32()), pa.field('Mes', pa.int32())]
+        if particionar_por_centro:
+            if 'Centro' not in esquema.names:
+                print("AVISO: Coluna 'Centro' não encontrada. Particionando apenas por Ano/Mes.")
+            else:
+                campos_particao.append(esquema.field('Centro'))
+        
+        print(f"Salvando dataset particionado por {', '.join(campo.name for campo in campos_particao)}: {caminho_dataset}")
+        ds.write_dataset(
+            lotes,
+            caminho_dataset,
+            schema=esquema,
+            format='parquet',
+            partitioning=ds.partitioning(pa.schema(campos_particao), flavor='hive'),
+            file_options=ds.ParquetFileFormat().make_write_options(compression='snappy'),
+            existing_data_behavior='error'
+        )
+        
+        registro = snapshot_manifest.registrar_snapshot(caminho_dataset, query, parametros, forma_extracao)
+        tamanho = registro['bytes'] if registro else sum(
+            arquivo.stat().st_size for arquivo in caminho_dataset.rglob('*.parquet'))
+        print(f"Dataset salvo com sucesso ({tamanho / (1024*1024):.2f} MB)")
+        return caminho_dataset
+    except Exception as e:
+        print(f"Erro ao salvar dataset particionado: {e}")
+        traceback.print_exc(file=sys.stdout)
+        return None
+
+def montar_query_vendas(caminho_query=None, filtros_template=None, parametros=None, conn=None):
+    """
+    Lê a query de vendas e, se ela declarar parâmetros nomeados, renderiza o
+    template com os filtros informados (src/query_templates). A conexão só é
+    aberta quando alguma lista de Id de seção/família ainda não foi resolvida.
+    
+    Args:
+        caminho_query (pathlib.Path ou str, opcional): Caminho para o arquivo da query
+            (padrão: querys/templates/gv_vendas.sql).
+        filtros_template (dict, opcional): Argumentos de query_templates.valores_template_vendas.
+        parametros (sequence, opcional): Valores dos marcadores '?' de uma query que não é template.
+        conn (pyodbc.Connection, opcional): Conexão usada para resolver os filtros.
+            Sem ela, uma conexão do pool compartilhado é usada quando necessário.
+        
+    Returns:
+        tuple: (query, parametros, eh_template), ou None em caso de erro.
+    """
+    if caminho_query is None:
+        caminho_query = pathlib.Path().resolve() / "querys" / "templates" / "gv_vendas.sql"
+    
+    query = ler_arquivo_query(caminho_query)
+    if query is None:
+        return None
+    if not query_templates.eh_template(query):
+        return query, parametros, False
+    
+    try:
+        declaracoes = query_templates.declaracoes_parametros(query)
+        filtros = filtros_template or {}
+        if conn is not None:
+            valores = query_templates.valores_template_vendas(conn, nomes=declaracoes, **filtros)
+        elif query_templates.filtros_em_cache(declaracoes, **filtros):
+            # Listas de Id já resolvidas: o cache de consultas pode ser usado sem acessar o banco
+            valores = query_templates.valores_template_vendas(None, nomes=declaracoes, **filtros)
+        else:
+            with obter_pool().conexao() as conn:
+                if conn is None:
+                    return None
+                valores = query_templates.valores_template_vendas(conn, nomes=declaracoes, **filtros)
+        query, parametros = query_templates.renderizar_template(query, valores)
+        return query, parametros, True
+    except ValueError as e:
+        print(f"ERRO no template da query {caminho_query}: {e}")
+        return None
+    except pyodbc.Error as e:
+        print(f"Erro ao resolver os filtros da query {caminho_query}: {e}")
+        traceback.print_exc(file=sys.stdout)
+        return None
+
+def buscar_dados_vendas(caminho_query=None, salvar_parquet=True, streaming=False, parametros=None,
+                        particionar=False, particionar_por_centro=False, usar_cache=True, atualizar_cache=False,
+                        filtros_template=None, pular_sem_alteracoes=False):
     """
     Função principal para buscar dados de vendas do banco de dados.
     
+    No modo streaming cada lote retornado pelo banco é gravado diretamente no
+    arquivo Parquet, mantendo o uso de memória limitado a um lote. O DataFrame
+    retornado é então montado a partir do arquivo gravado.
+    
+    O resultado de cada consulta é guardado no cache local (src/query_cache);
+    uma nova execução da mesma query com os mesmos parâmetros dentro do TTL
+    lê o resultado do cache sem acessar o banco.
+    
+    Queries que declaram parâmetros nomeados (src/query_templates) são
+    renderizadas com marcadores '?' e os filtros de seção/família são
+    resolvidos em listas de Id; a query padrão é querys/templates/gv_vendas.sql.
+    
+    Com pular_sem_alteracoes, a impressão digital das tabelas de origem no
+    período (src/change_detection) é calculada antes da extração e comparada
+    com a do último snapshot do mesmo escopo; se não mudou, o snapshot
+    existente é carregado e a extração não é feita.
+    
     Args:
         caminho_query (pathlib.Path ou str, opcional): Caminho para o arquivo da query.
         salvar_parquet (bool): Se True, salva os dados em formato Parquet.
+        streaming (bool): Se True, grava os lotes diretamente em Parquet durante a leitura.
+        parametros (sequence, opcional): Valores para os marcadores '?' da query
+            (ignorado quando a query é um template).
+        particionar (bool): Se True, salva como dataset particionado por Ano/Mes.
+        particionar_por_centro (bool): Se True, particiona também por Centro.
+        usar_cache (bool): Se False, o cache de consultas é ignorado (nem lido, nem gravado).
+        atualizar_cache (bool): Se True, a consulta é executada no banco e o resultado
+            substitui a entrada existente no cache.
+        filtros_template (dict, opcional): Argumentos de query_templates.valores_template_vendas
+            (data_inicio, data_fim, centros, secoes, familias).
+        pular_sem_alteracoes (bool): Se True, reutiliza o último snapshot da consulta quando as
+            tabelas de origem não mudaram no período (apenas queries template).
         
     Returns:
         pandas.DataFrame ou tuple: DataFrame com os dados ou tupla (DataFrame, caminho_parquet).
     """
-    # Define o caminho padrão da query se não for fornecido
-    if caminho_query is None:
-        caminho_query = pathlib.Path().resolve() / "querys" / "new" / "gv_vendas.sql"
+    consulta = montar_query_vendas(caminho_query, filtros_template, parametros)
+    if consulta is None:
+        return None
+    query, parametros, eh_template = consulta
+    
+    chave_cache = query_cache.chave_consulta(query, parametros) if usar_cache else None
+    if chave_cache and not atualizar_cache:
+        caminho_cache = query_cache.buscar_no_cache(chave_cache)
+        if caminho_cache is not None:
+            return _resultado_do_cache(caminho_cache, chave_cache, salvar_parquet, particionar,
+                                       particionar_por_centro, query, parametros)
+    
+    if pular_sem_alteracoes and not eh_template:
+        print("AVISO: A verificação de alterações exige uma query template (período conhecido); extraindo os dados.")
+        pular_sem_alteracoes = False
+    
+    impressao_digital = None
+    if pular_sem_alteracoes:
+        # Calculada antes da extração: alterações feitas durante a leitura aparecem na próxima verificação
+        with obter_pool().conexao() as conn:
+            if conn is None:
+                return None
+            impressao_digital = change_detection.calcular_impressao_digital(conn, filtros_template)
+        registro = change_detection.snapshot_sem_alteracoes(query, parametros, impressao_digital,
+                                                            particionar, particionar_por_centro)
+        if registro is not None:
+            return _resultado_sem_alteracoes(registro['caminho'], salvar_parquet)
+    
+    # A conexão vem do pool compartilhado: consultas seguintes na mesma sessão reutilizam o login
+    with obter_pool().conexao() as conn:
+        if conn is None:
+            return None
+        
+        if streaming:
+            resultado = _buscar_dados_vendas_streaming(conn, query, salvar_parquet, parametros,
+                                                       particionar, particionar_por_centro, chave_cache)
+            return _anotar_impressao_digital(resultado, impressao_digital)
+            
+        df_vendas = executar_query(conn, query, parametros)
+    
+    if df_vendas is not None:
+        df_vendas = aplicar_esquema_vendas(df_vendas)
+    if df_vendas is None or df_vendas.empty:
+        print("Não foram encontrados dados de vendas.")
+        return df_vendas  # Retorna None ou DataFrame vazio
+        
+    print(f"Dados de vendas recuperados com sucesso: {len(df_vendas)} registros")
+    if chave_cache and not salvar_parquet:
+        query_cache.salvar_no_cache(chave_cache, df_vendas)
+    
+    # Salvar como Parquet se solicitado; o cache passa a referenciar o snapshot gravado
+    if salvar_parquet:
+        if particionar:
+            caminho_parquet = salvar_como_dataset_particionado(
+                df_vendas, particionar_por_centro=particionar_por_centro, query=query, parametros=parametros,
+                forma_extracao='consulta')
+        else:
+            caminho_parquet = salvar_como_parquet(df_vendas, query=query, parametros=parametros,
+                                                  forma_extracao='consulta')
+        if caminho_parquet:
+            if chave_cache:
+                query_cache.salvar_no_cache(chave_cache, caminho_parquet, snapshot=True)
+            print(f"Para futuras análises, utilize o arquivo: {caminho_parquet}")
+            return _anotar_impressao_digital((df_vendas, caminho_parquet), impressao_digital)
+    
+    return df_vendas
+
+def _resultado_sem_alteracoes(caminho_snapshot, salvar_parquet=True):
+    """
+    Monta o resultado de buscar_dados_vendas a partir do snapshot cujas tabelas
+    de origem não mudaram desde a extração (nenhum arquivo novo é gravado).
+    
+    Args:
+        caminho_snapshot (pathlib.Path): Snapshot registrado com a mesma impressão digital.
+        salvar_parquet (bool): Se True, retorna também o caminho do snapshot.
+        
+    Returns:
+        pandas.DataFrame ou tuple: DataFrame com os dados ou tupla (DataFrame, caminho_parquet).
+    """
+    print(f"Tabelas de origem sem alterações desde a extração de {caminho_snapshot.name}; extração ignorada.")
+    df_vendas = carregar_do_parquet(caminho_snapshot)
+    if df_vendas is None or not salvar_parquet:
+        return df_vendas
+    print(f"Para futuras análises, utilize o arquivo: {caminho_snapshot}")
+    return df_vendas, caminho_snapshot
+
+def _anotar_impressao_digital(resultado, impressao_digital):
+    """Guarda no manifesto a impressão digital calculada antes da extração do snapshot gravado."""
+    if impressao_digital and isinstance(resultado, tuple) and len(resultado) == 2:
+        snapshot_manifest.anotar_snapshot(resultado[1], impressao_digital=impressao_digital)
+    return resultado
+
+def _resultado_do_cache(caminho_cache, chave_cache, salvar_parquet=True, particionar=False,
+                        particionar_por_centro=False, query=None, parametros=None):
+    """
+    Monta o resultado de buscar_dados_vendas a partir de uma entrada do cache de consultas.
+    
+    Quando a entrada referencia um snapshot do formato pedido (arquivo ou dataset
+    com as mesmas partições), o próprio snapshot é retornado, sem gravar outro.
+    Caso contrário (cópia do cache ou outro formato), um snapshot é gravado uma
+    única vez e a entrada passa a referenciá-lo.
+    
+    Args:
+        caminho_cache (pathlib.Path): Arquivo retornado por query_cache.buscar_no_cache.
+        chave_cache (str): Chave da entrada no cache de consultas.
+        salvar_parquet (bool): Se True, retorna também o caminho do snapshot.
+        particionar (bool): Se True, o snapshot deve ser um dataset particionado.
+        particionar_por_centro (bool): Se True, particionado também por Centro.
+        query (str, opcional): Query da consulta (registrada no manifesto de snapshots).
+        parametros (sequence, opcional): Parâmetros da query.
+        
+    Returns:
+        pandas.DataFrame ou tuple: DataFrame com os dados ou tupla (DataFrame, caminho_parquet).
+    """
+    if not salvar_parquet:
+        return carregar_do_parquet(caminho_cache)
     
-    conn = estabelecer_conexao()
-    if conn is None:
+    formato = (particionar, particionar and particionar_por_centro)
+    if not query_cache.arquivo_do_cache(caminho_cache) and _formato_snapshot(caminho_cache) == formato:
+        caminho_final = caminho_cache
+        manifesto = snapshot_manifest.carregar_manifesto(caminho_final.parent)
+        if manifesto is None or caminho_final.name not in manifesto['snapshots']:
+            snapshot_manifest.registrar_snapshot(caminho_final, query, parametros, 'cache')
+    else:
+        origem = caminho_cache
+        if caminho_cache.is_dir():
+            # Dataset de outro formato: os dados são lidos sem as colunas de partição
+            origem = carregar_do_parquet(caminho_cache)
+            if origem is None:
+                return None
+            origem = origem.drop(columns=[coluna for coluna in ('Ano', 'Mes') if coluna in origem.columns])
+        if particionar:
+            caminho_final = salvar_como_dataset_particionado(origem, particionar_por_centro=particionar_por_centro,
+                                                             query=query, parametros=parametros, forma_extracao='cache')
+        elif isinstance(origem, pd.DataFrame):
+            caminho_final = salvar_como_parquet(origem, query=query, parametros=parametros, forma_extracao='cache')
+        else:
+            caminho_final = caminho_saida_parquet()
+            shutil.copyfile(caminho_cache, caminho_final)
+            snapshot_manifest.registrar_snapshot(caminho_final, query, parametros, 'cache')
+        if caminho_final is None:
+            return None
+        query_cache.vincular_snapshot(chave_cache, caminho_final)
+    
+    df_vendas = carregar_do_parquet(caminho_final)
+    if df_vendas is None:
         return None
+    print(f"Para futuras análises, utilize o arquivo: {caminho_final}")
+    return df_vendas, caminho_final
+
+def _formato_snapshot(caminho):
+    """
+    Identifica o formato de um snapshot.
+    
+    Args:
+        caminho (pathlib.Path): Arquivo Parquet ou diretório de dataset.
         
+    Returns:
+        tuple: (particionado, particionado por Centro).
+    """
+    if not caminho.is_dir():
+        return False, False
+    particoes = particionamento_hive(caminho)
+    return True, particoes is not None and 'Centro' in particoes.schema.names
+
+def _buscar_dados_vendas_streaming(conn, query, salvar_parquet=True, parametros=None,
+                                   particionar=False, particionar_por_centro=False, chave_cache=None):
+    """
+    Executa a query em modo streaming e monta o DataFrame a partir do arquivo gravado.
+    
+    Args:
+        conn (pyodbc.Connection): Objeto de conexão com o banco de dados.
+        query (str): Query SQL a ser executada.
+        salvar_parquet (bool): Se False, o arquivo é usado apenas como área temporária.
+        parametros (sequence, opcional): Valores para os marcadores '?' da query.
+        particionar (bool): Se True, o arquivo gravado é convertido em dataset particionado.
+        particionar_por_centro (bool): Se True, particiona também por Centro.
+        chave_cache (str, opcional): Chave do cache de consultas onde o resultado é armazenado.
+        
+    Returns:
+        pandas.DataFrame ou tuple: DataFrame com os dados ou tupla (DataFrame, caminho_parquet).
+    """
+    if salvar_parquet and not particionar:
+        caminho_parquet = caminho_saida_parquet()
+    else:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        caminho_parquet = caminho_saida_parquet(f"tmp_dados_vendas_{timestamp}")
+    
+    manter_arquivo = False
     try:
-        query = ler_arquivo_query(caminho_query)
-        if query is None:
-            conn.close()
+        total_registros = executar_query_para_parquet(conn, query, caminho_parquet, parametros=parametros)
+        if total_registros is None:
             return None
-            
-        df_vendas = executar_query(conn, query)
         
-        if df_vendas is None or df_vendas.empty:
+        if total_registros == 0:
             print("Não foram encontrados dados de vendas.")
-            return df_vendas  # Retorna None ou DataFrame vazio
-            
-        print(f"Dados de vendas recuperados com sucesso: {len(df_vendas)} registros")
+            return pd.DataFrame()
         
-        # Salvar como Parquet se solicitado
-        if salvar_parquet:
-            caminho_parquet = salvar_como_parquet(df_vendas)
-            if caminho_parquet:
-                print(f"Para futuras análises, utilize o arquivo: {caminho_parquet}")
-                return df_vendas, caminho_parquet
+        print(f"Dados de vendas gravados com sucesso: {total_registros} registros "
+              f"({caminho_parquet.stat().st_size / (1024*1024):.2f} MB)")
+        if chave_cache and not salvar_parquet:
+            query_cache.salvar_no_cache(chave_cache, caminho_parquet)
+        
+        caminho_final = caminho_parquet
+        if salvar_parquet and particionar:
+            # O arquivo gravado serve de área temporária para o dataset particionado
+            caminho_final = salvar_como_dataset_particionado(
+                caminho_parquet, particionar_por_centro=particionar_por_centro, query=query,
+                parametros=parametros, forma_extracao='streaming')
+            if caminho_final is None:
+                return None
+        elif salvar_parquet:
+            snapshot_manifest.registrar_snapshot(caminho_parquet, query, parametros, 'streaming')
+        if chave_cache and salvar_parquet:
+            query_cache.salvar_no_cache(chave_cache, caminho_final, snapshot=True)
         
+        df_vendas = carregar_do_parquet(caminho_final)
+        if df_vendas is None:
+            return None
+        
+        if salvar_parquet:
+            manter_arquivo = not particionar
+            print(f"Para futuras análises, utilize o arquivo: {caminho_final}")
+            return df_vendas, caminho_final
         return df_vendas
     finally:
-        if conn:
-            conn.close()
-            print("Conexão com o banco de dados fechada.")
+        # Arquivo temporário, vazio ou incompleto não deve permanecer no diretório de saída
+        if not manter_arquivo and caminho_parquet.exists():
+            caminho_parquet.unlink()
+            if salvar_parquet and not particionar:
+                snapshot_manifest.remover_do_manifesto(caminho_parquet)
+
+def filtro_periodo(esquema, data_inicio=None, data_fim=None, coluna_data='DataCriacao'):
+    """
+    Monta a expressão de filtro de período sobre as partições Ano/Mes e a coluna de data.
+    
+    Args:
+        esquema (pyarrow.Schema): Esquema do dataset.
+        data_inicio (str ou date, opcional): Data inicial (inclusiva).
+        data_fim (str ou date, opcional): Data final (inclusiva).
+        coluna_data (str): Coluna de data filtrada linha a linha.
+        
+    Returns:
+        pyarrow.dataset.Expression: Expressão de filtro, ou None sem período.
+    """
+    filtro = None
+    particionado = 'Ano' in esquema.names and 'Mes' in esquema.names
+    tipo_data = esquema.field(coluna_data).type if coluna_data in esquema.names else None
+    
+    def valor_data(dia):
+        # Colunas de texto usam o formato 'AAAA-MM-DD ...', comparável lexicograficamente
+        if tipo_data is not None and (pa.types.is_timestamp(tipo_data) or pa.types.is_date(tipo_data)):
+            return pa.scalar(datetime(dia.year, dia.month, dia.day)).cast(tipo_data)
+        return dia.strftime('%Y-%m-%d')
+    
+    for limite, inicio in ((data_inicio, True), (data_fim, False)):
+        if limite is None:
+            continue
+        dia = pd.Timestamp(limite).date()
+        condicoes = []
+        if particionado:
+            # Poda de partições: apenas diretórios Ano/Mes dentro do período são lidos
+            if inicio:
+                condicoes.append((ds.field('Ano') > dia.year) | ((ds.field('Ano') == dia.year) & (ds.field('Mes') >= dia.month)))
+            else:
+                condicoes.append((ds.field('Ano') < dia.year) | ((ds.field('Ano') == dia.year) & (ds.field('Mes') <= dia.month)))
+        if tipo_data is not None:
+            # Filtro por linha, também usado para descartar grupos de linhas pelas estatísticas
+            if inicio:
+                condicoes.append(ds.field(coluna_data) >= valor_data(dia))
+            else:
+                condicoes.append(ds.field(coluna_data) < valor_data(dia + timedelta(days=1)))
+        for condicao in condicoes:
+            filtro = condicao if filtro is None else filtro & condicao
+    return filtro
+
+def particionamento_hive(caminho):
+    """
+    Identifica o particionamento Hive de um dataset com tipos explícitos
+    (Ano/Mes inteiros e demais chaves como texto, ex.: Centro='01').
+    
+    Args:
+        caminho (pathlib.Path): Arquivo ou diretório do dataset.
+        
+    Returns:
+        pyarrow.dataset.Partitioning: Particionamento do dataset, ou None se não particionado.
+    """
+    if not caminho.is_dir():
+        return None
+    primeiro_arquivo = next(caminho.rglob('*.parquet'), None)
+    if primeiro_arquivo is None:
+        return None
+    
+    campos = []
+    for parte in primeiro_arquivo.relative_to(caminho).parts[:-1]:
+        if '=' in parte:
+            nome = parte.split('=', 1)[0]
+            campos.append(pa.field(nome, pa.int32() if nome in ('Ano', 'Mes') else pa.string()))
+    return ds.partitioning(pa.schema(campos), flavor='hive') if campos else None
 
-def carregar_do_parquet(caminho_arquivo):
+@etapa('ler_parquet')
+def carregar_do_parquet(caminho_arquivo, data_inicio=None, data_fim=None, centros=None,
+                        classificacoes=None, colunas=None):
     """
-    Carrega um DataFrame a partir de um arquivo Parquet.
+    Carrega um DataFrame a partir de um arquivo Parquet ou de um dataset particionado.
+    
+    Quando filtros ou colunas são informados, apenas as partições, grupos de
+    linhas e colunas necessários são lidos.
     
     Args:
-        caminho_arquivo (pathlib.Path ou str): Caminho para o arquivo Parquet.
+        caminho_arquivo (pathlib.Path ou str): Caminho para o arquivo Parquet ou diretório do dataset.
+        data_inicio (str ou date, opcional): Data de criação inicial (inclusiva).
+        data_fim (str ou date, opcional): Data de criação final (inclusiva).
+        centros (list, opcional): Centros a carregar.
+        classificacoes (list, opcional): Classificações a carregar. Se o dataset não
+            possuir a coluna 'Classificacao', ela é calculada a partir de Secao/Familia.
+        colunas (list, opcional): Colunas a carregar.
         
     Returns:
         pandas.DataFrame: DataFrame carregado do arquivo.
@@ -223,9 +1212,49 @@ def carregar_do_parquet(caminho_arquivo):
         if not caminho.exists():
             print(f"ERRO: Arquivo não encontrado: {caminho}")
             return None
-            
-        print(f"Carregando dados do arquivo Parquet: {caminho}")
-        df = pd.read_parquet(caminho)
+        
+        # Snapshots registrados no manifesto: recusa esquemas sem as colunas obrigatórias
+        if not snapshot_manifest.verificar_esquema(caminho):
+            return None
+        
+        filtros_informados = any(valor is not None for valor in (data_inicio, data_fim, centros, classificacoes, colunas))
+        if caminho.is_file() and not filtros_informados:
+            print(f"Carregando dados do arquivo Parquet: {caminho}")
+            df = tabela_para_pandas(pq.read_table(caminho))
+            print(f"Dados carregados com sucesso: {len(df)} registros, {len(df.columns)} colunas")
+            return df
+        
+        print(f"Carregando dados do dataset Parquet: {caminho}")
+        dataset = ds.dataset(caminho, format='parquet', partitioning=particionamento_hive(caminho))
+        esquema = dataset.schema
+        
+        filtro = filtro_periodo(esquema, data_inicio, data_fim)
+        if centros:
+            condicao = ds.field('Centro').isin(list(centros))
+            filtro = condicao if filtro is None else filtro & condicao
+        
+        classificar_depois = False
+        if classificacoes:
+            if 'Classificacao' in esquema.names:
+                condicao = ds.field('Classificacao').isin(list(classificacoes))
+                filtro = condicao if filtro is None else filtro & condicao
+            else:
+                classificar_depois = True
+        
+        colunas_leitura = None
+        if colunas is not None:
+            colunas_leitura = [coluna for coluna in colunas if coluna in esquema.names]
+            if classificar_depois:
+                colunas_leitura += [coluna for coluna in ('Secao', 'Familia') if coluna not in colunas_leitura]
+        
+        df = tabela_para_pandas(dataset.to_table(columns=colunas_leitura, filter=filtro))
+        
+        if classificar_depois:
+            # A classificação é calculada apenas para os registros que passaram pelos demais filtros
+            classificacao = aplicar_regra_por_chave(df, ['Secao', 'Familia'], determinar_classificacao)
+            df = df[pd.Series(classificacao, index=df.index).isin(list(classificacoes))].reset_index(drop=True)
+            if colunas is not None:
+                df = df[[coluna for coluna in colunas_leitura if coluna in colunas]]
         
         print(f"Dados carregados com sucesso: {len(df)} registros, {len(df.columns)} colunas")
         return df
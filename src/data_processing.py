@@ -4,8 +4,138 @@ Removida a classificação "Outros" e simplificado o processo.
 Adicionada a coluna "hora" com base nas regras de classificação.
 """
 
+import numpy as np
 import pandas as pd
 
+from src.date_normalization import normalizar_datas
+from src.metrics import etapa, modo_silencioso, progresso
+
+def determinar_classificacao(secao, familia):
+    """
+    Determina a classificação de um registro a partir da seção e da família.
+    
+    Regras:
+    - Se a seção for "Cardiologia" → classifica como "Cardiologia"
+    - Se a seção for "Imagem" → classifica como "Imagem"
+    - Se a seção for "Anestesia" ou a família for "Cirurgia" → classifica como "Bloco Cirurgico"
+    - Se a família for "Retorno" ou "Consulta" → classifica como "Clinica"
+    - Nota: A query SQL deve garantir que somente registros que se enquadram nestas condições sejam retornados
+    
+    Args:
+        secao: Valor bruto da coluna 'Secao' (pode ser NaN).
+        familia: Valor bruto da coluna 'Familia' (pode ser NaN).
+        
+    Returns:
+        str: Classificação do registro.
+    """
+    # Tratando valores NaN nas colunas
+    secao = str(secao).strip() if pd.notna(secao) else ""
+    familia = str(familia).strip() if pd.notna(familia) else ""
+    
+    # Aplicando regras de classificação
+    if secao == 'Cardiologia' and familia not in ['Retorno', 'Consultas', 'Consulta']:
+        return 'Cardiologia'
+    elif secao == 'Imagem':
+        return 'Imagem'
+    elif familia == 'Cirurgia':
+        return 'Bloco Cirurgico'
+    elif familia in ['Retorno', 'Consultas', 'Consulta']:
+        return 'Clinica'
+    else:
+        # Assume-se que a query SQL filtra apenas registros relevantes
+        # Retornar uma classificação válida em vez de "Outros"
+        return 'Outros'  # Classificação padrão em caso de não correspondência
+
+def determinar_hora(classificacao, secao, familia, centro):
+    """
+    Determina a hora de um registro com base na classificação.
+    
+    Regras:
+    - Cardiologia: 0.75 hora
+    - Clinica: 1.5 horas se a seção for "Cardiologia", 1 hora se a família for "Consultas" ou "Consulta", senão 0.5 hora
+    - Imagem: 0.5 hora quando o centro for "RB", senão 0.67 hora
+    - Bloco Cirurgico: 3 horas
+    
+    Args:
+        classificacao: Valor da coluna 'Classificacao' (comparado sem normalização).
+        secao: Valor bruto da coluna 'Secao' (pode ser NaN).
+        familia: Valor bruto da coluna 'Familia' (pode ser NaN).
+        centro: Valor bruto da coluna 'Centro' (NaN ou None quando a coluna não existe).
+        
+    Returns:
+        float: Quantidade de horas do registro.
+    """
+    familia = str(familia).strip() if pd.notna(familia) else ""
+    secao = str(secao).strip() if pd.notna(secao) else ""
+    centro = str(centro).strip() if pd.notna(centro) else ""
+    
+    if classificacao == 'Cardiologia':
+        return 0.75
+    elif classificacao == 'Clinica':
+        if secao == 'Cardiologia':
+            return 1.5
+        elif familia in ['Consultas', 'Consulta']:
+            return 1.0
+        else:
+            return 0.5
+    elif classificacao == 'Imagem':
+        if centro == 'RB':
+            return 0.5
+        else:
+            return 0.67
+    elif classificacao == 'Bloco Cirurgico':
+        return 3.0
+    else:
+        # Valor padrão caso nenhuma regra se aplique
+        return 0.0
+
+def aplicar_regra_por_chave(df, colunas, regra, dtype=object):
+    """
+    Avalia uma regra uma única vez por combinação distinta de chaves e
+    propaga o resultado para todas as linhas com operações vetorizadas.
+    
+    Cada coluna é fatorizada (valores nulos recebem um código próprio), os
+    códigos são combinados em uma chave inteira única e a regra é chamada
+    apenas para as combinações presentes no DataFrame. Como a regra recebe os
+    mesmos valores brutos que receberia linha a linha, o resultado é idêntico
+    ao de ``df.apply(..., axis=1)``.
+    
+    Args:
+        df (pandas.DataFrame): DataFrame com os dados.
+        colunas (list): Colunas passadas à regra, na ordem dos argumentos.
+            Colunas ausentes no DataFrame são passadas como None.
+        regra (callable): Função que recebe um valor por coluna.
+        dtype: Tipo do array de resultados.
+        
+    Returns:
+        numpy.ndarray: Resultado da regra para cada linha do DataFrame.
+    """
+    codigos = []
+    valores_unicos = []
+    for coluna in colunas:
+        if coluna in df.columns:
+            codigo, unicos = pd.factorize(df[coluna], use_na_sentinel=True)
+            # Código 0 reservado para valores nulos
+            codigos.append(codigo.astype(np.int64) + 1)
+            valores_unicos.append([np.nan] + list(unicos))
+        else:
+            codigos.append(np.zeros(len(df), dtype=np.int64))
+            valores_unicos.append([None])
+    
+    dimensoes = tuple(len(unicos) for unicos in valores_unicos)
+    chave = np.ravel_multi_index(codigos, dimensoes)
+    chaves_unicas, inverso = np.unique(chave, return_inverse=True)
+    
+    # Avaliação da regra apenas para as combinações existentes
+    indices = np.unravel_index(chaves_unicas, dimensoes)
+    resultados = np.array(
+        [regra(*(unicos[i] for unicos, i in zip(valores_unicos, combinacao)))
+         for combinacao in zip(*indices)],
+        dtype=dtype
+    )
+    return resultados[inverso.reshape(-1)]
+
+@etapa('classificar')
 def classificar_vendas(df):
     """
     Classifica os registros de vendas conforme regras específicas.
@@ -27,10 +157,11 @@ def classificar_vendas(df):
         print("Coluna 'Classificacao' já existe no DataFrame. Pulando classificação.")
         
         # Mostrar distribuição das classificações existentes
-        contagem = df['Classificacao'].value_counts()
-        print("\nDistribuição das classificações existentes:")
-        for classe, quantidade in contagem.items():
-            print(f"- {classe}: {quantidade} registros")
+        if not modo_silencioso():
+            contagem = df['Classificacao'].value_counts()
+            print("\nDistribuição das classificações existentes:")
+            for classe, quantidade in contagem.items():
+                progresso(f"- {classe}: {quantidade} registros")
             
         return df
     
@@ -42,48 +173,20 @@ def classificar_vendas(df):
             print(f"Colunas disponíveis: {', '.join(df.columns)}")
             return None
     
-    # Criando a coluna de classificação
-    def determinar_classificacao(row):
-        """
-        Função para determinar a classificação de cada registro.
-        
-        Regras:
-        - Se a seção for "Cardiologia" → classifica como "Cardiologia"
-        - Se a seção for "Imagem" → classifica como "Imagem"
-        - Se a seção for "Anestesia" ou a família for "Cirurgia" → classifica como "Bloco Cirurgico"
-        - Se a família for "Retorno" ou "Consulta" → classifica como "Clinica"
-        - Nota: A query SQL deve garantir que somente registros que se enquadram nestas condições sejam retornados
-        """
-        # Tratando valores NaN nas colunas
-        secao = str(row['Secao']).strip() if pd.notna(row['Secao']) else ""
-        familia = str(row['Familia']).strip() if pd.notna(row['Familia']) else ""
-        
-        # Aplicando regras de classificação
-        if secao == 'Cardiologia' and familia not in ['Retorno', 'Consultas', 'Consulta']:
-            return 'Cardiologia'
-        elif secao == 'Imagem':
-            return 'Imagem'
-        elif familia == 'Cirurgia':
-            return 'Bloco Cirurgico'
-        elif familia in ['Retorno', 'Consultas', 'Consulta']:
-            return 'Clinica'
-        else:
-            # Assume-se que a query SQL filtra apenas registros relevantes
-            # Retornar uma classificação válida em vez de "Outros"
-            return 'Outros'  # Classificação padrão em caso de não correspondência
+    # Aplicando a regra de classificação uma vez por combinação de Secao/Familia
+    df['Classificacao'] = aplicar_regra_por_chave(df, ['Secao', 'Familia'], determinar_classificacao)
     
-    # Aplicando a função de classificação a cada linha
-    df['Classificacao'] = df.apply(determinar_classificacao, axis=1)
-    
-    # Contagem de registros por classificação para validação
-    contagem = df['Classificacao'].value_counts()
-    print("\nDistribuição das classificações:")
-    for classe, quantidade in contagem.items():
-        print(f"- {classe}: {quantidade} registros")
+    # Contagem de registros por classificação para validação (dispensada no modo silencioso)
+    if not modo_silencioso():
+        contagem = df['Classificacao'].value_counts()
+        print("\nDistribuição das classificações:")
+        for classe, quantidade in contagem.items():
+            progresso(f"- {classe}: {quantidade} registros")
     
     print("Classificação concluída com sucesso!")
     return df
 
+@etapa('preparar')
 def preparar_dados(df):
     """
     Versão simplificada que prepara os dados mínimos necessários para análise,
@@ -121,15 +224,8 @@ def preparar_dados(df):
             # Substituindo valores ausentes por zero
             df_processado[coluna] = df_processado[coluna].fillna(0)
     
-    # Adicionando colunas úteis para análise temporal
-    if 'DataCriacao' in df_processado.columns:
-        # Converter para datetime apenas se necessário
-        if not pd.api.types.is_datetime64_dtype(df_processado['DataCriacao']):
-            df_processado['DataCriacao'] = pd.to_datetime(df_processado['DataCriacao'], errors='coerce')
-        
-        # Adicionando colunas de data formatadas para agrupamentos
-        df_processado['Ano'] = df_processado['DataCriacao'].dt.year
-        df_processado['Mes'] = df_processado['DataCriacao'].dt.month
+    # Adicionando colunas úteis para análise temporal (sem custo se as datas já foram normalizadas)
+    df_processado = normalizar_datas(df_processado)
     
     # Verificando se a coluna Classificacao existe (deve ter sido criada pela função classificar_vendas)
     if 'Classificacao' not in df_processado.columns:
@@ -138,49 +234,15 @@ def preparar_dados(df):
         if df_processado is None:
             return None
     
-    # Adicionando a coluna "hora" com base nas regras de classificação
-    def determinar_hora(row):
-        """
-        Função para determinar a hora de cada registro com base na classificação.
-        
-        Regras:
-        - Cardiologia: 1.5 horas se Familia for "Consultas" ou "Consulta", senão 0.75 horas
-        - Clinica: 1 hora
-        - Imagem: 0.5 hora quando o centro for "RB", senão 0.67 hora
-        - Bloco Cirurgico: 3 horas
-        """
-        classificacao = row['Classificacao'] if 'Classificacao' in row else ""
-        familia = str(row['Familia']).strip() if pd.notna(row['Familia']) else ""
-        secao = str(row['Secao']).strip() if pd.notna(row['Secao']) else ""
-        centro = str(row['Centro']).strip() if 'Centro' in row and pd.notna(row['Centro']) else ""
-        
-        if classificacao == 'Cardiologia':
-            return 0.75
-        elif classificacao == 'Clinica':
-            if secao == 'Cardiologia':
-                return 1.5
-            elif familia in ['Consultas', 'Consulta']:
-                return 1.0
-            else:
-                return 0.5
-        elif classificacao == 'Imagem':
-            if centro == 'RB':
-                return 0.5
-            else:
-                return 0.67
-        elif classificacao == 'Bloco Cirurgico':
-            return 3.0
-        else:
-            # Valor padrão caso nenhuma regra se aplique
-            return 0.0
-    
     # Verificando se a coluna Centro existe
     if 'Centro' not in df_processado.columns:
         print("AVISO: Coluna 'Centro' não encontrada. A regra para Imagem pode não funcionar corretamente.")
     
-    # Aplicando a função de determinação de hora a cada linha
+    # Aplicando a regra de horas uma vez por combinação de Classificacao/Secao/Familia/Centro
     print("Adicionando coluna 'hora' com base nas regras de classificação...")
-    df_processado['hora'] = df_processado.apply(determinar_hora, axis=1)
+    df_processado['hora'] = aplicar_regra_por_chave(
+        df_processado, ['Classificacao', 'Secao', 'Familia', 'Centro'], determinar_hora, dtype=np.float64
+    )
     
     # Verificar se a coluna foi criada e mostrar estatísticas
     if 'hora' in df_processado.columns:
@@ -190,10 +252,11 @@ def preparar_dados(df):
         print(f"- Valores únicos: {df_processado['hora'].nunique()}")
         print(f"- Média: {df_processado['hora'].mean():.2f} horas")
         
-        # Mostrar valores por classificação
-        for classe in df_processado['Classificacao'].unique():
-            media = df_processado[df_processado['Classificacao'] == classe]['hora'].mean()
-            print(f"- Média para {classe}: {media:.2f} horas")
+        # Mostrar valores por classificação (dispensado no modo silencioso)
+        if not modo_silencioso():
+            medias = df_processado.groupby('Classificacao', sort=False, observed=True)['hora'].mean()
+            for classe, media in medias.items():
+                progresso(f"- Média para {classe}: {media:.2f} horas")
     else:
         print("ERRO: Não foi possível criar a coluna 'hora'.")
     
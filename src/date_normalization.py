@@ -0,0 +1,126 @@
+"""
+Módulo de normalização das colunas de data dos dados de vendas.
+
+A query gv_vendas retorna DataCriacao e DataExecucao como texto no formato
+'AAAA-MM-DD HH:MM:SS' (CONVERT 120), eventualmente com um deslocamento de
+fuso no final (ex.: '2023-03-09 04:40:17 -03'). Esta etapa converte essas
+colunas uma única vez para datetime sem fuso e deriva Ano/Mes como chaves
+inteiras; as etapas seguintes consomem o resultado sem converter novamente.
+"""
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from src.metrics import etapa
+
+# Formato produzido por CONVERT(VARCHAR(23), ..., 120) no SQL Server
+FORMATO_DATA_HORA = '%Y-%m-%d %H:%M:%S'
+
+# Colunas de data retornadas como texto pela query de vendas
+COLUNAS_DATA = ('DataCriacao', 'DataExecucao')
+
+# Deslocamento de fuso após o horário: ' -03', '+00:00', ' GMT', 'Z', etc.
+_PADRAO_FUSO = r'^(.*\d{2}:\d{2}(?::\d{2})?(?:\.\d+)?)\s*(?:[+-]\d{2}(?::?\d{2})?|GMT|UTC|Z)$'
+
+def remover_fuso_texto(textos):
+    """
+    Remove o deslocamento de fuso do final de datas em texto, com operações vetorizadas.
+    Datas sem horário (ex.: '2023-03-09') não são alteradas.
+
+    Args:
+        textos (pandas.Series ou pandas.Index): Datas em texto.
+
+    Returns:
+        pandas.Series ou pandas.Index: Datas sem o deslocamento de fuso.
+    """
+    return textos.str.strip().str.replace(_PADRAO_FUSO, r'\1', regex=True)
+
+def converter_data_hora(serie, formato=FORMATO_DATA_HORA):
+    """
+    Converte uma coluna para datetime sem fuso.
+
+    O texto é interpretado em bloco com o formato conhecido; apenas os valores
+    que falham (com deslocamento de fuso ou em outro formato ISO 8601) são
+    tratados em seguida, uma vez por texto distinto, e os inválidos viram NaT.
+    No caminho rápido não há cache: o strptime do Arrow é mais barato que
+    agrupar os valores repetidos. Colunas datetime com fuso
+    mantêm o horário local e perdem apenas o fuso.
+
+    Args:
+        serie (pandas.Series): Coluna com datas em texto ou datetime.
+        formato (str): Formato esperado do texto.
+
+    Returns:
+        pandas.Series: Coluna datetime64 sem fuso.
+    """
+    if isinstance(serie.dtype, pd.DatetimeTZDtype):
+        return serie.dt.tz_localize(None)
+    if pd.api.types.is_datetime64_dtype(serie):
+        return serie
+
+    # Caminho rápido: o formato conhecido é interpretado em bloco pelo Arrow
+    textos = serie.astype('string')
+    convertidas = pc.strptime(pa.array(textos), format=formato, unit='s', error_is_null=True)
+    datas = pd.Series(convertidas.to_pandas(), index=serie.index, name=serie.name).astype('datetime64[ns]')
+
+    # Apenas os valores fora do formato (com fuso, frações de segundo, só a data) são tratados novamente,
+    # cada texto distinto uma única vez (horários repetidos, ex.: linhas do mesmo documento)
+    falhas = datas.isna() & textos.notna()
+    if falhas.any():
+        codigos, unicos = pd.factorize(textos[falhas])
+        restantes = remover_fuso_texto(pd.Series(unicos, dtype='string'))
+        # Em ns: a segunda tentativa pode trazer frações de segundo
+        corrigidas = pd.to_datetime(restantes, format=formato, errors='coerce').astype('datetime64[ns]')
+        pendentes = corrigidas.isna()
+        if pendentes.any():
+            corrigidas[pendentes] = pd.to_datetime(restantes[pendentes], format='ISO8601',
+                                                   errors='coerce').astype('datetime64[ns]')
+        datas[falhas] = corrigidas.to_numpy()[codigos]
+
+    return datas
+
+@etapa('normalizar_datas')
+def normalizar_datas(df, colunas=COLUNAS_DATA, coluna_periodo='DataCriacao', derivar_periodo=True):
+    """
+    Etapa única de normalização de datas: converte as colunas de data para
+    datetime sem fuso e deriva Ano/Mes da coluna de período.
+
+    Colunas já normalizadas não são convertidas novamente, de modo que a etapa
+    pode ser chamada mais de uma vez sem custo relevante. O DataFrame recebido
+    é alterado e retornado.
+
+    Args:
+        df (pandas.DataFrame): DataFrame com os dados de vendas.
+        colunas (sequence): Colunas de data a normalizar (as ausentes são ignoradas).
+        coluna_periodo (str): Coluna de onde Ano e Mes são derivados.
+        derivar_periodo (bool): Se True, cria ou atualiza as colunas Ano e Mes.
+
+    Returns:
+        pandas.DataFrame: DataFrame com as datas normalizadas.
+    """
+    if df is None or df.empty:
+        return df
+
+    convertidas = []
+    for coluna in df.columns:
+        serie = df[coluna]
+        precisa_converter = (
+            isinstance(serie.dtype, pd.DatetimeTZDtype)
+            or (coluna in colunas and not pd.api.types.is_datetime64_dtype(serie))
+        )
+        if precisa_converter:
+            df[coluna] = converter_data_hora(serie)
+            convertidas.append(coluna)
+    if convertidas:
+        print(f"Colunas de data normalizadas: {', '.join(convertidas)}")
+
+    if derivar_periodo and coluna_periodo in df.columns:
+        # Ano/Mes existentes (ex.: partições do dataset) só são recalculados se a data mudou
+        if coluna_periodo in convertidas or 'Ano' not in df.columns or 'Mes' not in df.columns:
+            datas = df[coluna_periodo]
+            tipo = 'int32' if not datas.isna().any() else 'Int32'
+            df['Ano'] = datas.dt.year.astype(tipo)
+            df['Mes'] = datas.dt.month.astype(tipo)
+
+    return df
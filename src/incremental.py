@@ -0,0 +1,193 @@
+"""
+Módulo para extração incremental dos dados de vendas baseada em marca d'água.
+
+A cada extração bem-sucedida é registrada a maior DataCriacao extraída. As
+extrações seguintes buscam apenas os documentos criados a partir dessa marca
+menos uma janela de segurança, substituindo essa janela no conjunto existente
+para capturar edições e cancelamentos tardios (Estado = 'A').
+"""
+
+import sys
+import json
+import pathlib
+import traceback
+from datetime import datetime, timedelta
+import pandas as pd
+
+from src.data_access import buscar_dados_vendas, carregar_do_parquet, montar_query_vendas, salvar_como_parquet
+from src.date_normalization import converter_data_hora
+
+# Janela padrão (em dias) reprocessada a cada extração incremental
+JANELA_PADRAO_DIAS = 7
+
+ARQUIVO_ESTADO = "estado_incremental_vendas.json"
+
+def _caminho_estado():
+    """
+    Retorna o caminho do arquivo de estado da extração incremental.
+
+    Returns:
+        pathlib.Path: Caminho do arquivo de estado no diretório de saída.
+    """
+    return pathlib.Path().resolve() / "output" / ARQUIVO_ESTADO
+
+def carregar_estado():
+    """
+    Carrega o estado da última extração bem-sucedida.
+
+    Returns:
+        dict: Estado com 'caminho_parquet' e 'marca_dagua', ou None se não existir.
+    """
+    caminho = _caminho_estado()
+    if not caminho.exists():
+        return None
+    try:
+        estado = json.loads(caminho.read_text(encoding='utf-8'))
+        if not pathlib.Path(estado.get('caminho_parquet', '')).exists():
+            print(f"AVISO: Arquivo base da extração incremental não encontrado: {estado.get('caminho_parquet')}")
+            return None
+        return estado
+    except Exception as e:
+        print(f"Erro ao ler o estado da extração incremental: {e}")
+        return None
+
+def salvar_estado(caminho_parquet, marca_dagua):
+    """
+    Registra o estado da extração de forma atômica.
+
+    Args:
+        caminho_parquet (pathlib.Path ou str): Arquivo Parquet com o conjunto completo.
+        marca_dagua (pandas.Timestamp): Maior DataCriacao presente no conjunto.
+    """
+    caminho = _caminho_estado()
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    estado = {
+        'caminho_parquet': str(caminho_parquet),
+        'marca_dagua': marca_dagua.strftime('%Y-%m-%d %H:%M:%S') if pd.notna(marca_dagua) else None,
+        'atualizado_em': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+    }
+    temporario = caminho.with_suffix('.tmp')
+    temporario.write_text(json.dumps(estado, indent=2), encoding='utf-8')
+    temporario.replace(caminho)
+    print(f"Marca d'água registrada: {estado['marca_dagua']}")
+
+def _datas_criacao(df, coluna='DataCriacao'):
+    """
+    Retorna a coluna de data de criação como datetime.
+
+    Args:
+        df (pandas.DataFrame): DataFrame com os dados de vendas.
+        coluna (str): Nome da coluna de data.
+
+    Returns:
+        pandas.Series: Datas convertidas (NaT quando inválidas).
+    """
+    return converter_data_hora(df[coluna])
+
+def calcular_marca_dagua(df, coluna='DataCriacao'):
+    """
+    Calcula a maior data de criação presente no DataFrame.
+
+    Args:
+        df (pandas.DataFrame): DataFrame com os dados de vendas.
+        coluna (str): Nome da coluna de data.
+
+    Returns:
+        pandas.Timestamp: Maior data encontrada (NaT se não houver datas válidas).
+    """
+    if df is None or df.empty or coluna not in df.columns:
+        return pd.NaT
+    return _datas_criacao(df, coluna).max()
+
+def mesclar_incremento(df_base, df_novo, corte, coluna='DataCriacao'):
+    """
+    Substitui no conjunto existente os registros a partir do corte pelos registros novos.
+
+    Registros da janela que foram editados ou cancelados no banco são
+    substituídos (ou descartados) porque a janela inteira é extraída novamente.
+
+    Args:
+        df_base (pandas.DataFrame): Conjunto existente.
+        df_novo (pandas.DataFrame): Registros extraídos a partir do corte.
+        corte (pandas.Timestamp): Início da janela reextraída.
+        coluna (str): Nome da coluna de data.
+
+    Returns:
+        pandas.DataFrame: Conjunto mesclado.
+    """
+    # Registros sem data válida não são alcançados pela janela e são mantidos
+    manter = ~(_datas_criacao(df_base, coluna) >= corte)
+    df_mantido = df_base[manter]
+    print(f"Registros mantidos do conjunto existente: {len(df_mantido)} "
+          f"(substituídos na janela: {len(df_base) - len(df_mantido)})")
+
+    if df_novo is None or df_novo.empty:
+        return df_mantido.reset_index(drop=True)
+
+    return pd.concat([df_mantido, df_novo], ignore_index=True)
+
+def buscar_dados_vendas_incremental(janela_dias=JANELA_PADRAO_DIAS, caminho_query=None):
+    """
+    Busca os dados de vendas de forma incremental e mescla com o último conjunto extraído.
+    Sem estado anterior, realiza uma extração completa e registra a marca d'água.
+
+    Args:
+        janela_dias (int): Dias antes da marca d'água que são extraídos novamente.
+        caminho_query (pathlib.Path ou str, opcional): Template da query de vendas com o filtro
+            criado_desde (padrão: querys/templates/gv_vendas.sql).
+
+    Returns:
+        tuple: Tupla (DataFrame, caminho_parquet) com o conjunto completo, ou None em caso de erro.
+    """
+    estado = carregar_estado()
+    if estado is None or estado.get('marca_dagua') is None:
+        print("Nenhuma extração anterior registrada. Realizando extração completa...")
+        resultado = buscar_dados_vendas(caminho_query=caminho_query, salvar_parquet=True, streaming=True)
+        if not (isinstance(resultado, tuple) and len(resultado) == 2):
+            return None
+        df_vendas, caminho_parquet = resultado
+        salvar_estado(caminho_parquet, calcular_marca_dagua(df_vendas))
+        return df_vendas, caminho_parquet
+
+    try:
+        marca_dagua = pd.Timestamp(estado['marca_dagua'])
+        corte = marca_dagua - timedelta(days=janela_dias)
+        print(f"Marca d'água anterior: {marca_dagua} | Extraindo registros a partir de {corte} "
+              f"(janela de {janela_dias} dias)")
+
+        df_novo = buscar_dados_vendas(
+            caminho_query=caminho_query,
+            salvar_parquet=False,
+            streaming=True,
+            filtros_template={'criado_desde': corte.to_pydatetime()},
+            usar_cache=False  # A janela precisa refletir o estado atual do banco
+        )
+        if df_novo is None:
+            print("ERRO: Falha na extração incremental.")
+            return None
+        print(f"Registros extraídos na janela: {len(df_novo)}")
+
+        df_base = carregar_do_parquet(estado['caminho_parquet'])
+        if df_base is None:
+            return None
+
+        df_vendas = mesclar_incremento(df_base, df_novo, corte)
+        # Registrado com a query da extração completa: o conjunto mesclado tem o mesmo escopo da base
+        consulta_base = montar_query_vendas(caminho_query)
+        query_base, parametros_base = consulta_base[:2] if consulta_base else (None, None)
+        caminho_parquet = salvar_como_parquet(df_vendas, query=query_base, parametros=parametros_base,
+                                              forma_extracao='incremental')
+        if caminho_parquet is None:
+            return None
+
+        nova_marca = calcular_marca_dagua(df_novo)
+        if pd.isna(nova_marca) or nova_marca < marca_dagua:
+            nova_marca = marca_dagua
+        salvar_estado(caminho_parquet, nova_marca)
+
+        print(f"Conjunto atualizado: {len(df_vendas)} registros")
+        return df_vendas, caminho_parquet
+    except Exception as e:
+        print(f"Erro na extração incremental: {e}")
+        traceback.print_exc(file=sys.stdout)
+        return None
@@ -0,0 +1,325 @@
+"""
+Módulo de métricas de desempenho por etapa.
+
+Cada etapa do pipeline (conexão, execução da query, busca dos registros,
+gravação e leitura do Parquet, classificação, preparação, agregação, pivot e
+gravação do Excel) é medida com tempo de relógio, tempo de CPU do processo,
+registros de entrada e saída, registros por segundo e pico de memória
+residente. Durante uma execução iniciada com iniciar_execucao, cada medida é
+acrescentada como uma linha JSON ao arquivo metricas_execucoes.jsonl do
+diretório de saída; fora de uma execução as etapas não são medidas.
+
+O modo silencioso desativa as mensagens por lote e por registro dos trechos
+mais executados (ver progresso); avisos, erros e o resumo final continuam
+sendo impressos.
+"""
+
+import os
+import sys
+import json
+import time
+import pathlib
+import platform
+import functools
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+import pandas as pd
+
+# Arquivo do log de execuções (uma linha JSON por etapa), no diretório de saída
+NOME_LOG_EXECUCOES = "metricas_execucoes.jsonl"
+
+# Intervalo entre amostras de memória durante uma etapa
+INTERVALO_AMOSTRA_SEGUNDOS = 0.005
+
+_BYTES_POR_MB = 1024 * 1024
+
+# Execução em andamento (None fora de uma execução)
+_execucao = None
+_trava_log = threading.Lock()
+_silencioso = False
+
+# Etapas em andamento em cada thread (identificador da thread -> nomes, da externa à interna)
+_pilhas = {}
+
+# Objetos avisados no início e no fim de cada etapa (ex.: src.profiling)
+_observadores = []
+
+def memoria_residente():
+    """
+    Retorna a memória residente atual do processo.
+
+    Returns:
+        int: Bytes residentes (0 se a plataforma não for suportada).
+    """
+    if sys.platform.startswith('linux'):
+        with open('/proc/self/statm') as arquivo:
+            return int(arquivo.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    if sys.platform == 'win32':
+        import ctypes
+        from ctypes import wintypes
+
+        class ContadoresMemoria(ctypes.Structure):
+            _fields_ = [
+                ('cb', wintypes.DWORD),
+                ('PageFaultCount', wintypes.DWORD),
+                ('PeakWorkingSetSize', ctypes.c_size_t),
+                ('WorkingSetSize', ctypes.c_size_t),
+                ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+                ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+                ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                ('PagefileUsage', ctypes.c_size_t),
+                ('PeakPagefileUsage', ctypes.c_size_t),
+            ]
+
+        contadores = ContadoresMemoria()
+        contadores.cb = ctypes.sizeof(ContadoresMemoria)
+        processo = ctypes.windll.kernel32.GetCurrentProcess()
+        ctypes.windll.psapi.GetProcessMemoryInfo(processo, ctypes.byref(contadores), contadores.cb)
+        return contadores.WorkingSetSize
+    try:
+        import resource
+        # macOS informa o pico em bytes (não há leitura do valor atual sem dependências)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except ImportError:
+        return 0
+
+def definir_modo_silencioso(ativo=True):
+    """
+    Ativa ou desativa o modo silencioso.
+
+    Args:
+        ativo (bool): Se True, as mensagens de progresso por lote/registro não são impressas.
+    """
+    global _silencioso
+    _silencioso = ativo
+
+def modo_silencioso():
+    """Indica se o modo silencioso está ativo."""
+    return _silencioso
+
+def progresso(mensagem):
+    """
+    Imprime uma mensagem de progresso dos trechos mais executados (por lote,
+    por classificação, por tabela), exceto no modo silencioso.
+
+    Args:
+        mensagem (str): Mensagem a imprimir.
+    """
+    if not _silencioso:
+        print(mensagem)
+
+def registrar_observador(observador):
+    """
+    Registra um objeto avisado no início e no fim de cada etapa medida.
+
+    Args:
+        observador: Objeto com os métodos inicio_etapa(etapas) e fim_etapa(etapas),
+            chamados na thread da etapa com a tupla das etapas em andamento.
+    """
+    _observadores.append(observador)
+
+def remover_observador(observador):
+    """Remove um observador registrado com registrar_observador."""
+    if observador in _observadores:
+        _observadores.remove(observador)
+
+def etapas_em_andamento():
+    """
+    Retorna as etapas em andamento em cada thread.
+
+    Returns:
+        dict: Identificador da thread -> tupla com os nomes das etapas, da externa à interna.
+    """
+    return {thread: tuple(pilha) for thread, pilha in list(_pilhas.items()) if pilha}
+
+def iniciar_execucao(diretorio_saida='output', silencioso=None):
+    """
+    Inicia o registro das métricas de uma execução.
+
+    Args:
+        diretorio_saida (pathlib.Path ou str): Diretório onde o log de execuções é gravado.
+        silencioso (bool, opcional): Ativa ou desativa o modo silencioso.
+
+    Returns:
+        pathlib.Path: Caminho do log de execuções.
+    """
+    global _execucao
+    if silencioso is not None:
+        definir_modo_silencioso(silencioso)
+    diretorio = pathlib.Path(diretorio_saida)
+    diretorio.mkdir(parents=True, exist_ok=True)
+    _execucao = {
+        'id': datetime.now().strftime('%Y%m%d_%H%M%S_%f'),
+        'caminho_log': diretorio / NOME_LOG_EXECUCOES,
+        'inicio': time.perf_counter(),
+        'inicio_cpu': time.process_time(),
+        'etapas': [],
+    }
+    _gravar_linha({
+        'etapa': 'inicio',
+        'plataforma': platform.platform(),
+        'python': platform.python_version(),
+        'pid': os.getpid(),
+        'silencioso': _silencioso,
+    })
+    return _execucao['caminho_log']
+
+def _gravar_linha(registro):
+    """Acrescenta um registro ao log da execução em andamento."""
+    if _execucao is None:
+        return
+    registro = {'execucao': _execucao['id'], 'momento': datetime.now().isoformat(timespec='milliseconds'),
+                **registro}
+    linha = json.dumps(registro, ensure_ascii=False, default=str)
+    with _trava_log:
+        try:
+            with open(_execucao['caminho_log'], 'a', encoding='utf-8') as arquivo:
+                arquivo.write(linha + '\n')
+        except OSError as e:
+            print(f"AVISO: Não foi possível gravar as métricas da etapa '{registro.get('etapa')}': {e}")
+
+@contextmanager
+def medir_etapa(nome, linhas_entrada=None, resultados=None, **detalhes):
+    """
+    Mede o tempo, o tempo de CPU e o pico de memória residente de uma etapa.
+
+    O dicionário entregue ao bloco pode receber 'linhas_saida' (e outros
+    detalhes). Ao final a medida é gravada no log da execução em andamento e
+    acrescentada a resultados, se informado. Sem execução em andamento e sem
+    resultados a etapa não é medida.
+
+    Args:
+        nome (str): Nome da etapa.
+        linhas_entrada (int, opcional): Quantidade de registros recebidos pela etapa.
+        resultados (list, opcional): Lista onde a medida é acrescentada.
+        **detalhes: Informações adicionais gravadas com a medida.
+
+    Yields:
+        dict: Medida da etapa em andamento.
+    """
+    medida = {'etapa': nome, 'linhas_entrada': linhas_entrada, 'linhas_saida': None, **detalhes}
+    if _execucao is None and resultados is None:
+        yield medida
+        return
+
+    thread = threading.get_ident()
+    pilha = _pilhas.setdefault(thread, [])
+    nivel = len(pilha)
+    pilha.append(nome)
+    inicial = memoria_residente()
+    pico = [inicial]
+    parar = threading.Event()
+
+    def amostrar():
+        while not parar.wait(INTERVALO_AMOSTRA_SEGUNDOS):
+            pico[0] = max(pico[0], memoria_residente())
+
+    amostrador = threading.Thread(target=amostrar, daemon=True)
+    amostrador.start()
+    # Registrada no início para que o resumo liste cada etapa antes das etapas internas
+    if _execucao is not None:
+        _execucao['etapas'].append(medida)
+    for observador in _observadores:
+        observador.inicio_etapa(tuple(pilha))
+    inicio = time.perf_counter()
+    inicio_cpu = time.process_time()
+    try:
+        yield medida
+    except BaseException as e:
+        medida['erro'] = repr(e)
+        raise
+    finally:
+        segundos = time.perf_counter() - inicio
+        segundos_cpu = time.process_time() - inicio_cpu
+        for observador in _observadores:
+            observador.fim_etapa(tuple(pilha))
+        del pilha[nivel:]
+        if not pilha:
+            _pilhas.pop(thread, None)
+        parar.set()
+        amostrador.join()
+        pico[0] = max(pico[0], memoria_residente())
+        linhas = medida['linhas_entrada'] if medida['linhas_entrada'] is not None else medida['linhas_saida']
+        medida.update({
+            'nivel': nivel,
+            'segundos': round(segundos, 4),
+            'segundos_cpu': round(segundos_cpu, 4),
+            'linhas_por_segundo': round(linhas / segundos) if linhas and segundos > 0 else None,
+            'pico_mb': round(pico[0] / _BYTES_POR_MB, 1),
+            'incremento_mb': round((pico[0] - inicial) / _BYTES_POR_MB, 1),
+        })
+        if resultados is not None:
+            resultados.append(medida)
+        if _execucao is not None:
+            _gravar_linha(medida)
+
+def _quantidade_linhas(valor):
+    """Quantidade de registros de um resultado (DataFrame, tupla com DataFrame ou total)."""
+    if isinstance(valor, tuple) and valor:
+        valor = valor[0]
+    if isinstance(valor, pd.DataFrame):
+        return len(valor)
+    if isinstance(valor, int) and not isinstance(valor, bool):
+        return valor
+    return None
+
+def etapa(nome):
+    """
+    Decorador que mede cada chamada da função como uma etapa. Os registros de
+    entrada são os do primeiro argumento (se for um DataFrame) e os de saída
+    os do resultado (DataFrame, tupla iniciada por DataFrame ou total de registros).
+
+    Args:
+        nome (str): Nome da etapa.
+
+    Returns:
+        callable: Decorador.
+    """
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def medida(*args, **kwargs):
+            if _execucao is None:
+                return funcao(*args, **kwargs)
+            entrada = len(args[0]) if args and isinstance(args[0], pd.DataFrame) else None
+            with medir_etapa(nome, entrada) as registro:
+                resultado = funcao(*args, **kwargs)
+                registro['linhas_saida'] = _quantidade_linhas(resultado)
+            return resultado
+        return medida
+    return decorador
+
+def finalizar_execucao():
+    """
+    Encerra a execução em andamento: grava o total no log e imprime o resumo das etapas.
+
+    Returns:
+        list: Medidas das etapas da execução (vazia se não houver execução em andamento).
+    """
+    global _execucao
+    if _execucao is None:
+        return []
+    # Etapas ainda em andamento em outras threads ficam fora do resumo
+    etapas = [medida for medida in _execucao['etapas'] if 'segundos' in medida]
+    segundos = time.perf_counter() - _execucao['inicio']
+    segundos_cpu = time.process_time() - _execucao['inicio_cpu']
+    pico_mb = max([medida['pico_mb'] for medida in etapas] + [round(memoria_residente() / _BYTES_POR_MB, 1)])
+    _gravar_linha({'etapa': 'total', 'segundos': round(segundos, 4), 'segundos_cpu': round(segundos_cpu, 4),
+                   'pico_mb': pico_mb, 'etapas': len(etapas)})
+
+    if etapas:
+        print("\nMétricas por etapa:")
+        print(f"{'Etapa':<32}{'Segundos':>10}{'CPU':>10}{'Registros':>12}{'Reg./s':>12}{'Pico MB':>10}")
+        for medida in etapas:
+            registros = medida['linhas_entrada'] if medida['linhas_entrada'] is not None else medida['linhas_saida']
+            nome = '  ' * medida['nivel'] + medida['etapa']
+            print(f"{nome:<32}{medida['segundos']:>10.2f}{medida['segundos_cpu']:>10.2f}"
+                  f"{registros if registros is not None else '-':>12}"
+                  f"{medida['linhas_por_segundo'] if medida['linhas_por_segundo'] is not None else '-':>12}"
+                  f"{medida['pico_mb']:>10.1f}")
+        print(f"{'Total':<32}{segundos:>10.2f}{segundos_cpu:>10.2f}{'':>12}{'':>12}{pico_mb:>10.1f}")
+        print(f"Métricas gravadas em: {_execucao['caminho_log']}")
+
+    _execucao = None
+    return etapas
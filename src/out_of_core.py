@@ -0,0 +1,263 @@
+"""
+Módulo de geração das tabelas do relatório sem carregar o snapshot inteiro em memória.
+
+O arquivo Parquet (ou dataset particionado) é percorrido grupo de linhas a
+grupo de linhas. Cada lote é classificado, recebe as horas e é reduzido às
+células (Classificacao, Centro, Ano, Mes) com contagem e soma de horas; os
+agregados parciais são somados ao acumulado. O pico de memória fica
+proporcional a um lote mais o tamanho do agregado.
+"""
+
+import sys
+import time
+import pathlib
+import traceback
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from src.data_access import filtro_periodo, particionamento_hive, tabela_para_pandas
+from src.data_processing import aplicar_regra_por_chave, determinar_classificacao, determinar_hora
+from src.date_normalization import converter_data_hora
+from src.analysis import resolver_coluna_centro, montar_tabelas_por_classificacao
+
+# Quantidade máxima de linhas convertidas para pandas de cada vez
+TAMANHO_LOTE_PADRAO = 100000
+
+CHAVES_AGREGADO = ['Classificacao', 'Centro', 'Ano', 'Mes']
+
+def colunas_necessarias(nomes):
+    """
+    Seleciona as colunas do snapshot usadas pela classificação, pelas horas e pela agregação.
+
+    Args:
+        nomes (list): Colunas disponíveis no dataset.
+
+    Returns:
+        tuple: (colunas a ler, coluna de centro), ou (None, None) se faltar uma coluna obrigatória.
+    """
+    for coluna in ('Secao', 'Familia', 'DataCriacao'):
+        if coluna not in nomes:
+            print(f"ERRO: Coluna '{coluna}' não encontrada no snapshot.")
+            return None, None
+
+    # A coluna de centro é resolvida uma única vez a partir do esquema
+    centro_col = resolver_coluna_centro(pd.DataFrame(columns=nomes))
+    desejadas = ['Secao', 'Familia', 'DataCriacao', 'Classificacao', 'hora', centro_col]
+    colunas = []
+    for coluna in desejadas:
+        if coluna in nomes and coluna not in colunas:
+            colunas.append(coluna)
+    return colunas, centro_col
+
+def agregar_lote(df, centro_col='Centro'):
+    """
+    Classifica um lote, calcula as horas e reduz o resultado às células
+    (Classificacao, Centro, Ano, Mes) com contagem e soma de horas.
+
+    As regras são as mesmas de classificar_vendas e preparar_dados; colunas
+    'Classificacao' e 'hora' já presentes no lote são reaproveitadas.
+
+    Args:
+        df (pandas.DataFrame): Lote com Secao, Familia, DataCriacao e a coluna de centro.
+        centro_col (str): Coluna que representa o centro.
+
+    Returns:
+        pandas.DataFrame: Agregado parcial com as colunas Classificacao, Centro, Ano, Mes,
+            Contagem e Total_Horas.
+    """
+    if 'Classificacao' in df.columns:
+        classificacao = df['Classificacao'].to_numpy(dtype=object)
+    else:
+        classificacao = aplicar_regra_por_chave(df, ['Secao', 'Familia'], determinar_classificacao)
+
+    if 'hora' in df.columns:
+        horas = df['hora'].to_numpy(dtype=np.float64)
+    else:
+        df = df.assign(Classificacao=classificacao)
+        horas = aplicar_regra_por_chave(df, ['Classificacao', 'Secao', 'Familia', 'Centro'], determinar_hora,
+                                        dtype=np.float64)
+
+    datas = converter_data_hora(df['DataCriacao'])
+    celulas = pd.DataFrame({
+        'Classificacao': classificacao,
+        'Centro': df[centro_col].to_numpy(dtype=object),
+        'Ano': datas.dt.year.to_numpy(),
+        'Mes': datas.dt.month.to_numpy(),
+        'hora': horas,
+    })
+
+    # Registros sem data ficam fora das tabelas, como no groupby do processamento completo
+    celulas = celulas[datas.notna().to_numpy()]
+    celulas['Ano'] = celulas['Ano'].astype('int32')
+    celulas['Mes'] = celulas['Mes'].astype('int32')
+
+    return celulas.groupby(CHAVES_AGREGADO, sort=False).agg(
+        Contagem=('hora', 'size'),
+        Total_Horas=('hora', 'sum')
+    ).reset_index()
+
+def combinar_agregados(parciais):
+    """
+    Soma agregados parciais de contagem e horas célula a célula.
+
+    Args:
+        parciais (list): Agregados com as colunas Classificacao, Centro, Ano, Mes, Contagem e Total_Horas.
+
+    Returns:
+        pandas.DataFrame: Agregado combinado, ordenado pelas chaves.
+    """
+    parciais = [parcial for parcial in parciais if parcial is not None and not parcial.empty]
+    if not parciais:
+        return pd.DataFrame(columns=CHAVES_AGREGADO + ['Contagem', 'Total_Horas'])
+    return pd.concat(parciais, ignore_index=True).groupby(CHAVES_AGREGADO, sort=True).agg(
+        Contagem=('Contagem', 'sum'),
+        Total_Horas=('Total_Horas', 'sum')
+    ).reset_index()
+
+def abrir_dataset(caminho_arquivo, data_inicio=None, data_fim=None, centros=None):
+    """
+    Abre um arquivo Parquet ou dataset particionado e monta o filtro de período e centros.
+
+    Args:
+        caminho_arquivo (pathlib.Path ou str): Arquivo Parquet ou diretório do dataset.
+        data_inicio (str ou date, opcional): Data de criação inicial (inclusiva).
+        data_fim (str ou date, opcional): Data de criação final (inclusiva).
+        centros (list, opcional): Centros a considerar.
+
+    Returns:
+        tuple: (pyarrow.dataset.Dataset, expressão de filtro ou None).
+    """
+    caminho = pathlib.Path(caminho_arquivo)
+    dataset = ds.dataset(caminho, format='parquet', partitioning=particionamento_hive(caminho))
+
+    filtro = filtro_periodo(dataset.schema, data_inicio, data_fim)
+    if centros:
+        condicao = ds.field('Centro').isin(list(centros))
+        filtro = condicao if filtro is None else filtro & condicao
+    return dataset, filtro
+
+def grupos_de_linhas(dataset, filtro=None):
+    """
+    Lista os grupos de linhas do dataset que podem conter registros do filtro.
+
+    Args:
+        dataset (pyarrow.dataset.Dataset): Dataset aberto por abrir_dataset.
+        filtro (pyarrow.dataset.Expression, opcional): Filtro de partições e estatísticas.
+
+    Returns:
+        list: Fragmentos com um grupo de linhas cada.
+    """
+    return [
+        grupo
+        for fragmento in dataset.get_fragments(filter=filtro)
+        for grupo in fragmento.split_by_row_group(filter=filtro, schema=dataset.schema)
+    ]
+
+def lotes_dos_grupos(grupos, esquema, colunas, filtro=None, tamanho_lote=TAMANHO_LOTE_PADRAO):
+    """
+    Lê grupos de linhas em lotes de pandas com o esquema compacto de vendas.
+
+    Grupos de linhas pequenos (ex.: partições de um dataset) são acumulados
+    até tamanho_lote registros antes da conversão, e grupos maiores são
+    entregues em várias partes.
+
+    Args:
+        grupos (iterable): Fragmentos com os grupos de linhas a ler.
+        esquema (pyarrow.Schema): Esquema do dataset (inclui as colunas de partição).
+        colunas (list): Colunas a ler.
+        filtro (pyarrow.dataset.Expression, opcional): Filtro aplicado linha a linha.
+        tamanho_lote (int): Quantidade máxima de linhas por lote.
+
+    Yields:
+        pandas.DataFrame: Lote com registros.
+    """
+    pendentes = []
+    linhas = 0
+    for grupo in grupos:
+        for lote in grupo.to_batches(schema=esquema, columns=colunas, filter=filtro, batch_size=tamanho_lote):
+            if not lote.num_rows:
+                continue
+            pendentes.append(lote)
+            linhas += lote.num_rows
+            if linhas >= tamanho_lote:
+                yield tabela_para_pandas(pa.Table.from_batches(pendentes))
+                pendentes = []
+                linhas = 0
+    if pendentes:
+        yield tabela_para_pandas(pa.Table.from_batches(pendentes))
+
+def iterar_lotes(caminho_arquivo, colunas, data_inicio=None, data_fim=None, centros=None,
+                 tamanho_lote=TAMANHO_LOTE_PADRAO):
+    """
+    Percorre um arquivo Parquet ou dataset particionado grupo de linhas a grupo de linhas.
+
+    Partições e grupos de linhas fora dos filtros são descartados pelas
+    estatísticas; grupos de linhas maiores que tamanho_lote são entregues em
+    várias partes.
+
+    Args:
+        caminho_arquivo (pathlib.Path ou str): Arquivo Parquet ou diretório do dataset.
+        colunas (list): Colunas a ler.
+        data_inicio (str ou date, opcional): Data de criação inicial (inclusiva).
+        data_fim (str ou date, opcional): Data de criação final (inclusiva).
+        centros (list, opcional): Centros a considerar.
+        tamanho_lote (int): Quantidade máxima de linhas por lote.
+
+    Yields:
+        pandas.DataFrame: Lote com o esquema compacto de vendas aplicado.
+    """
+    dataset, filtro = abrir_dataset(caminho_arquivo, data_inicio, data_fim, centros)
+    yield from lotes_dos_grupos(grupos_de_linhas(dataset, filtro), dataset.schema, colunas, filtro, tamanho_lote)
+
+def criar_tabelas_por_lotes(caminho_arquivo, data_inicio=None, data_fim=None, centros=None,
+                            tamanho_lote=TAMANHO_LOTE_PADRAO):
+    """
+    Cria as tabelas por classificação de salvar_excel_simplificado lendo o
+    snapshot em lotes, sem carregá-lo inteiro em memória.
+
+    Args:
+        caminho_arquivo (pathlib.Path ou str): Arquivo Parquet ou diretório do dataset.
+        data_inicio (str ou date, opcional): Data de criação inicial (inclusiva).
+        data_fim (str ou date, opcional): Data de criação final (inclusiva).
+        centros (list, opcional): Centros a considerar.
+        tamanho_lote (int): Quantidade máxima de linhas por lote.
+
+    Returns:
+        dict: Dicionário com DataFrames para cada classificação, ou None em caso de erro.
+    """
+    try:
+        caminho = pathlib.Path(caminho_arquivo)
+        if not caminho.exists():
+            print(f"ERRO: Arquivo não encontrado: {caminho}")
+            return None
+
+        print(f"Processando o snapshot em lotes de até {tamanho_lote} registros: {caminho}")
+        nomes = ds.dataset(caminho, format='parquet', partitioning=particionamento_hive(caminho)).schema.names
+        colunas, centro_col = colunas_necessarias(nomes)
+        if colunas is None:
+            return None
+
+        inicio = time.perf_counter()
+        acumulado = None
+        total_lotes = 0
+        total_registros = 0
+        for lote in iterar_lotes(caminho, colunas, data_inicio, data_fim, centros, tamanho_lote):
+            # O acumulado é reduzido a cada lote para manter apenas uma linha por célula
+            acumulado = combinar_agregados([acumulado, agregar_lote(lote, centro_col)])
+            total_lotes += 1
+            total_registros += len(lote)
+
+        segundos = time.perf_counter() - inicio
+        print(f"{total_registros} registros processados em {total_lotes} lotes em {segundos:.1f}s.")
+        if acumulado is None or acumulado.empty:
+            print("AVISO: Nenhum registro encontrado para os filtros informados.")
+            return {}
+
+        print(f"Agregação por classificação, centro e mês concluída: {len(acumulado)} células.")
+        return montar_tabelas_por_classificacao(acumulado)
+    except Exception as e:
+        print(f"Erro no processamento em lotes: {e}")
+        traceback.print_exc(file=sys.stdout)
+        return None
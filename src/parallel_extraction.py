@@ -0,0 +1,242 @@
+"""
+Módulo para extração paralela dos dados de vendas.
+
+A query é dividida em intervalos mensais de cdv.Data (shards): o template de
+vendas é renderizado com data_inicio e data_fim de cada mês. Cada shard é
+executado em uma thread com a sua própria conexão e gravado em um arquivo
+Parquet independente; ao final os arquivos são combinados em um único
+snapshot no diretório de saída.
+"""
+
+import sys
+import time
+import shutil
+import pathlib
+import traceback
+from datetime import date, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.data_access import (
+    PoolConexoes,
+    obter_pool,
+    ler_arquivo_query,
+    executar_query_para_parquet,
+    carregar_do_parquet,
+    caminho_saida_parquet,
+)
+from src import query_templates
+from src.metrics import progresso
+from src.snapshot_manifest import registrar_snapshot
+
+# Quantidade padrão de conexões simultâneas com o banco
+MAX_CONEXOES_PADRAO = 4
+
+def gerar_intervalos_mensais(data_inicio, data_fim=None):
+    """
+    Divide um período em intervalos mensais.
+
+    Args:
+        data_inicio (str ou date): Data inicial (inclusiva).
+        data_fim (str ou date, opcional): Data final (inclusiva). Padrão: hoje.
+
+    Returns:
+        list: Tuplas (inicio, fim) de datas, com fim exclusivo.
+    """
+    inicio = pd.Timestamp(data_inicio).date()
+    fim_exclusivo = (pd.Timestamp(data_fim).date() if data_fim is not None else date.today()) + timedelta(days=1)
+
+    intervalos = []
+    atual = inicio
+    while atual < fim_exclusivo:
+        proximo_mes = date(atual.year + (atual.month == 12), atual.month % 12 + 1, 1)
+        intervalos.append((atual, min(proximo_mes, fim_exclusivo)))
+        atual = proximo_mes
+    return intervalos
+
+def _consultas_shards(pool, caminho_query, intervalos):
+    """
+    Renderiza o template de vendas para o período completo e para cada shard.
+
+    Args:
+        pool (PoolConexoes): Pool de onde a conexão usada nos filtros é obtida.
+        caminho_query (pathlib.Path ou str, opcional): Template da query de vendas.
+        intervalos (list): Tuplas (inicio, fim) dos shards, com fim exclusivo.
+
+    Returns:
+        tuple: ((query, parametros) do período completo, lista de (query, parametros)
+            por shard), ou None em caso de erro.
+    """
+    if caminho_query is None:
+        caminho_query = pathlib.Path().resolve() / "querys" / "templates" / "gv_vendas.sql"
+    texto = ler_arquivo_query(caminho_query)
+    if texto is None:
+        return None
+    if not query_templates.eh_template(texto):
+        print("ERRO: A extração paralela requer um template com os parâmetros data_inicio e data_fim.")
+        return None
+
+    try:
+        with pool.conexao() as conn:
+            if conn is None:
+                return None
+            # Seções e famílias são resolvidas uma vez; os shards mudam apenas as datas (fim exclusivo)
+            valores = query_templates.valores_template_vendas(
+                conn, nomes=query_templates.declaracoes_parametros(texto))
+        completa = query_templates.renderizar_template(
+            texto, {**valores, 'data_inicio': intervalos[0][0], 'data_fim': intervalos[-1][1]})
+        shards = [query_templates.renderizar_template(texto, {**valores, 'data_inicio': inicio, 'data_fim': fim})
+                  for inicio, fim in intervalos]
+        return completa, shards
+    except Exception as e:
+        print(f"Erro ao montar as queries dos shards a partir de {caminho_query}: {e}")
+        traceback.print_exc(file=sys.stdout)
+        return None
+
+def _extrair_shard(pool, query, parametros, intervalo, caminho_shard):
+    """
+    Executa a query de um intervalo em uma conexão própria e grava o resultado em Parquet.
+
+    Args:
+        pool (PoolConexoes): Pool de onde a conexão do shard é obtida.
+        query (str): Query renderizada do shard.
+        parametros (tuple): Parâmetros da query do shard.
+        intervalo (tuple): Datas (inicio, fim) do shard.
+        caminho_shard (pathlib.Path): Arquivo Parquet do shard.
+
+    Returns:
+        dict: Estatísticas do shard (registros, segundos, registros por segundo).
+    """
+    inicio = time.perf_counter()
+    with pool.conexao() as conn:
+        if conn is None:
+            raise RuntimeError(f"Não foi possível conectar para o shard {intervalo[0]}")
+        total = executar_query_para_parquet(conn, query, caminho_shard, parametros=parametros)
+        if total is None:
+            raise RuntimeError(f"Falha na execução do shard {intervalo[0]}")
+
+    segundos = time.perf_counter() - inicio
+    return {
+        'shard': intervalo[0].strftime('%Y-%m'),
+        'registros': total,
+        'segundos': segundos,
+        'registros_por_segundo': total / segundos if segundos > 0 else 0.0,
+        'caminho': caminho_shard,
+    }
+
+def combinar_shards(caminhos_shards, caminho_saida):
+    """
+    Combina os arquivos Parquet dos shards em um único arquivo, lote a lote.
+
+    Args:
+        caminhos_shards (list): Arquivos dos shards, na ordem desejada.
+        caminho_saida (pathlib.Path): Arquivo Parquet combinado.
+
+    Returns:
+        int: Total de registros combinados.
+    """
+    arquivos = [pq.ParquetFile(caminho) for caminho in caminhos_shards]
+    # O esquema de referência é o do primeiro shard com registros
+    esquema = next((arquivo.schema_arrow for arquivo in arquivos if arquivo.metadata.num_rows > 0),
+                   arquivos[0].schema_arrow)
+
+    total = 0
+    with pq.ParquetWriter(caminho_saida, esquema, compression='snappy') as writer:
+        for arquivo in arquivos:
+            for lote in arquivo.iter_batches():
+                writer.write_table(pa.Table.from_batches([lote]).cast(esquema))
+                total += lote.num_rows
+    return total
+
+def buscar_dados_vendas_paralelo(data_inicio='2023-01-01', data_fim=None, max_conexoes=MAX_CONEXOES_PADRAO,
+                                 caminho_query=None, fabrica_conexao=None, salvar_parquet=True):
+    """
+    Busca os dados de vendas em paralelo, com um shard por mês de cdv.Data.
+
+    Args:
+        data_inicio (str ou date): Data inicial do documento (inclusiva).
+        data_fim (str ou date, opcional): Data final do documento (inclusiva). Padrão: hoje.
+        max_conexoes (int): Quantidade máxima de conexões (shards) simultâneas.
+        caminho_query (pathlib.Path ou str, opcional): Template da query de vendas
+            (padrão: querys/templates/gv_vendas.sql).
+        fabrica_conexao (callable, opcional): Função que cria uma conexão. Permite usar
+            um banco local de testes; sem ela é usado o pool compartilhado de data_access.
+        salvar_parquet (bool): Se False, o arquivo combinado é removido após o carregamento.
+
+    Returns:
+        pandas.DataFrame ou tuple: DataFrame com os dados ou tupla (DataFrame, caminho_parquet).
+    """
+    intervalos = gerar_intervalos_mensais(data_inicio, data_fim)
+    if not intervalos:
+        print("ERRO: A data inicial é posterior à data final.")
+        return None
+
+    if fabrica_conexao is None:
+        pool = obter_pool()
+        if max_conexoes > pool.max_conexoes:
+            print(f"AVISO: O pool de conexões permite no máximo {pool.max_conexoes} conexões simultâneas.")
+            max_conexoes = pool.max_conexoes
+    else:
+        pool = PoolConexoes(fabrica_conexao, max_conexoes=max_conexoes)
+
+    consultas = _consultas_shards(pool, caminho_query, intervalos)
+    if consultas is None:
+        if fabrica_conexao is not None:
+            pool.fechar()
+        return None
+    (query, parametros), consultas_shards = consultas
+
+    caminho_parquet = caminho_saida_parquet()
+    diretorio_shards = caminho_parquet.with_name(f"{caminho_parquet.stem}_shards")
+    diretorio_shards.mkdir(parents=True, exist_ok=True)
+    print(f"Extração paralela: {len(intervalos)} shards mensais, até {max_conexoes} conexões simultâneas")
+
+    inicio = time.perf_counter()
+    estatisticas = []
+    try:
+        with ThreadPoolExecutor(max_workers=max_conexoes) as executor:
+            futuros = {
+                executor.submit(_extrair_shard, pool, query_shard, parametros_shard, intervalo,
+                                diretorio_shards / f"shard_{intervalo[0].strftime('%Y%m')}.parquet"): intervalo
+                for intervalo, (query_shard, parametros_shard) in zip(intervalos, consultas_shards)
+            }
+            for futuro in as_completed(futuros):
+                resultado = futuro.result()
+                estatisticas.append(resultado)
+                progresso(f"Shard {resultado['shard']}: {resultado['registros']} registros em "
+                      f"{resultado['segundos']:.1f}s ({resultado['registros_por_segundo']:.0f} registros/s)")
+
+        estatisticas.sort(key=lambda item: item['shard'])
+        total = combinar_shards([item['caminho'] for item in estatisticas], caminho_parquet)
+        segundos = time.perf_counter() - inicio
+        print(f"Total de registros: {total} em {segundos:.1f}s "
+              f"({total / segundos if segundos > 0 else 0:.0f} registros/s)")
+    except Exception as e:
+        print(f"Erro na extração paralela: {e}")
+        traceback.print_exc(file=sys.stdout)
+        if caminho_parquet.exists():
+            caminho_parquet.unlink()
+        return None
+    finally:
+        shutil.rmtree(diretorio_shards, ignore_errors=True)
+        if fabrica_conexao is not None:
+            pool.fechar()
+
+    if total == 0:
+        print("Não foram encontrados dados de vendas.")
+        caminho_parquet.unlink()
+        return pd.DataFrame()
+
+    if salvar_parquet:
+        registrar_snapshot(caminho_parquet, query, parametros, forma_extracao='paralela')
+    df_vendas = carregar_do_parquet(caminho_parquet)
+    if not salvar_parquet:
+        caminho_parquet.unlink()
+        return df_vendas
+    if df_vendas is None:
+        return None
+
+    print(f"Para futuras análises, utilize o arquivo: {caminho_parquet}")
+    return df_vendas, caminho_parquet
@@ -0,0 +1,151 @@
+"""
+Módulo de processamento paralelo da classificação, das horas e da agregação.
+
+Os grupos de linhas do snapshot são distribuídos entre processos. Cada
+processo recebe apenas a referência dos seus grupos de linhas (arquivo,
+índices e expressão de partição), lê os dados diretamente do Parquet e
+devolve o agregado parcial por (Classificacao, Centro, Ano, Mes), de modo
+que nenhum dado linha a linha é serializado entre os processos. Entradas
+pequenas são processadas em série, sem o custo de iniciar os processos.
+"""
+
+import os
+import sys
+import time
+import pathlib
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from src.analysis import montar_tabelas_por_classificacao
+from src.out_of_core import (
+    TAMANHO_LOTE_PADRAO,
+    abrir_dataset,
+    agregar_lote,
+    colunas_necessarias,
+    combinar_agregados,
+    criar_tabelas_por_lotes,
+    grupos_de_linhas,
+    lotes_dos_grupos,
+)
+
+# Abaixo desta quantidade de registros o processamento é feito em série
+LIMIAR_PARALELO = 1000000
+
+# Tarefas por processo, para equilibrar a carga quando os grupos de linhas têm tamanhos diferentes
+TAREFAS_POR_PROCESSO = 4
+
+def _dividir_em_tarefas(grupos, quantidade_tarefas):
+    """
+    Agrupa grupos de linhas consecutivos em tarefas com quantidades de registros semelhantes.
+
+    Args:
+        grupos (list): Fragmentos com um grupo de linhas cada.
+        quantidade_tarefas (int): Quantidade desejada de tarefas.
+
+    Returns:
+        list: Listas de fragmentos, uma por tarefa.
+    """
+    total = sum(grupo.row_groups[0].num_rows for grupo in grupos)
+    alvo = max(1, total // max(1, quantidade_tarefas))
+
+    tarefas = [[]]
+    linhas = 0
+    for grupo in grupos:
+        if tarefas[-1] and linhas >= alvo:
+            tarefas.append([])
+            linhas = 0
+        tarefas[-1].append(grupo)
+        linhas += grupo.row_groups[0].num_rows
+    return tarefas
+
+def _processar_tarefa(grupos, esquema, colunas, centro_col, filtro, tamanho_lote):
+    """
+    Executado em um processo separado: lê os grupos de linhas da tarefa e devolve o agregado parcial.
+
+    Args:
+        grupos (list): Fragmentos com os grupos de linhas da tarefa.
+        esquema (pyarrow.Schema): Esquema do dataset.
+        colunas (list): Colunas a ler.
+        centro_col (str): Coluna que representa o centro.
+        filtro (pyarrow.dataset.Expression): Filtro aplicado linha a linha, ou None.
+        tamanho_lote (int): Quantidade máxima de linhas por lote.
+
+    Returns:
+        tuple: (agregado parcial, quantidade de registros processados).
+    """
+    acumulado = None
+    registros = 0
+    for lote in lotes_dos_grupos(grupos, esquema, colunas, filtro, tamanho_lote):
+        acumulado = combinar_agregados([acumulado, agregar_lote(lote, centro_col)])
+        registros += len(lote)
+    return acumulado, registros
+
+def criar_tabelas_em_paralelo(caminho_arquivo, data_inicio=None, data_fim=None, centros=None,
+                              max_processos=None, limiar_paralelo=LIMIAR_PARALELO,
+                              tamanho_lote=TAMANHO_LOTE_PADRAO):
+    """
+    Cria as tabelas por classificação processando os grupos de linhas do snapshot em vários processos.
+
+    Args:
+        caminho_arquivo (pathlib.Path ou str): Arquivo Parquet ou diretório do dataset.
+        data_inicio (str ou date, opcional): Data de criação inicial (inclusiva).
+        data_fim (str ou date, opcional): Data de criação final (inclusiva).
+        centros (list, opcional): Centros a considerar.
+        max_processos (int, opcional): Quantidade máxima de processos. Padrão: núcleos disponíveis.
+        limiar_paralelo (int): Quantidade mínima de registros para usar vários processos.
+        tamanho_lote (int): Quantidade máxima de linhas por lote dentro de cada processo.
+
+    Returns:
+        dict: Dicionário com DataFrames para cada classificação, ou None em caso de erro.
+    """
+    try:
+        caminho = pathlib.Path(caminho_arquivo)
+        if not caminho.exists():
+            print(f"ERRO: Arquivo não encontrado: {caminho}")
+            return None
+
+        dataset, filtro = abrir_dataset(caminho, data_inicio, data_fim, centros)
+        grupos = grupos_de_linhas(dataset, filtro)
+        total = sum(grupo.row_groups[0].num_rows for grupo in grupos)
+        max_processos = max_processos or os.cpu_count() or 1
+        max_processos = min(max_processos, len(grupos))
+
+        if max_processos <= 1 or total < limiar_paralelo:
+            print(f"Entrada com {total} registros em {len(grupos)} grupos de linhas: processamento em série.")
+            return criar_tabelas_por_lotes(caminho, data_inicio, data_fim, centros, tamanho_lote)
+
+        colunas, centro_col = colunas_necessarias(dataset.schema.names)
+        if colunas is None:
+            return None
+
+        tarefas = _dividir_em_tarefas(grupos, max_processos * TAREFAS_POR_PROCESSO)
+        print(f"Processamento paralelo: {total} registros em {len(grupos)} grupos de linhas, "
+              f"{len(tarefas)} tarefas, {max_processos} processos")
+
+        inicio = time.perf_counter()
+        parciais = []
+        registros = 0
+        with ProcessPoolExecutor(max_workers=max_processos) as executor:
+            futuros = [
+                executor.submit(_processar_tarefa, tarefa, dataset.schema, colunas, centro_col, filtro, tamanho_lote)
+                for tarefa in tarefas
+            ]
+            for futuro in as_completed(futuros):
+                parcial, quantidade = futuro.result()
+                parciais.append(parcial)
+                registros += quantidade
+
+        agregado = combinar_agregados(parciais)
+        segundos = time.perf_counter() - inicio
+        print(f"{registros} registros processados em {segundos:.1f}s "
+              f"({registros / segundos if segundos > 0 else 0:.0f} registros/s).")
+        if agregado.empty:
+            print("AVISO: Nenhum registro encontrado para os filtros informados.")
+            return {}
+
+        print(f"Agregação por classificação, centro e mês concluída: {len(agregado)} células.")
+        return montar_tabelas_por_classificacao(agregado)
+    except Exception as e:
+        print(f"Erro no processamento paralelo: {e}")
+        traceback.print_exc(file=sys.stdout)
+        return None
@@ -0,0 +1,381 @@
+"""
+Módulo de perfil de execução por etapa.
+
+Complementa as métricas de src.metrics com o perfil das funções executadas em
+cada etapa (conexão, busca dos registros, classificação, pivot, gravação do
+Excel etc.), em um de dois modos:
+
+    deterministico  cProfile ativado apenas durante cada etapa (tempo exato por
+                    função, com custo adicional em código com muitas chamadas)
+    amostragem      a pilha das threads com etapas em andamento é lida a cada
+                    intervalo (custo baixo e constante, inclui esperas de E/S)
+
+Ao final são gravados um resumo dos pontos quentes de cada etapa e um arquivo
+de pilhas "dobradas" (uma linha "etapa;...;função quantidade" por pilha),
+aceito por flamegraph.pl, speedscope e inferno, com os valores em
+microssegundos. O modo determinístico grava também um arquivo .prof (pstats)
+por etapa.
+
+Etapas executadas em outros processos (ex.: src.parallel_processing) não
+entram no perfil do processo principal.
+"""
+
+import sys
+import time
+import pstats
+import pathlib
+import cProfile
+import threading
+from collections import Counter, defaultdict
+from datetime import datetime
+
+from src.metrics import registrar_observador, remover_observador, etapas_em_andamento
+
+MODOS_PERFIL = ('deterministico', 'amostragem')
+
+# Intervalo padrão entre amostras no modo amostragem
+INTERVALO_AMOSTRAGEM_PADRAO = 0.005
+
+# Funções listadas por etapa no resumo dos pontos quentes
+QUANTIDADE_PONTOS_QUENTES = 10
+
+# Etapa atribuída ao tempo da thread principal fora de qualquer etapa medida
+FORA_DE_ETAPA = '(fora de etapa)'
+
+# No modo determinístico, ramos da árvore de chamadas abaixo desta fração do
+# tempo da etapa não são detalhados no arquivo de pilhas
+FRACAO_MINIMA_RAMO = 0.0005
+
+def _rotulo_funcao(arquivo, linha, funcao):
+    """
+    Monta o rótulo de uma função nas pilhas (sem ';', separador do formato dobrado).
+
+    Args:
+        arquivo (str): Arquivo do código ('~' para funções nativas).
+        linha (int): Linha da definição.
+        funcao (str): Nome da função.
+
+    Returns:
+        str: Rótulo 'funcao (pasta/arquivo.py:linha)'.
+    """
+    if arquivo == '~' or not arquivo:
+        rotulo = funcao
+    else:
+        partes = pathlib.PurePath(arquivo).parts[-2:]
+        rotulo = f"{funcao} ({'/'.join(partes)}:{linha})"
+    return rotulo.replace(';', ',')
+
+class PerfilAmostragem:
+    """
+    Perfil por amostragem: uma thread lê a pilha das threads com etapas em
+    andamento (e da thread principal) a cada intervalo. Cada amostra vale o
+    tempo decorrido desde a anterior, pois a leitura atrasa enquanto outra
+    thread mantém o GIL.
+    """
+
+    def __init__(self, intervalo=INTERVALO_AMOSTRAGEM_PADRAO):
+        self.intervalo = intervalo
+        self.pilhas = Counter()
+        self._parar = threading.Event()
+        self._thread = None
+        self._thread_principal = threading.main_thread().ident
+
+    def iniciar(self):
+        """Inicia a thread de amostragem."""
+        self._thread = threading.Thread(target=self._amostrar, name='perfil_amostragem', daemon=True)
+        self._thread.start()
+
+    def parar(self):
+        """Encerra a thread de amostragem."""
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def inicio_etapa(self, etapas):
+        """As etapas em andamento são lidas em src.metrics a cada amostra."""
+
+    def fim_etapa(self, etapas):
+        """As etapas em andamento são lidas em src.metrics a cada amostra."""
+
+    def _amostrar(self):
+        propria = threading.get_ident()
+        anterior = time.perf_counter()
+        while not self._parar.wait(self.intervalo):
+            agora = time.perf_counter()
+            microssegundos = round((agora - anterior) * 1e6)
+            anterior = agora
+            etapas_por_thread = etapas_em_andamento()
+            for thread, quadro in sys._current_frames().items():
+                if thread == propria:
+                    continue
+                etapas = etapas_por_thread.get(thread)
+                if etapas is None:
+                    # Threads auxiliares ociosas não entram no perfil
+                    if thread != self._thread_principal:
+                        continue
+                    etapas = (FORA_DE_ETAPA,)
+                funcoes = []
+                while quadro is not None:
+                    codigo = quadro.f_code
+                    funcoes.append(_rotulo_funcao(codigo.co_filename, codigo.co_firstlineno, codigo.co_name))
+                    quadro = quadro.f_back
+                self.pilhas[(etapas, tuple(reversed(funcoes)))] += microssegundos
+
+    def resultado(self):
+        """
+        Retorna as pilhas coletadas.
+
+        Returns:
+            tuple: (Counter de (etapas, funções) -> microssegundos, segundos por unidade).
+        """
+        return self.pilhas, 1e-6
+
+class PerfilDeterministico:
+    """
+    Perfil determinístico: um cProfile por etapa e thread, ativado somente
+    enquanto a etapa (sem as etapas internas) está em andamento.
+    """
+
+    def __init__(self):
+        self.perfis = {}
+        self._local = threading.local()
+        self._avisado = False
+
+    def _ativar(self, etapas):
+        """Ativa o perfil das etapas na thread atual (None se outro perfilador estiver ativo)."""
+        chave = (etapas, threading.get_ident())
+        perfil = self.perfis.get(chave)
+        if perfil is None:
+            perfil = self.perfis[chave] = cProfile.Profile()
+        try:
+            perfil.enable()
+        except ValueError as e:
+            # Python 3.12+: apenas um perfilador ativo por processo (ex.: etapas em threads simultâneas)
+            if not self._avisado:
+                print(f"AVISO: Perfil determinístico indisponível para a etapa '{etapas[-1]}': {e}")
+                self._avisado = True
+            return None
+        return perfil
+
+    def _pilha(self):
+        if not hasattr(self._local, 'ativos'):
+            self._local.ativos = []
+        return self._local.ativos
+
+    def iniciar(self):
+        """Ativa o perfil do tempo fora de etapas na thread atual."""
+        self._pilha().append(self._ativar((FORA_DE_ETAPA,)))
+
+    def parar(self):
+        """Desativa os perfis ainda ativos na thread atual."""
+        for perfil in self._pilha():
+            if perfil is not None:
+                perfil.disable()
+        self._local.ativos = []
+
+    def inicio_etapa(self, etapas):
+        """Suspende o perfil da etapa externa e ativa o da etapa iniciada."""
+        ativos = self._pilha()
+        if ativos and ativos[-1] is not None:
+            ativos[-1].disable()
+        ativos.append(self._ativar(etapas))
+
+    def fim_etapa(self, etapas):
+        """Desativa o perfil da etapa encerrada e reativa o da etapa externa."""
+        ativos = self._pilha()
+        if ativos:
+            perfil = ativos.pop()
+            if perfil is not None:
+                perfil.disable()
+        if ativos and ativos[-1] is not None:
+            ativos[-1].enable()
+
+    def estatisticas(self):
+        """
+        Retorna as estatísticas de cada etapa, somando as threads.
+
+        Returns:
+            dict: Tupla de etapas -> pstats.Stats.
+        """
+        por_etapa = {}
+        for (etapas, _), perfil in self.perfis.items():
+            try:
+                estatisticas = pstats.Stats(perfil)
+            except TypeError:
+                # Perfil sem nenhuma chamada registrada
+                continue
+            if etapas in por_etapa:
+                por_etapa[etapas].add(estatisticas)
+            else:
+                por_etapa[etapas] = estatisticas
+        return por_etapa
+
+    def resultado(self):
+        """
+        Converte as árvores de chamadas em pilhas, distribuindo o tempo de cada
+        função entre os chamadores na proporção do tempo acumulado em cada um.
+
+        Returns:
+            tuple: (Counter de (etapas, funções) -> microssegundos, segundos por unidade).
+        """
+        pilhas = Counter()
+        for etapas, estatisticas in self.estatisticas().items():
+            dados = estatisticas.stats
+            chamados = defaultdict(dict)
+            for funcao, (_, _, _, _, chamadores) in dados.items():
+                for chamador, valores in chamadores.items():
+                    if chamador in dados:
+                        chamados[chamador][funcao] = valores[3]
+            raizes = [funcao for funcao, valores in dados.items()
+                      if not any(chamador in dados for chamador in valores[4])]
+            minimo = FRACAO_MINIMA_RAMO * sum(valores[2] for valores in dados.values())
+
+            def percorrer(funcao, caminho, fator):
+                tempo_proprio, tempo_acumulado = dados[funcao][2], dados[funcao][3]
+                caminho = caminho + (_rotulo_funcao(*funcao),)
+                microssegundos = round(tempo_proprio * fator * 1e6)
+                if microssegundos > 0:
+                    pilhas[(etapas, caminho)] += microssegundos
+                for chamado, tempo_chamada in chamados[funcao].items():
+                    tempo_chamado = dados[chamado][3]
+                    if tempo_chamado <= 0 or _rotulo_funcao(*chamado) in caminho:
+                        continue
+                    fator_chamado = fator * min(tempo_chamada / tempo_chamado, 1.0)
+                    if fator_chamado * tempo_chamado >= minimo:
+                        percorrer(chamado, caminho, fator_chamado)
+
+            for raiz in raizes:
+                percorrer(raiz, (), 1.0)
+        return pilhas, 1e-6
+
+    def gravar_estatisticas(self, diretorio, prefixo):
+        """
+        Grava um arquivo .prof (pstats) por etapa.
+
+        Args:
+            diretorio (pathlib.Path): Diretório dos arquivos.
+            prefixo (str): Prefixo dos nomes dos arquivos.
+
+        Returns:
+            list: Caminhos gravados.
+        """
+        caminhos = []
+        for etapas, estatisticas in self.estatisticas().items():
+            nome = '__'.join(etapas).replace('(', '').replace(')', '').replace(' ', '_')
+            caminho = diretorio / f"{prefixo}_{nome}.prof"
+            estatisticas.dump_stats(str(caminho))
+            caminhos.append(caminho)
+        return caminhos
+
+def iniciar_perfil(modo, intervalo=INTERVALO_AMOSTRAGEM_PADRAO):
+    """
+    Inicia o perfil das etapas medidas por src.metrics.
+
+    Args:
+        modo (str): Um de MODOS_PERFIL.
+        intervalo (float): Segundos entre amostras no modo amostragem.
+
+    Returns:
+        PerfilAmostragem ou PerfilDeterministico: Perfil em andamento.
+    """
+    if modo not in MODOS_PERFIL:
+        raise ValueError(f"Modo de perfil inválido: {modo}. Use um de {', '.join(MODOS_PERFIL)}.")
+    perfil = PerfilDeterministico() if modo == 'deterministico' else PerfilAmostragem(intervalo)
+    registrar_observador(perfil)
+    perfil.iniciar()
+    return perfil
+
+def pontos_quentes(pilhas, segundos_por_unidade, quantidade=QUANTIDADE_PONTOS_QUENTES):
+    """
+    Resume as funções mais custosas de cada etapa.
+
+    Args:
+        pilhas (Counter): (etapas, funções) -> microssegundos.
+        segundos_por_unidade (float): Conversão das unidades em segundos.
+        quantidade (int): Funções listadas por etapa.
+
+    Returns:
+        list: Um dicionário por etapa (mais custosa primeiro) com 'etapas',
+            'segundos' e 'funcoes' (nome, segundos próprios e acumulados).
+    """
+    totais = Counter()
+    proprio = defaultdict(Counter)
+    acumulado = defaultdict(Counter)
+    for (etapas, funcoes), valor in pilhas.items():
+        totais[etapas] += valor
+        if funcoes:
+            proprio[etapas][funcoes[-1]] += valor
+        for funcao in set(funcoes):
+            acumulado[etapas][funcao] += valor
+
+    resumo = []
+    for etapas, total in totais.most_common():
+        funcoes = [
+            {'funcao': funcao, 'segundos_proprios': valor * segundos_por_unidade,
+             'segundos_acumulados': acumulado[etapas][funcao] * segundos_por_unidade}
+            for funcao, valor in proprio[etapas].most_common(quantidade)
+        ]
+        resumo.append({'etapas': etapas, 'segundos': total * segundos_por_unidade, 'funcoes': funcoes})
+    return resumo
+
+def _formatar_pontos_quentes(resumo, modo):
+    """Formata o resumo dos pontos quentes como texto."""
+    linhas = [f"Pontos quentes por etapa (perfil {modo}; tempo próprio e acumulado de cada função na etapa)"]
+    for item in resumo:
+        total = item['segundos']
+        linhas.append("")
+        linhas.append(f"{' > '.join(item['etapas'])}: {total:.2f}s")
+        for funcao in item['funcoes']:
+            percentual = 100 * funcao['segundos_proprios'] / total if total else 0
+            linhas.append(f"  {funcao['segundos_proprios']:>9.3f}s {percentual:>5.1f}%"
+                          f"  {funcao['segundos_acumulados']:>9.3f}s  {funcao['funcao']}")
+    return "\n".join(linhas)
+
+def encerrar_perfil(perfil, diretorio_saida='output'):
+    """
+    Encerra o perfil, grava o resumo dos pontos quentes e o arquivo de pilhas
+    dobradas em <diretorio_saida>/perfis e imprime o resumo.
+
+    Args:
+        perfil (PerfilAmostragem ou PerfilDeterministico): Perfil retornado por iniciar_perfil.
+        diretorio_saida (pathlib.Path ou str): Diretório de saída da execução.
+
+    Returns:
+        dict: Caminhos gravados ('pilhas', 'resumo' e, no modo determinístico, 'estatisticas'),
+            ou None em caso de erro.
+    """
+    remover_observador(perfil)
+    perfil.parar()
+    modo = 'deterministico' if isinstance(perfil, PerfilDeterministico) else 'amostragem'
+    try:
+        pilhas, segundos_por_unidade = perfil.resultado()
+        if not pilhas:
+            print("AVISO: Nenhuma amostra registrada no perfil de execução.")
+            return None
+
+        diretorio = pathlib.Path(diretorio_saida) / "perfis"
+        diretorio.mkdir(parents=True, exist_ok=True)
+        prefixo = f"perfil_{modo}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+
+        caminho_pilhas = diretorio / f"{prefixo}.folded"
+        with open(caminho_pilhas, 'w', encoding='utf-8') as arquivo:
+            for (etapas, funcoes), valor in sorted(pilhas.items()):
+                arquivo.write(f"{';'.join(etapas + funcoes)} {valor}\n")
+
+        texto = _formatar_pontos_quentes(pontos_quentes(pilhas, segundos_por_unidade), modo)
+        caminho_resumo = diretorio / f"{prefixo}_pontos_quentes.txt"
+        caminho_resumo.write_text(texto + "\n", encoding='utf-8')
+
+        caminhos = {'pilhas': caminho_pilhas, 'resumo': caminho_resumo}
+        if isinstance(perfil, PerfilDeterministico):
+            caminhos['estatisticas'] = perfil.gravar_estatisticas(diretorio, prefixo)
+
+        print("\n" + texto)
+        print(f"\nPilhas para flame graph gravadas em: {caminho_pilhas}")
+        print(f"Resumo dos pontos quentes gravado em: {caminho_resumo}")
+        return caminhos
+    except Exception as e:
+        print(f"ERRO ao gravar o perfil de execução: {e}")
+        import traceback
+        traceback.print_exc(file=sys.stdout)
+        return None
@@ -0,0 +1,261 @@
+"""
+Módulo de agregação no servidor (push-down) para o relatório padrão.
+
+O relatório precisa apenas da contagem e da soma de horas por
+(Classificacao, Centro, Ano, Mes). Em vez de transferir todas as linhas de
+venda, o template de vendas renderizado para o período é envolvido em um
+GROUP BY com as regras de classificação e de horas de data_processing
+traduzidas para expressões CASE,
+e o SQL Server devolve somente as células agregadas.
+
+As regras SQL reproduzem as comparações do Python: os textos são comparados
+sem espaços nas extremidades, com diferenciação de maiúsculas/minúsculas
+(collation binária), e valores nulos equivalem a texto vazio. A função
+verificar_paridade compara o resultado com o pipeline local no mesmo período.
+"""
+
+import sys
+import traceback
+import pandas as pd
+
+from src.data_access import obter_pool, montar_query_vendas, executar_query
+from src.data_processing import classificar_vendas, preparar_dados
+from src.date_normalization import normalizar_datas
+from src.analysis import agregar_por_classificacao
+
+# Collation binária: comparações exatas como as do Python
+COLLATION_EXATA = 'Latin1_General_BIN2'
+
+# Tolerância na comparação das somas de horas (ponto flutuante)
+TOLERANCIA_HORAS = 1e-6
+
+CHAVES_CELULA = ['Classificacao', 'Centro', 'Ano', 'Mes']
+
+# Espelho de data_processing.determinar_classificacao
+CASE_CLASSIFICACAO = """
+        CASE
+            WHEN n.Secao = 'Cardiologia' AND n.Familia NOT IN ('Retorno', 'Consultas', 'Consulta') THEN 'Cardiologia'
+            WHEN n.Secao = 'Imagem' THEN 'Imagem'
+            WHEN n.Familia = 'Cirurgia' THEN 'Bloco Cirurgico'
+            WHEN n.Familia IN ('Retorno', 'Consultas', 'Consulta') THEN 'Clinica'
+            ELSE 'Outros'
+        END"""
+
+# Espelho de data_processing.determinar_hora
+CASE_HORA = """
+        CASE c.Classificacao
+            WHEN 'Cardiologia' THEN 0.75
+            WHEN 'Clinica' THEN
+                CASE
+                    WHEN n.Secao = 'Cardiologia' THEN 1.5
+                    WHEN n.Familia IN ('Consultas', 'Consulta') THEN 1.0
+                    ELSE 0.5
+                END
+            WHEN 'Imagem' THEN CASE WHEN n.Centro = 'RB' THEN 0.5 ELSE 0.67 END
+            WHEN 'Bloco Cirurgico' THEN 3.0
+            ELSE 0.0
+        END"""
+
+def _texto_normalizado(coluna):
+    """Expressão SQL equivalente a str(valor).strip() com nulos como texto vazio."""
+    return f"LTRIM(RTRIM(ISNULL(v.{coluna}, ''))) COLLATE {COLLATION_EXATA}"
+
+def montar_query_agregada(query_base):
+    """
+    Envolve a query de vendas em um GROUP BY por classificação, centro e mês.
+
+    A query base é usada como tabela derivada sem alterações (inclusive o
+    SELECT DISTINCT e os marcadores '?'), de modo que as células agregadas
+    correspondem exatamente às linhas que o pipeline local receberia.
+
+    Args:
+        query_base (str): Query de vendas com as colunas Centro, Secao, Familia e DataCriacao.
+
+    Returns:
+        str: Query que retorna Classificacao, Centro, Ano, Mes, Contagem e Total_Horas.
+    """
+    base = query_base.strip().rstrip(';')
+    return f"""SELECT
+    c.Classificacao,
+    v.Centro COLLATE {COLLATION_EXATA} AS Centro,
+    p.Ano,
+    p.Mes,
+    COUNT_BIG(*) AS Contagem,
+    SUM(CAST(h.hora AS FLOAT)) AS Total_Horas
+FROM (
+{base}
+) AS v
+CROSS APPLY (
+    SELECT
+        {_texto_normalizado('Secao')} AS Secao,
+        {_texto_normalizado('Familia')} AS Familia,
+        {_texto_normalizado('Centro')} AS Centro
+) AS n
+CROSS APPLY (SELECT{CASE_CLASSIFICACAO} AS Classificacao) AS c
+CROSS APPLY (SELECT{CASE_HORA} AS hora) AS h
+CROSS APPLY (
+    -- DataCriacao em texto no formato 'AAAA-MM-DD HH:MM:SS' (CONVERT 120)
+    SELECT CAST(LEFT(v.DataCriacao, 4) AS INT) AS Ano, CAST(SUBSTRING(v.DataCriacao, 6, 2) AS INT) AS Mes
+) AS p
+-- Registros sem centro ou sem data ficam fora das tabelas, como no groupby local
+WHERE v.Centro IS NOT NULL
+  AND v.DataCriacao IS NOT NULL
+GROUP BY c.Classificacao, v.Centro COLLATE {COLLATION_EXATA}, p.Ano, p.Mes"""
+
+def _query_periodo(data_inicio, data_fim=None, caminho_query=None, conn=None):
+    """
+    Renderiza o template de vendas para um período inclusivo.
+
+    Args:
+        data_inicio (str ou date): Data inicial do documento (inclusiva).
+        data_fim (str ou date, opcional): Data final do documento (inclusiva). Padrão: hoje.
+        caminho_query (pathlib.Path ou str, opcional): Template da query de vendas
+            (padrão: querys/templates/gv_vendas.sql).
+        conn (pyodbc.Connection, opcional): Conexão usada para resolver os filtros.
+
+    Returns:
+        tuple: (query, parametros), ou None em caso de erro.
+    """
+    consulta = montar_query_vendas(caminho_query, {'data_inicio': data_inicio, 'data_fim': data_fim}, conn=conn)
+    if consulta is None:
+        return None
+    if not consulta[2]:
+        print("ERRO: A agregação no servidor requer um template com os parâmetros data_inicio e data_fim.")
+        return None
+    return consulta[:2]
+
+def _padronizar_celulas(celulas):
+    """
+    Ajusta os tipos das células agregadas para o formato de agregar_por_classificacao.
+
+    Args:
+        celulas (pandas.DataFrame): Células com as colunas de CHAVES_CELULA, Contagem e Total_Horas.
+
+    Returns:
+        pandas.DataFrame: Células ordenadas, com chaves de texto e Ano/Mes inteiros.
+    """
+    celulas = celulas.copy()
+    for coluna in ('Classificacao', 'Centro'):
+        celulas[coluna] = celulas[coluna].astype(object)
+    celulas['Ano'] = celulas['Ano'].astype('int32')
+    celulas['Mes'] = celulas['Mes'].astype('int32')
+    celulas['Contagem'] = celulas['Contagem'].astype('int64')
+    celulas['Total_Horas'] = celulas['Total_Horas'].astype('float64')
+    return celulas.sort_values(CHAVES_CELULA).reset_index(drop=True)
+
+def _executar(query, parametros, conn=None):
+    """
+    Executa uma query na conexão informada ou em uma conexão do pool compartilhado.
+
+    Args:
+        query (str): Query SQL.
+        parametros (sequence): Valores dos marcadores '?'.
+        conn (pyodbc.Connection, opcional): Conexão a usar.
+
+    Returns:
+        pandas.DataFrame: Resultado da query, ou None em caso de erro.
+    """
+    if conn is not None:
+        return executar_query(conn, query, parametros=parametros)
+    with obter_pool().conexao() as conn_pool:
+        if conn_pool is None:
+            return None
+        return executar_query(conn_pool, query, parametros=parametros)
+
+def buscar_celulas_agregadas(data_inicio='2023-01-01', data_fim=None, caminho_query=None, conn=None):
+    """
+    Executa a query agregada no servidor e retorna as células do relatório.
+
+    Args:
+        data_inicio (str ou date): Data inicial do documento (inclusiva).
+        data_fim (str ou date, opcional): Data final do documento (inclusiva). Padrão: hoje.
+        caminho_query (pathlib.Path ou str, opcional): Template da query de vendas.
+        conn (pyodbc.Connection, opcional): Conexão a usar. Sem ela é usado o pool compartilhado.
+
+    Returns:
+        pandas.DataFrame: Células com as colunas Classificacao, Centro, Ano, Mes, Contagem e
+            Total_Horas, ou None em caso de erro.
+    """
+    consulta = _query_periodo(data_inicio, data_fim, caminho_query, conn)
+    if consulta is None:
+        return None
+    query_base, parametros = consulta
+    celulas = _executar(montar_query_agregada(query_base), parametros, conn)
+    if celulas is None:
+        return None
+    if celulas.empty:
+        return pd.DataFrame(columns=CHAVES_CELULA + ['Contagem', 'Total_Horas'])
+    celulas = _padronizar_celulas(celulas)
+    print(f"Agregação no servidor concluída: {len(celulas)} células, {int(celulas['Contagem'].sum())} registros.")
+    return celulas
+
+def comparar_celulas(celulas_servidor, celulas_locais, tolerancia=TOLERANCIA_HORAS):
+    """
+    Compara as células agregadas no servidor com as calculadas localmente.
+
+    Args:
+        celulas_servidor (pandas.DataFrame): Resultado de buscar_celulas_agregadas.
+        celulas_locais (pandas.DataFrame): Resultado de agregar_por_classificacao.
+        tolerancia (float): Diferença máxima aceita na soma de horas.
+
+    Returns:
+        pandas.DataFrame: Células divergentes (vazio se os resultados forem equivalentes).
+    """
+    colunas = CHAVES_CELULA + ['Contagem', 'Total_Horas']
+    comparacao = _padronizar_celulas(celulas_servidor[colunas]).merge(
+        _padronizar_celulas(celulas_locais[colunas]),
+        on=CHAVES_CELULA, how='outer', suffixes=('_servidor', '_local'), indicator=True
+    )
+    divergente = (
+        (comparacao['_merge'] != 'both')
+        | (comparacao['Contagem_servidor'] != comparacao['Contagem_local'])
+        | ((comparacao['Total_Horas_servidor'] - comparacao['Total_Horas_local']).abs() > tolerancia)
+    )
+    return comparacao[divergente].drop(columns='_merge').reset_index(drop=True)
+
+def verificar_paridade(data_inicio, data_fim=None, caminho_query=None, conn=None, celulas_servidor=None):
+    """
+    Verifica se a agregação no servidor produz as mesmas células que o pipeline
+    local (normalização de datas, classificação, horas e agregação) no mesmo período.
+
+    Args:
+        data_inicio (str ou date): Data inicial do documento (inclusiva).
+        data_fim (str ou date, opcional): Data final do documento (inclusiva). Padrão: hoje.
+        caminho_query (pathlib.Path ou str, opcional): Template da query de vendas.
+        conn (pyodbc.Connection, opcional): Conexão a usar. Sem ela é usado o pool compartilhado.
+        celulas_servidor (pandas.DataFrame, opcional): Células já obtidas por
+            buscar_celulas_agregadas no mesmo período, para não repetir a agregação.
+
+    Returns:
+        pandas.DataFrame: Células divergentes (vazio se houver paridade), ou None em caso de erro.
+    """
+    try:
+        if celulas_servidor is None:
+            celulas_servidor = buscar_celulas_agregadas(data_inicio, data_fim, caminho_query, conn)
+        if celulas_servidor is None:
+            return None
+
+        consulta = _query_periodo(data_inicio, data_fim, caminho_query, conn)
+        if consulta is None:
+            return None
+        df_vendas = _executar(*consulta, conn)
+        if df_vendas is None:
+            return None
+
+        if df_vendas.empty:
+            celulas_locais = pd.DataFrame(columns=CHAVES_CELULA + ['Contagem', 'Total_Horas'])
+        else:
+            df_vendas = preparar_dados(classificar_vendas(normalizar_datas(df_vendas)))
+            celulas_locais = agregar_por_classificacao(df_vendas)
+
+        divergencias = comparar_celulas(celulas_servidor, celulas_locais)
+        if divergencias.empty:
+            print(f"Paridade confirmada: {len(celulas_servidor)} células idênticas entre servidor e pipeline local.")
+        else:
+            print(f"AVISO: {len(divergencias)} células divergentes entre servidor e pipeline local:")
+            print(divergencias.to_string(index=False))
+        return divergencias
+    except Exception as e:
+        print(f"Erro na verificação de paridade: {e}")
+        traceback.print_exc(file=sys.stdout)
+        return None
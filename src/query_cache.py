@@ -0,0 +1,291 @@
+"""
+Módulo de cache local dos resultados de consultas.
+
+O resultado de uma consulta é armazenado em Parquet em output/cache_consultas/,
+identificado pelo hash do texto normalizado da query (sem comentários e com
+espaços compactados) e dos seus parâmetros. Entradas mais antigas que o TTL
+são ignoradas e, quando o espaço total ultrapassa o limite, as entradas usadas
+há mais tempo são removidas.
+
+Quando o resultado também foi gravado como snapshot no diretório de saída, a
+entrada apenas referencia o snapshot, sem uma segunda cópia dos dados. Essas
+entradas não contam no limite de espaço e a limpeza nunca remove o snapshot.
+"""
+
+import re
+import json
+import shutil
+import hashlib
+import pathlib
+from datetime import datetime, timedelta
+import pandas as pd
+import pyarrow.dataset as ds
+
+# Validade padrão de um resultado armazenado
+TTL_PADRAO_HORAS = 12
+
+# Espaço máximo ocupado pelo cache antes da remoção das entradas menos usadas
+LIMITE_PADRAO_BYTES = 1024 ** 3
+
+ARQUIVO_INDICE = "indice.json"
+
+# Valores pequenos reutilizados entre execuções (ex.: listas de Id dos filtros das queries template)
+ARQUIVO_VALORES = "valores.json"
+
+def _diretorio_cache():
+    """
+    Retorna o diretório do cache de consultas.
+
+    Returns:
+        pathlib.Path: Diretório output/cache_consultas.
+    """
+    diretorio = pathlib.Path().resolve() / "output" / "cache_consultas"
+    diretorio.mkdir(parents=True, exist_ok=True)
+    return diretorio
+
+def _carregar_indice():
+    """Lê o índice das entradas do cache."""
+    caminho = _diretorio_cache() / ARQUIVO_INDICE
+    try:
+        return json.loads(caminho.read_text(encoding='utf-8')) if caminho.exists() else {}
+    except ValueError:
+        return {}
+
+def _salvar_indice(indice):
+    """Grava o índice das entradas do cache de forma atômica."""
+    caminho = _diretorio_cache() / ARQUIVO_INDICE
+    temporario = caminho.with_suffix('.tmp')
+    temporario.write_text(json.dumps(indice, indent=2, ensure_ascii=False), encoding='utf-8')
+    temporario.replace(caminho)
+
+def _caminho_entrada(entrada):
+    """Arquivo de uma entrada do índice: cópia no diretório do cache ou snapshot referenciado."""
+    if entrada.get('snapshot'):
+        return pathlib.Path(entrada['arquivo'])
+    return _diretorio_cache() / entrada['arquivo']
+
+def arquivo_do_cache(caminho):
+    """
+    Indica se um arquivo retornado por buscar_no_cache é uma cópia do próprio
+    cache (e não um snapshot referenciado).
+
+    Args:
+        caminho (pathlib.Path): Arquivo retornado por buscar_no_cache.
+
+    Returns:
+        bool: True se o arquivo está no diretório do cache.
+    """
+    return pathlib.Path(caminho).resolve().parent == _diretorio_cache()
+
+def normalizar_query(query):
+    """
+    Normaliza o texto de uma query para que alterações apenas de formatação
+    (comentários, quebras de linha, indentação) não gerem uma nova entrada.
+
+    Args:
+        query (str): Texto da query.
+
+    Returns:
+        str: Query sem comentários e com espaços compactados.
+    """
+    sem_comentarios = re.sub(r'/\*.*?\*/', ' ', query, flags=re.DOTALL)
+    sem_comentarios = re.sub(r'--[^\n]*', ' ', sem_comentarios)
+    return re.sub(r'\s+', ' ', sem_comentarios).strip().rstrip(';').strip()
+
+def chave_consulta(query, parametros=None):
+    """
+    Calcula a chave de cache de uma consulta.
+
+    Args:
+        query (str): Texto da query.
+        parametros (sequence, opcional): Valores dos marcadores '?' da query.
+
+    Returns:
+        str: Hash da query normalizada e dos parâmetros.
+    """
+    conteudo = {
+        'query': normalizar_query(query),
+        'parametros': list(parametros) if parametros else [],
+    }
+    return hashlib.sha256(json.dumps(conteudo, default=str).encode('utf-8')).hexdigest()[:32]
+
+def buscar_no_cache(chave, ttl_horas=TTL_PADRAO_HORAS):
+    """
+    Procura o resultado de uma consulta no cache.
+
+    Args:
+        chave (str): Chave calculada por chave_consulta.
+        ttl_horas (float): Idade máxima do resultado armazenado.
+
+    Returns:
+        pathlib.Path: Arquivo Parquet com o resultado, ou None se não houver entrada válida.
+    """
+    indice = _carregar_indice()
+    entrada = indice.get(chave)
+    if entrada is None:
+        return None
+
+    caminho = _caminho_entrada(entrada)
+    criado_em = datetime.strptime(entrada['criado_em'], '%Y-%m-%d %H:%M:%S')
+    if not caminho.exists() or datetime.now() - criado_em > timedelta(hours=ttl_horas):
+        print(f"Resultado em cache expirado ou ausente (criado em {entrada['criado_em']}).")
+        return None
+
+    entrada['ultimo_uso'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    _salvar_indice(indice)
+    print(f"Resultado encontrado no cache de consultas (criado em {entrada['criado_em']}, "
+          f"{entrada['registros']} registros).")
+    return caminho
+
+def salvar_no_cache(chave, origem, limite_bytes=LIMITE_PADRAO_BYTES, snapshot=False):
+    """
+    Armazena o resultado de uma consulta no cache.
+
+    Args:
+        chave (str): Chave calculada por chave_consulta.
+        origem (pathlib.Path ou pandas.DataFrame): Arquivo Parquet já gravado ou DataFrame.
+        limite_bytes (int): Espaço máximo do cache após a gravação.
+        snapshot (bool): Se True, origem é um snapshot do diretório de saída (arquivo ou
+            dataset), que passa a ser referenciado pela entrada em vez de copiado.
+
+    Returns:
+        pathlib.Path: Arquivo armazenado, ou None em caso de erro.
+    """
+    nome_arquivo = f"{chave}.parquet"
+    copia = _diretorio_cache() / nome_arquivo
+    caminho = pathlib.Path(origem).resolve() if snapshot else copia
+    try:
+        if snapshot:
+            registros = ds.dataset(caminho, format='parquet').count_rows()
+        elif isinstance(origem, pd.DataFrame):
+            origem.to_parquet(caminho, index=False, compression='snappy')
+            registros = len(origem)
+        else:
+            shutil.copyfile(origem, caminho)
+            registros = ds.dataset(caminho, format='parquet').count_rows()
+
+        agora = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        indice = _carregar_indice()
+        indice[chave] = {
+            'arquivo': str(caminho) if snapshot else nome_arquivo,
+            'snapshot': snapshot,
+            'criado_em': agora,
+            'ultimo_uso': agora,
+            'registros': registros,
+            'tamanho': 0 if snapshot else caminho.stat().st_size,
+        }
+        _salvar_indice(indice)
+        if snapshot and copia.exists():
+            # Cópia de uma execução anterior, substituída pela referência ao snapshot
+            copia.unlink()
+        print(f"Resultado armazenado no cache de consultas ({registros} registros).")
+
+        limpar_cache(limite_bytes, preservar=chave)
+        return caminho
+    except Exception as e:
+        print(f"AVISO: Não foi possível armazenar o resultado no cache: {e}")
+        if not snapshot and caminho.exists():
+            caminho.unlink()
+        return None
+
+def vincular_snapshot(chave, caminho_snapshot):
+    """
+    Faz uma entrada existente referenciar um snapshot gravado a partir dela,
+    mantendo a data de criação (e, portanto, o TTL). A cópia no diretório do
+    cache é removida.
+
+    Args:
+        chave (str): Chave calculada por chave_consulta.
+        caminho_snapshot (pathlib.Path): Arquivo ou dataset no diretório de saída.
+    """
+    indice = _carregar_indice()
+    entrada = indice.get(chave)
+    if entrada is None:
+        return
+    anterior = _caminho_entrada(entrada)
+    entrada.update({'arquivo': str(pathlib.Path(caminho_snapshot).resolve()), 'snapshot': True, 'tamanho': 0})
+    _salvar_indice(indice)
+    if arquivo_do_cache(anterior) and anterior.exists():
+        anterior.unlink()
+
+def buscar_valor(chave, ttl_horas=TTL_PADRAO_HORAS):
+    """
+    Procura um valor pequeno (serializável em JSON) armazenado no cache.
+
+    Args:
+        chave (str): Chave do valor (ex.: calculada por chave_consulta).
+        ttl_horas (float): Idade máxima do valor armazenado.
+
+    Returns:
+        object: Valor armazenado, ou None se não houver entrada válida.
+    """
+    caminho = _diretorio_cache() / ARQUIVO_VALORES
+    try:
+        valores = json.loads(caminho.read_text(encoding='utf-8')) if caminho.exists() else {}
+    except ValueError:
+        return None
+    entrada = valores.get(chave)
+    if entrada is None:
+        return None
+    criado_em = datetime.strptime(entrada['criado_em'], '%Y-%m-%d %H:%M:%S')
+    if datetime.now() - criado_em > timedelta(hours=ttl_horas):
+        return None
+    return entrada['valor']
+
+def salvar_valor(chave, valor, ttl_horas=TTL_PADRAO_HORAS):
+    """
+    Armazena um valor pequeno (serializável em JSON) no cache. Entradas
+    expiradas são descartadas na mesma gravação.
+
+    Args:
+        chave (str): Chave do valor.
+        valor (object): Valor armazenado.
+        ttl_horas (float): Idade a partir da qual as entradas existentes são descartadas.
+    """
+    caminho = _diretorio_cache() / ARQUIVO_VALORES
+    try:
+        valores = json.loads(caminho.read_text(encoding='utf-8')) if caminho.exists() else {}
+    except ValueError:
+        valores = {}
+    limite = (datetime.now() - timedelta(hours=ttl_horas)).strftime('%Y-%m-%d %H:%M:%S')
+    valores = {nome: entrada for nome, entrada in valores.items() if entrada['criado_em'] >= limite}
+    valores[chave] = {'valor': valor, 'criado_em': datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+    try:
+        temporario = caminho.with_suffix('.tmp')
+        temporario.write_text(json.dumps(valores, indent=2, ensure_ascii=False), encoding='utf-8')
+        temporario.replace(caminho)
+    except OSError as e:
+        print(f"AVISO: Não foi possível armazenar o valor no cache: {e}")
+
+def limpar_cache(limite_bytes=LIMITE_PADRAO_BYTES, preservar=None):
+    """
+    Remove as entradas usadas há mais tempo até que o espaço total fique abaixo do limite.
+
+    Args:
+        limite_bytes (int): Espaço máximo ocupado pelo cache.
+        preservar (str, opcional): Chave que nunca deve ser removida.
+
+    Returns:
+        int: Quantidade de bytes liberados.
+    """
+    indice = _carregar_indice()
+    diretorio = _diretorio_cache()
+
+    # Entradas cujo arquivo não existe mais saem do índice
+    indice = {chave: entrada for chave, entrada in indice.items() if _caminho_entrada(entrada).exists()}
+
+    total = sum(entrada['tamanho'] for entrada in indice.values())
+    liberado = 0
+    for chave, entrada in sorted(indice.items(), key=lambda item: item[1]['ultimo_uso']):
+        if total <= limite_bytes:
+            break
+        if chave == preservar or entrada.get('snapshot'):
+            continue
+        (diretorio / entrada['arquivo']).unlink()
+        del indice[chave]
+        total -= entrada['tamanho']
+        liberado += entrada['tamanho']
+        print(f"Entrada removida do cache por limite de espaço: {chave} ({entrada['tamanho'] / (1024*1024):.2f} MB)")
+
+    _salvar_indice(indice)
+    return liberado
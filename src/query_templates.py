@@ -0,0 +1,299 @@
+"""
+Módulo de templates de query com parâmetros nomeados.
+
+Um arquivo .sql declara os seus parâmetros em comentários no formato
+
+    -- @param nome tipo [= padrão]
+
+e os usa no texto como :nome. Na renderização cada ocorrência é trocada por
+marcadores '?' e os valores são ligados como parâmetros ODBC em
+cursor.execute(sql, parametros), de modo que o SQL Server reutiliza o mesmo
+plano para qualquer período ou filtro. Listas são expandidas em '?, ?, ...'
+com o tamanho arredondado para a próxima potência de 2 (repetindo o último
+valor), limitando a quantidade de planos distintos.
+
+Os filtros por descrição (ex.: LIKE '%Cardiologia%') são resolvidos uma única
+vez em listas de Id por resolver_ids e passados como parâmetros.
+"""
+
+import re
+from datetime import date, timedelta
+import pandas as pd
+
+from src import query_cache
+
+# Tipos aceitos nas declarações de parâmetros
+TIPOS_PARAMETRO = ('data', 'data_hora', 'inteiro', 'texto', 'lista_inteiros', 'lista_textos')
+
+# Limite de parâmetros por comando do SQL Server
+MAX_PARAMETROS_ODBC = 2100
+
+# Filtros padrão do relatório de vendas (os mesmos das subconsultas LIKE de querys/new/gv_vendas.sql)
+SECOES_PADRAO = ('Cardiologia', 'Imagem')
+FAMILIAS_PADRAO = ('Cirurgia', 'Retorno', 'Consulta')
+
+# Tabelas cujas descrições podem ser resolvidas em listas de Id
+TABELAS_DESCRICAO = {
+    'secao': 'GV_SeccaoProduto',
+    'familia': 'GV_FamiliaProduto',
+}
+
+_PADRAO_DECLARACAO = re.compile(r'^\s*--\s*@param\s+(\w+)\s+(\w+)(?:\s*=\s*(.*?))?\s*$', re.MULTILINE)
+
+# Literais de texto e comentários são preservados; :nome fora deles é um parâmetro
+_PADRAO_TOKENS = re.compile(r"'(?:[^']|'')*'|--[^\n]*|/\*.*?\*/|(?<![:\w]):([A-Za-z_]\w*)", re.DOTALL)
+
+# Listas de Id já resolvidas nesta sessão, por (tabela, padrões)
+_ids_resolvidos = {}
+
+def declaracoes_parametros(texto):
+    """
+    Lê as declarações de parâmetros de um template.
+
+    Args:
+        texto (str): Conteúdo do arquivo SQL.
+
+    Returns:
+        dict: Declarações por nome, com 'tipo' e 'padrao' (None se obrigatório).
+    """
+    declaracoes = {}
+    for nome, tipo, padrao in _PADRAO_DECLARACAO.findall(texto):
+        if tipo not in TIPOS_PARAMETRO:
+            raise ValueError(f"Tipo de parâmetro desconhecido em @param {nome}: {tipo}")
+        declaracoes[nome] = {'tipo': tipo, 'padrao': padrao or None}
+    return declaracoes
+
+def eh_template(texto):
+    """
+    Indica se o texto de uma query declara parâmetros nomeados.
+
+    Args:
+        texto (str): Conteúdo do arquivo SQL.
+
+    Returns:
+        bool: True se houver ao menos uma declaração @param.
+    """
+    return _PADRAO_DECLARACAO.search(texto) is not None
+
+def _converter_valor(nome, tipo, valor):
+    """
+    Converte o valor de um parâmetro para o tipo declarado.
+
+    Args:
+        nome (str): Nome do parâmetro (usado nas mensagens de erro).
+        tipo (str): Tipo declarado.
+        valor: Valor informado ou padrão em texto.
+
+    Returns:
+        object ou list: Valor pronto para ser ligado (lista para os tipos lista_*).
+    """
+    if tipo.startswith('lista_'):
+        if valor is None:
+            return []
+        if isinstance(valor, str):
+            valor = [item.strip() for item in valor.split(',') if item.strip()]
+        conversor = int if tipo == 'lista_inteiros' else str
+        return [conversor(item) for item in valor]
+
+    if valor is None:
+        return None
+    if tipo == 'data':
+        if valor == 'hoje':
+            return date.today()
+        if valor == 'amanha':
+            return date.today() + timedelta(days=1)
+        return pd.Timestamp(valor).date()
+    if tipo == 'data_hora':
+        return pd.Timestamp(valor).to_pydatetime()
+    if tipo == 'inteiro':
+        return int(valor)
+    return str(valor)
+
+def _marcadores_lista(valores):
+    """
+    Expande uma lista em marcadores com tamanho arredondado para a próxima potência de 2.
+
+    Args:
+        valores (list): Valores da lista.
+
+    Returns:
+        tuple: (texto com os marcadores, valores completados).
+    """
+    if not valores:
+        # IN (NULL) não corresponde a nenhuma linha
+        return '?', [None]
+    tamanho = 1
+    while tamanho < len(valores):
+        tamanho *= 2
+    completados = list(valores) + [valores[-1]] * (tamanho - len(valores))
+    return ', '.join('?' * tamanho), completados
+
+def renderizar_template(texto, valores=None):
+    """
+    Converte um template com parâmetros nomeados em uma query com marcadores '?'.
+
+    Args:
+        texto (str): Conteúdo do arquivo SQL.
+        valores (dict, opcional): Valores por nome de parâmetro. Parâmetros
+            declarados com padrão podem ser omitidos.
+
+    Returns:
+        tuple: (query com marcadores '?', tupla de parâmetros na ordem dos marcadores).
+    """
+    valores = dict(valores or {})
+    declaracoes = declaracoes_parametros(texto)
+
+    desconhecidos = set(valores) - set(declaracoes)
+    if desconhecidos:
+        raise ValueError(f"Parâmetros não declarados no template: {', '.join(sorted(desconhecidos))}")
+
+    convertidos = {}
+    for nome, declaracao in declaracoes.items():
+        valor = valores.get(nome, declaracao['padrao'])
+        convertido = _converter_valor(nome, declaracao['tipo'], valor)
+        if convertido is None:
+            raise ValueError(f"Parâmetro obrigatório não informado: {nome}")
+        convertidos[nome] = convertido
+
+    parametros = []
+
+    def substituir(correspondencia):
+        nome = correspondencia.group(1)
+        if nome is None:
+            return correspondencia.group(0)
+        if nome not in convertidos:
+            raise ValueError(f"Parâmetro :{nome} usado sem declaração @param")
+        valor = convertidos[nome]
+        if isinstance(valor, list):
+            marcadores, completados = _marcadores_lista(valor)
+            parametros.extend(completados)
+            return marcadores
+        parametros.append(valor)
+        return '?'
+
+    query = _PADRAO_TOKENS.sub(substituir, texto)
+    if len(parametros) > MAX_PARAMETROS_ODBC:
+        raise ValueError(f"A query renderizada tem {len(parametros)} parâmetros "
+                         f"(máximo do SQL Server: {MAX_PARAMETROS_ODBC}).")
+    return query, tuple(parametros)
+
+def _chave_ids(tabela, padroes):
+    """Chave das listas de Id resolvidas no cache de consultas."""
+    return query_cache.chave_consulta(f"ids {TABELAS_DESCRICAO[tabela]}", list(padroes))
+
+def ids_em_cache(tabela, padroes):
+    """
+    Retorna a lista de Id já resolvida nesta sessão ou guardada no cache de consultas.
+
+    Args:
+        tabela (str): Chave de TABELAS_DESCRICAO ('secao' ou 'familia').
+        padroes (sequence): Trechos procurados na descrição.
+
+    Returns:
+        list: Id encontrados, ou None se a lista precisa ser resolvida no banco.
+    """
+    chave = (tabela, tuple(padroes))
+    if chave in _ids_resolvidos:
+        return _ids_resolvidos[chave]
+    if not padroes:
+        return []
+    ids = query_cache.buscar_valor(_chave_ids(tabela, padroes))
+    if ids is not None:
+        _ids_resolvidos[chave] = ids
+    return ids
+
+def filtros_em_cache(nomes=None, secoes=SECOES_PADRAO, familias=FAMILIAS_PADRAO, **_):
+    """
+    Indica se os filtros de seção e família do template já estão resolvidos,
+    de modo que valores_template_vendas não precisa de conexão.
+
+    Args:
+        nomes (iterable, opcional): Parâmetros declarados no template.
+        secoes (sequence): Trechos das descrições de seção incluídas.
+        familias (sequence): Trechos das descrições de família incluídas.
+        **_: Demais filtros de valores_template_vendas (ignorados).
+
+    Returns:
+        bool: True se nenhuma lista de Id precisa ser consultada no banco.
+    """
+    nomes = set(nomes) if nomes is not None else None
+    for parametro, tabela, padroes in (('ids_secao', 'secao', secoes), ('ids_familia', 'familia', familias)):
+        if (nomes is None or parametro in nomes) and ids_em_cache(tabela, padroes) is None:
+            return False
+    return True
+
+def resolver_ids(conn, tabela, padroes):
+    """
+    Resolve descrições em uma lista de Id, uma única vez por sessão. O
+    resultado também é guardado no cache de consultas, para que execuções
+    seguintes dentro do TTL não precisem acessar o banco.
+
+    Equivale à subconsulta SELECT Id FROM tabela WHERE Descricao LIKE '%padrão%' OR ...,
+    com os padrões também ligados como parâmetros.
+
+    Args:
+        conn (pyodbc.Connection): Conexão com o banco de dados.
+        tabela (str): Chave de TABELAS_DESCRICAO ('secao' ou 'familia').
+        padroes (sequence): Trechos procurados na descrição.
+
+    Returns:
+        list: Id encontrados, em ordem crescente.
+    """
+    ids = ids_em_cache(tabela, padroes)
+    if ids is not None:
+        return ids
+
+    condicoes = ' OR '.join(['Descricao LIKE ?'] * len(padroes))
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT Id FROM {TABELAS_DESCRICAO[tabela]} WHERE {condicoes} ORDER BY Id",
+                   [f"%{padrao}%" for padrao in padroes])
+    ids = [linha[0] for linha in cursor.fetchall()]
+    cursor.close()
+
+    print(f"Filtro de {tabela} resolvido: {', '.join(padroes)} -> {len(ids)} Id")
+    _ids_resolvidos[(tabela, tuple(padroes))] = ids
+    query_cache.salvar_valor(_chave_ids(tabela, padroes), ids)
+    return ids
+
+def valores_template_vendas(conn, data_inicio=None, data_fim=None, centros=None,
+                            secoes=SECOES_PADRAO, familias=FAMILIAS_PADRAO, criado_desde=None, nomes=None):
+    """
+    Monta os valores dos parâmetros de querys/templates/gv_vendas.sql.
+
+    Args:
+        conn (pyodbc.Connection): Conexão usada para resolver seções e famílias
+            (pode ser None quando filtros_em_cache retorna True).
+        data_inicio (str ou date, opcional): Data inicial do documento (inclusiva). Padrão do template.
+        data_fim (str ou date, opcional): Data final do documento (inclusiva). Padrão: hoje.
+        centros (list, opcional): Siglas dos centros. Padrão: todos.
+        secoes (sequence): Trechos das descrições de seção incluídas.
+        familias (sequence): Trechos das descrições de família incluídas.
+        criado_desde (str ou datetime, opcional): Corte da extração incremental; apenas
+            documentos com DataCriacao a partir dele. Padrão: todos.
+        nomes (iterable, opcional): Parâmetros declarados no template; os demais
+            não são montados (nem resolvidos no banco).
+
+    Returns:
+        dict: Valores por nome de parâmetro.
+    """
+    valores = {}
+    if data_inicio is not None:
+        valores['data_inicio'] = data_inicio
+    if data_fim is not None:
+        # O template usa fim exclusivo
+        valores['data_fim'] = pd.Timestamp(data_fim).date() + timedelta(days=1)
+    valores['filtrar_centros'] = 1 if centros else 0
+    valores['centros'] = list(centros) if centros else []
+    valores['filtrar_criacao'] = 0 if criado_desde is None else 1
+    if criado_desde is not None:
+        valores['criado_desde'] = criado_desde
+
+    nomes = set(nomes) if nomes is not None else None
+    if nomes is None or 'ids_secao' in nomes:
+        valores['ids_secao'] = resolver_ids(conn, 'secao', secoes)
+    if nomes is None or 'ids_familia' in nomes:
+        valores['ids_familia'] = resolver_ids(conn, 'familia', familias)
+
+    if nomes is not None:
+        valores = {nome: valor for nome, valor in valores.items() if nome in nomes}
+    return valores
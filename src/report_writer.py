@@ -0,0 +1,168 @@
+"""
+Módulo responsável pela escrita dos relatórios em Excel.
+
+O motor padrão grava as linhas em disco à medida que são escritas (memória
+constante): XlsxWriter em modo 'constant_memory' quando instalado, ou
+openpyxl em modo 'write_only'. O motor 'openpyxl' mantém o comportamento
+anterior via pandas.ExcelWriter, montando a planilha inteira em memória.
+"""
+
+import pathlib
+import pandas as pd
+
+from src.metrics import etapa, progresso
+
+MOTORES_EXCEL = ('auto', 'xlsxwriter', 'openpyxl_streaming', 'openpyxl')
+
+# Quantidade de linhas convertidas por vez antes de serem enviadas ao arquivo
+LINHAS_POR_BLOCO = 10000
+
+def resolver_motor_excel(motor='auto'):
+    """
+    Determina o motor de escrita a ser usado.
+
+    Args:
+        motor (str): Um de MOTORES_EXCEL. 'auto' escolhe XlsxWriter quando
+            instalado e openpyxl em modo streaming caso contrário.
+
+    Returns:
+        str: Nome do motor efetivamente usado.
+    """
+    if motor not in MOTORES_EXCEL:
+        print(f"AVISO: Motor de Excel desconhecido '{motor}'. Usando 'auto'.")
+        motor = 'auto'
+
+    if motor in ('auto', 'xlsxwriter'):
+        try:
+            import xlsxwriter  # noqa: F401
+            return 'xlsxwriter'
+        except ImportError:
+            if motor == 'xlsxwriter':
+                print("AVISO: XlsxWriter não está instalado. Usando openpyxl em modo streaming.")
+            return 'openpyxl_streaming'
+    return motor
+
+def _linhas(df):
+    """
+    Gera as linhas de um DataFrame como tuplas de valores Python, em blocos.
+    Valores ausentes são convertidos para None (célula vazia).
+
+    Args:
+        df (pandas.DataFrame): Tabela a ser escrita.
+
+    Yields:
+        tuple: Valores de cada linha.
+    """
+    for inicio in range(0, len(df), LINHAS_POR_BLOCO):
+        bloco = df.iloc[inicio:inicio + LINHAS_POR_BLOCO]
+        bloco = bloco.astype(object).where(bloco.notna(), None)
+        yield from bloco.itertuples(index=False, name=None)
+
+def _remover_parcial(arquivo):
+    """Remove o arquivo Excel gravado parcialmente após uma falha."""
+    caminho = pathlib.Path(arquivo)
+    if caminho.exists():
+        caminho.unlink()
+        print(f"AVISO: Arquivo parcial removido após falha na escrita: {caminho}")
+
+def _salvar(gravar, arquivo):
+    """
+    Executa a gravação final do arquivo Excel, removendo o arquivo parcial em caso de erro.
+
+    Args:
+        gravar (callable): Função que grava o arquivo (save/close do workbook).
+        arquivo (str ou pathlib.Path): Caminho do arquivo Excel.
+    """
+    try:
+        gravar()
+    except Exception:
+        _remover_parcial(arquivo)
+        raise
+
+def _escrever_xlsxwriter(arquivo, abas):
+    """Escreve as abas com XlsxWriter em modo de memória constante."""
+    import xlsxwriter
+
+    workbook = xlsxwriter.Workbook(arquivo, {
+        'constant_memory': True,
+        'nan_inf_to_errors': True,
+        'remove_timezone': True,
+        'default_date_format': 'yyyy-mm-dd hh:mm:ss',
+    })
+    try:
+        formato_cabecalho = workbook.add_format({'bold': True, 'border': 1, 'align': 'center'})
+        for nome_aba, tabela in abas:
+            worksheet = workbook.add_worksheet(nome_aba)
+            # No modo constant_memory as linhas devem ser escritas em ordem
+            worksheet.write_row(0, 0, [str(coluna) for coluna in tabela.columns], formato_cabecalho)
+            for indice, linha in enumerate(_linhas(tabela), start=1):
+                worksheet.write_row(indice, 0, linha)
+            progresso(f"Aba '{nome_aba}' escrita ({len(tabela)} linhas).")
+    except Exception:
+        # O fechamento libera os arquivos temporários; o arquivo parcial é descartado
+        # e o erro original é propagado
+        try:
+            workbook.close()
+        except Exception:
+            pass
+        _remover_parcial(arquivo)
+        raise
+    _salvar(workbook.close, arquivo)
+
+def _escrever_openpyxl_streaming(arquivo, abas):
+    """Escreve as abas com openpyxl em modo write_only (streaming)."""
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+
+    workbook = Workbook(write_only=True)
+    try:
+        for nome_aba, tabela in abas:
+            worksheet = workbook.create_sheet(title=nome_aba)
+            cabecalho = []
+            for coluna in tabela.columns:
+                celula = WriteOnlyCell(worksheet, value=str(coluna))
+                celula.font = Font(bold=True)
+                cabecalho.append(celula)
+            worksheet.append(cabecalho)
+            for linha in _linhas(tabela):
+                worksheet.append(linha)
+            progresso(f"Aba '{nome_aba}' escrita ({len(tabela)} linhas).")
+    except Exception:
+        # Nada foi gravado no destino: apenas os arquivos temporários das abas são liberados
+        for worksheet in workbook.worksheets:
+            worksheet.close()
+        raise
+    # O arquivo só é gravado depois que todas as abas foram escritas com sucesso
+    _salvar(lambda: workbook.save(arquivo), arquivo)
+
+def _escrever_openpyxl(arquivo, abas):
+    """Escreve as abas com pandas.ExcelWriter/openpyxl (planilha montada em memória)."""
+    with pd.ExcelWriter(arquivo, engine='openpyxl') as writer:
+        for nome_aba, tabela in abas:
+            tabela.to_excel(writer, sheet_name=nome_aba, index=False)
+            progresso(f"Aba '{nome_aba}' escrita ({len(tabela)} linhas).")
+
+@etapa('gravar_excel')
+def escrever_excel(arquivo, abas, motor='auto'):
+    """
+    Escreve uma sequência de tabelas em abas de um arquivo Excel.
+
+    Args:
+        arquivo (str ou pathlib.Path): Caminho do arquivo Excel.
+        abas (iterable): Pares (nome_aba, DataFrame), escritos na ordem recebida.
+        motor (str): Motor de escrita (ver MOTORES_EXCEL).
+
+    Returns:
+        str: Nome do motor usado.
+    """
+    motor = resolver_motor_excel(motor)
+    print(f"Motor de escrita do Excel: {motor}")
+
+    if motor == 'xlsxwriter':
+        _escrever_xlsxwriter(arquivo, abas)
+    elif motor == 'openpyxl_streaming':
+        _escrever_openpyxl_streaming(arquivo, abas)
+    else:
+        _escrever_openpyxl(arquivo, abas)
+    return motor
@@ -0,0 +1,306 @@
+"""
+Módulo de compactação e retenção dos snapshots Parquet do diretório de saída.
+
+Snapshots com o mesmo escopo (mesma query e mesmos filtros além do período),
+o mesmo esquema e as mesmas partições são mesclados em um único arquivo: percorrendo do mais
+recente para o mais antigo, cada snapshot contribui apenas com os registros
+cuja DataCriacao está fora dos períodos dos snapshots mais recentes, de modo
+que cada período vem da extração mais recente que o cobre (registros
+editados ou cancelados não se repetem). O arquivo é regravado com grupos de
+linhas de tamanho uniforme e os snapshots mesclados são removidos. Snapshots
+sem escopo registrado nunca são mesclados.
+
+Em seguida a política de retenção remove os snapshots além dos N mais
+recentes e/ou criados há mais de N dias. O arquivo compactado recebe a data
+de criação do snapshot mais recente do grupo, e é por ela que o grupo é
+classificado na retenção; um grupo fora da retenção é removido sem ser
+mesclado. O snapshot base da extração
+incremental nunca é removido (quando mesclado, o estado passa a apontar para
+o arquivo compactado).
+
+Por padrão apenas o plano é exibido; os arquivos só são mesclados e
+removidos com --executar. Uso (a partir da raiz do projeto):
+
+    python -m src.snapshot_compaction --manter 5 --manter-dias 30
+    python -m src.snapshot_compaction --manter 5 --manter-dias 30 --executar
+"""
+
+import sys
+import shutil
+import pathlib
+import argparse
+import traceback
+from collections import defaultdict
+from datetime import datetime, timedelta
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from src.data_access import particionamento_hive
+from src.incremental import carregar_estado, salvar_estado
+from src.snapshot_manifest import (
+    COLUNA_DATA,
+    listar_snapshots,
+    reconstruir_manifesto,
+    registrar_snapshot,
+    remover_do_manifesto,
+)
+
+# Registros por grupo de linhas do arquivo compactado (o mesmo lote do dataset particionado)
+LINHAS_POR_GRUPO_PADRAO = 250000
+
+_BYTES_POR_MB = 1024 * 1024
+
+def _chave_grupo(registro):
+    """
+    Snapshots mesclados juntos: mesmo escopo de query, mesmo esquema e mesmas partições.
+    Sem escopo conhecido (ex.: arquivos registrados pela reconstrução do manifesto)
+    não há como saber se dois snapshots vêm dos mesmos filtros: retorna None e o
+    snapshot fica apenas sujeito à retenção.
+    """
+    if not registro.get('escopo'):
+        return None
+    return registro['escopo'], registro.get('hash_esquema'), tuple(registro.get('particoes') or ())
+
+def _base_incremental(diretorio):
+    """Nome do snapshot usado como base da extração incremental neste diretório (None se não houver)."""
+    estado = carregar_estado()
+    if estado is None:
+        return None, None
+    caminho = pathlib.Path(estado['caminho_parquet']).resolve()
+    return (caminho.name if caminho.parent == diretorio.resolve() else None), estado
+
+def planejar_compactacao(diretorio=None, manter=None, manter_dias=None, compactar=True):
+    """
+    Define os snapshots mesclados e os removidos pela retenção, sem alterar o diretório.
+
+    Args:
+        diretorio (pathlib.Path ou str, opcional): Diretório dos snapshots (padrão: output).
+        manter (int, opcional): Quantidade de snapshots mantidos (mais recentes).
+        manter_dias (int, opcional): Idade máxima, em dias, dos snapshots mantidos.
+        compactar (bool): Se False, apenas a retenção é aplicada.
+
+    Returns:
+        dict: 'snapshots' (todos), 'grupos' (listas de snapshots a mesclar, mais recente
+            primeiro), 'remover' (snapshots removidos pela retenção) e 'protegido'
+            (base da extração incremental).
+    """
+    diretorio = pathlib.Path(diretorio or pathlib.Path().resolve() / "output")
+    snapshots = listar_snapshots(diretorio)
+    protegido, _ = _base_incremental(diretorio)
+
+    grupos = []
+    if compactar:
+        por_chave = defaultdict(list)
+        for registro in snapshots:
+            chave = _chave_grupo(registro)
+            if chave is not None:
+                por_chave[chave].append(registro)
+        grupos = [lista for lista in por_chave.values() if len(lista) > 1]
+    mesclados = {registro['nome'] for lista in grupos for registro in lista}
+
+    # Cada grupo mesclado conta como um snapshot na retenção, com a data de criação do
+    # mais recente do grupo (a mesma registrada para o arquivo compactado)
+    restantes = list(grupos) + [[registro] for registro in snapshots if registro['nome'] not in mesclados]
+    restantes.sort(key=lambda lista: (lista[0].get('criado_em') or '', lista[0]['nome']), reverse=True)
+    limite_data = (datetime.now() - timedelta(days=manter_dias)).strftime('%Y-%m-%d %H:%M:%S') if manter_dias else None
+    remover = []
+    for posicao, lista in enumerate(restantes):
+        if protegido in {registro['nome'] for registro in lista}:
+            continue
+        if (manter is not None and posicao >= manter) or \
+                (limite_data is not None and (lista[0].get('criado_em') or '') < limite_data):
+            # Um grupo fora da retenção não é mesclado: os snapshots de origem são removidos
+            remover.extend(lista)
+            if len(lista) > 1:
+                grupos.remove(lista)
+
+    return {'snapshots': snapshots, 'grupos': grupos, 'remover': remover, 'protegido': protegido}
+
+def _limite_coluna(texto, tipo):
+    """Converte um limite do manifesto ('AAAA-MM-DD HH:MM:SS') para o tipo da coluna de data."""
+    if pa.types.is_timestamp(tipo) or pa.types.is_date(tipo):
+        return pa.scalar(datetime.fromisoformat(texto)).cast(tipo)
+    return texto
+
+def mesclar_snapshots(grupo, caminho_saida, linhas_por_grupo=LINHAS_POR_GRUPO_PADRAO):
+    """
+    Mescla os snapshots de um grupo em um arquivo Parquet, lote a lote.
+
+    Args:
+        grupo (list): Registros do manifesto, do mais recente para o mais antigo.
+        caminho_saida (pathlib.Path): Arquivo gravado.
+        linhas_por_grupo (int): Registros por grupo de linhas do arquivo gravado.
+
+    Returns:
+        int: Total de registros gravados.
+    """
+    # O esquema do dataset inclui as colunas de partição (ausentes nos arquivos de dados)
+    primeiro = grupo[0]['caminho']
+    esquema = ds.dataset(primeiro, format='parquet', partitioning=particionamento_hive(primeiro)).schema
+    tipo_data = esquema.field(COLUNA_DATA).type if COLUNA_DATA in esquema.names else None
+
+    cobertos = []
+    pendentes, linhas_pendentes, total = [], 0, 0
+    with pq.ParquetWriter(caminho_saida, esquema, compression='snappy') as writer:
+        for registro in grupo:
+            filtro = None
+            for minimo, maximo in cobertos:
+                # Comparações com DataCriacao nula resultam nulas: esses registros vêm só do mais recente
+                condicao = ~((ds.field(COLUNA_DATA) >= _limite_coluna(minimo, tipo_data)) &
+                             (ds.field(COLUNA_DATA) <= _limite_coluna(maximo, tipo_data)))
+                filtro = condicao if filtro is None else filtro & condicao
+
+            dataset = ds.dataset(registro['caminho'], format='parquet',
+                                 partitioning=particionamento_hive(registro['caminho']))
+            mantidos = 0
+            for lote in dataset.to_batches(columns=esquema.names, filter=filtro):
+                if lote.num_rows == 0:
+                    continue
+                pendentes.append(pa.Table.from_batches([lote]).cast(esquema))
+                linhas_pendentes += lote.num_rows
+                mantidos += lote.num_rows
+                while linhas_pendentes >= linhas_por_grupo:
+                    tabela = pa.concat_tables(pendentes)
+                    writer.write_table(tabela.slice(0, linhas_por_grupo), row_group_size=linhas_por_grupo)
+                    restante = tabela.slice(linhas_por_grupo)
+                    pendentes, linhas_pendentes = [restante], restante.num_rows
+            total += mantidos
+            print(f"  {registro['nome']}: {mantidos} de {registro.get('linhas')} registros mantidos")
+
+            if tipo_data is not None and registro.get('data_criacao_min') and registro.get('data_criacao_max'):
+                cobertos.append((registro['data_criacao_min'], registro['data_criacao_max']))
+
+        if linhas_pendentes:
+            writer.write_table(pa.concat_tables(pendentes), row_group_size=linhas_por_grupo)
+    return total
+
+def _colunas_ausentes(grupo, caminho_saida):
+    """Lista as colunas dos snapshots de um grupo que não estão no arquivo mesclado."""
+    colunas_saida = set(pq.read_schema(caminho_saida).names)
+    ausentes = []
+    for registro in grupo:
+        esquema = ds.dataset(registro['caminho'], format='parquet',
+                             partitioning=particionamento_hive(registro['caminho'])).schema
+        ausentes += [f"{registro['nome']}:{nome}" for nome in esquema.names if nome not in colunas_saida]
+    return ausentes
+
+def _remover_snapshot(registro):
+    """Apaga um snapshot (arquivo ou diretório) e o retira do manifesto."""
+    caminho = registro['caminho']
+    if caminho.is_dir():
+        shutil.rmtree(caminho)
+    elif caminho.exists():
+        caminho.unlink()
+    remover_do_manifesto(caminho)
+
+def compactar_snapshots(diretorio=None, manter=None, manter_dias=None, compactar=True,
+                        linhas_por_grupo=LINHAS_POR_GRUPO_PADRAO, simular=True):
+    """
+    Mescla os snapshots sobrepostos e aplica a política de retenção.
+
+    Args:
+        diretorio (pathlib.Path ou str, opcional): Diretório dos snapshots (padrão: output).
+        manter (int, opcional): Quantidade de snapshots mantidos (mais recentes).
+        manter_dias (int, opcional): Idade máxima, em dias, dos snapshots mantidos.
+        compactar (bool): Se False, apenas a retenção é aplicada.
+        linhas_por_grupo (int): Registros por grupo de linhas dos arquivos compactados.
+        simular (bool): Se True (padrão), apenas informa o que seria feito.
+
+    Returns:
+        dict: Resumo com 'compactados', 'removidos', 'bytes_antes', 'bytes_depois' e
+            'bytes_liberados', ou None em caso de erro.
+    """
+    diretorio = pathlib.Path(diretorio or pathlib.Path().resolve() / "output")
+    try:
+        # Registra snapshots ainda fora do manifesto e descarta registros de arquivos apagados
+        reconstruir_manifesto(diretorio)
+        plano = planejar_compactacao(diretorio, manter, manter_dias, compactar)
+        bytes_antes = sum(registro.get('bytes', 0) for registro in plano['snapshots'])
+
+        for grupo in plano['grupos']:
+            print(f"Mesclar {len(grupo)} snapshots ({sum(r.get('bytes', 0) for r in grupo) / _BYTES_POR_MB:.1f} MB): "
+                  f"{', '.join(registro['nome'] for registro in grupo)}")
+        for registro in plano['remover']:
+            print(f"Remover pela retenção: {registro['nome']} (criado em {registro.get('criado_em')}, "
+                  f"{registro.get('bytes', 0) / _BYTES_POR_MB:.1f} MB)")
+        if not plano['grupos'] and not plano['remover']:
+            print("Nenhum snapshot a compactar ou remover.")
+        if simular:
+            removidos = sum(registro.get('bytes', 0) for registro in plano['remover'])
+            if plano['grupos'] or plano['remover']:
+                print(f"Simulação: a retenção liberaria {removidos / _BYTES_POR_MB:.1f} MB, além do ganho da compactação. "
+                      f"Use --executar para aplicar.")
+            return {'compactados': [], 'removidos': [], 'bytes_antes': bytes_antes,
+                    'bytes_depois': bytes_antes, 'bytes_liberados': 0}
+
+        _, estado = _base_incremental(diretorio)
+        compactados = []
+        for grupo in plano['grupos']:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+            caminho_final = diretorio / f"dados_vendas_{timestamp}.parquet"
+            temporario = diretorio / f"tmp_dados_vendas_{timestamp}.parquet"
+            print(f"\nCompactando em {caminho_final.name}...")
+            try:
+                total = mesclar_snapshots(grupo, temporario, linhas_por_grupo)
+                ausentes = _colunas_ausentes(grupo, temporario)
+                if ausentes:
+                    # Os snapshots de origem só são removidos se o arquivo mesclado tiver todas as colunas
+                    print(f"ERRO: Colunas ausentes no arquivo mesclado ({', '.join(ausentes)}). "
+                          f"Os snapshots do grupo foram mantidos.")
+                    continue
+                temporario.replace(caminho_final)
+            finally:
+                if temporario.exists():
+                    temporario.unlink()
+
+            mais_recente = grupo[0]
+            # A data de criação é a do snapshot mais recente do grupo: o arquivo compactado
+            # não contém dados mais novos e mantém a sua posição na listagem
+            registrar_snapshot(caminho_final, forma_extracao='compactacao',
+                               hash_query=mais_recente.get('hash_query'), escopo=mais_recente.get('escopo'),
+                               origens=[registro['nome'] for registro in grupo],
+                               criado_em=mais_recente.get('criado_em') or datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+            for registro in grupo:
+                _remover_snapshot(registro)
+            if plano['protegido'] in {registro['nome'] for registro in grupo}:
+                # A base incremental foi mesclada: o arquivo compactado contém os mesmos períodos
+                salvar_estado(caminho_final, pd.Timestamp(estado['marca_dagua']))
+            compactados.append(caminho_final)
+            print(f"Snapshot compactado: {total} registros")
+
+        for registro in plano['remover']:
+            _remover_snapshot(registro)
+
+        bytes_depois = sum(registro.get('bytes', 0) for registro in listar_snapshots(diretorio))
+        liberados = bytes_antes - bytes_depois
+        print(f"\nSnapshots: {bytes_antes / _BYTES_POR_MB:.1f} MB antes, {bytes_depois / _BYTES_POR_MB:.1f} MB depois "
+              f"({liberados / _BYTES_POR_MB:.1f} MB liberados)")
+        return {'compactados': compactados, 'removidos': [registro['nome'] for registro in plano['remover']],
+                'bytes_antes': bytes_antes, 'bytes_depois': bytes_depois, 'bytes_liberados': liberados}
+    except Exception as e:
+        print(f"Erro na compactação dos snapshots: {e}")
+        traceback.print_exc(file=sys.stdout)
+        return None
+
+def main(argumentos=None):
+    """Executa a compactação e a retenção pela linha de comando."""
+    parser = argparse.ArgumentParser(description="Compacta os snapshots Parquet de output/ e aplica a retenção.")
+    parser.add_argument('--diretorio', type=pathlib.Path, default=pathlib.Path().resolve() / "output",
+                        help="Diretório dos snapshots.")
+    parser.add_argument('--manter', type=int, help="Quantidade de snapshots mantidos (mais recentes).")
+    parser.add_argument('--manter-dias', type=int, help="Remove os snapshots criados há mais de N dias.")
+    parser.add_argument('--sem-compactacao', action='store_true', help="Aplica apenas a retenção.")
+    parser.add_argument('--linhas-por-grupo', type=int, default=LINHAS_POR_GRUPO_PADRAO,
+                        help="Registros por grupo de linhas dos arquivos compactados.")
+    parser.add_argument('--executar', action='store_true',
+                        help="Mescla e remove os snapshots (sem esta opção, apenas informa o que seria feito).")
+    args = parser.parse_args(argumentos)
+
+    resumo = compactar_snapshots(args.diretorio, args.manter, args.manter_dias, not args.sem_compactacao,
+                                 args.linhas_por_grupo, simular=not args.executar)
+    return 0 if resumo is not None else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,413 @@
+"""
+Módulo do manifesto dos snapshots Parquet do diretório de saída.
+
+Cada snapshot gravado (arquivo dados_vendas_<timestamp>.parquet ou dataset
+particionado) é registrado em output/manifesto_snapshots.json com a quantidade
+de registros, a menor e a maior DataCriacao, o hash da query de origem, o
+esquema e o tamanho em disco. Os valores são obtidos dos metadados do Parquet
+(rodapé e estatísticas dos grupos de linhas), sem ler os dados.
+
+A listagem e a seleção de snapshots leem apenas o manifesto; o carregamento
+de um snapshot registrado verifica se o esquema mudou em relação ao registro
+ou ao snapshot anterior da mesma query (ver verificar_esquema).
+"""
+
+import json
+import hashlib
+import pathlib
+import threading
+from datetime import date, datetime
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from src.checkpoint import arquivos_snapshot
+from src.query_cache import normalizar_query, chave_consulta
+
+NOME_MANIFESTO = "manifesto_snapshots.json"
+
+VERSAO_MANIFESTO = 1
+
+# Coluna usada para o período coberto por cada snapshot
+COLUNA_DATA = 'DataCriacao'
+
+# Colunas sem as quais o pipeline não consegue classificar nem agrupar por período
+COLUNAS_OBRIGATORIAS = ('DataCriacao', 'Secao', 'Familia')
+
+_trava_manifesto = threading.Lock()
+
+def _diretorio_padrao():
+    """Retorna o diretório de saída onde os snapshots são gravados."""
+    return pathlib.Path().resolve() / "output"
+
+def _caminho_manifesto(diretorio=None):
+    """
+    Retorna o caminho do manifesto de um diretório de snapshots.
+
+    Args:
+        diretorio (pathlib.Path ou str, opcional): Diretório dos snapshots (padrão: output).
+
+    Returns:
+        pathlib.Path: Caminho do manifesto.
+    """
+    return pathlib.Path(diretorio or _diretorio_padrao()) / NOME_MANIFESTO
+
+def carregar_manifesto(diretorio=None):
+    """
+    Lê o manifesto de um diretório de snapshots.
+
+    Args:
+        diretorio (pathlib.Path ou str, opcional): Diretório dos snapshots (padrão: output).
+
+    Returns:
+        dict: Manifesto com 'versao' e 'snapshots' (nome -> registro), ou None se não existir.
+    """
+    caminho = _caminho_manifesto(diretorio)
+    if not caminho.exists():
+        return None
+    try:
+        manifesto = json.loads(caminho.read_text(encoding='utf-8'))
+        if manifesto.get('versao') != VERSAO_MANIFESTO:
+            print(f"AVISO: Versão do manifesto de snapshots não suportada: {manifesto.get('versao')}")
+            return None
+        return manifesto
+    except ValueError as e:
+        print(f"AVISO: Manifesto de snapshots inválido ({caminho}): {e}")
+        return None
+
+def _salvar_manifesto(diretorio, manifesto):
+    """Grava o manifesto de forma atômica."""
+    caminho = _caminho_manifesto(diretorio)
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    temporario = caminho.with_suffix('.tmp')
+    temporario.write_text(json.dumps(manifesto, indent=2, ensure_ascii=False), encoding='utf-8')
+    temporario.replace(caminho)
+
+def _atualizar_manifesto(diretorio, alteracao):
+    """
+    Aplica uma alteração ao manifesto e o grava, sem intercalar com outras
+    atualizações do mesmo processo.
+
+    Args:
+        diretorio (pathlib.Path): Diretório dos snapshots.
+        alteracao (callable): Função que recebe o dicionário de snapshots e o altera.
+    """
+    with _trava_manifesto:
+        manifesto = carregar_manifesto(diretorio) or {'versao': VERSAO_MANIFESTO, 'snapshots': {}}
+        alteracao(manifesto['snapshots'])
+        _salvar_manifesto(diretorio, manifesto)
+
+def _texto_data(valor):
+    """Converte um limite de DataCriacao (texto, data ou timestamp) em 'AAAA-MM-DD HH:MM:SS'."""
+    if valor is None:
+        return None
+    if isinstance(valor, bytes):
+        valor = valor.decode('utf-8', errors='replace')
+    if isinstance(valor, (datetime, date)):
+        return valor.strftime('%Y-%m-%d %H:%M:%S')
+    return str(valor)[:19] or None
+
+def _limites_data(arquivo):
+    """
+    Retorna a menor e a maior DataCriacao de um arquivo Parquet pelas
+    estatísticas dos grupos de linhas; sem estatísticas, lê apenas a coluna.
+
+    Args:
+        arquivo (pyarrow.parquet.ParquetFile): Arquivo aberto.
+
+    Returns:
+        tuple: (menor, maior) como texto, ou (None, None) sem a coluna ou sem registros.
+    """
+    metadados = arquivo.metadata
+    colunas = [metadados.schema.column(indice).path for indice in range(metadados.num_columns)]
+    if COLUNA_DATA not in colunas or metadados.num_rows == 0:
+        return None, None
+
+    indice = colunas.index(COLUNA_DATA)
+    minimos, maximos = [], []
+    for grupo in range(metadados.num_row_groups):
+        coluna = metadados.row_group(grupo).column(indice)
+        if coluna.num_values == 0:
+            continue
+        estatisticas = coluna.statistics
+        if estatisticas is None or not estatisticas.has_min_max:
+            limites = pc.min_max(arquivo.read(columns=[COLUNA_DATA]).column(COLUNA_DATA))
+            return _texto_data(limites['min'].as_py()), _texto_data(limites['max'].as_py())
+        minimos.append(_texto_data(estatisticas.min))
+        maximos.append(_texto_data(estatisticas.max))
+    minimos = [valor for valor in minimos if valor]
+    maximos = [valor for valor in maximos if valor]
+    return (min(minimos) if minimos else None), (max(maximos) if maximos else None)
+
+def _hash_query(query):
+    """Hash do texto normalizado da query (identifica a query independentemente dos parâmetros)."""
+    return hashlib.sha256(normalizar_query(query).encode('utf-8')).hexdigest()[:16]
+
+def escopo_query(query, parametros=None):
+    """
+    Hash da query e dos parâmetros que não são datas: snapshots com o mesmo
+    escopo diferem apenas no período extraído (ex.: mesmos centros e seções).
+    """
+    filtros = [valor for valor in (parametros or []) if not isinstance(valor, (date, datetime))]
+    conteudo = json.dumps({'query': normalizar_query(query), 'filtros': filtros}, default=str)
+    return hashlib.sha256(conteudo.encode('utf-8')).hexdigest()[:16]
+
+def descrever_snapshot(caminho_snapshot):
+    """
+    Monta o registro de um snapshot a partir dos metadados Parquet.
+
+    Args:
+        caminho_snapshot (pathlib.Path ou str): Arquivo Parquet ou diretório de dataset.
+
+    Returns:
+        dict: Registro com registros, período, esquema, tamanho e data de modificação.
+    """
+    caminho = pathlib.Path(caminho_snapshot)
+    arquivos = arquivos_snapshot(caminho)
+    linhas = 0
+    minimos, maximos = [], []
+    esquema = None
+    for caminho_arquivo in arquivos:
+        arquivo = pq.ParquetFile(caminho_arquivo)
+        linhas += arquivo.metadata.num_rows
+        minimo, maximo = _limites_data(arquivo)
+        if minimo:
+            minimos.append(minimo)
+        if maximo:
+            maximos.append(maximo)
+        if esquema is None:
+            esquema = {campo.name: str(campo.type) for campo in arquivo.schema_arrow}
+
+    particoes = []
+    if caminho.is_dir() and arquivos:
+        particoes = [parte.split('=', 1)[0] for parte in arquivos[0].relative_to(caminho).parts[:-1] if '=' in parte]
+
+    esquema = esquema or {}
+    return {
+        'tipo': 'dataset' if caminho.is_dir() else 'arquivo',
+        'linhas': linhas,
+        'data_criacao_min': min(minimos) if minimos else None,
+        'data_criacao_max': max(maximos) if maximos else None,
+        'esquema': esquema,
+        'hash_esquema': hashlib.sha256(json.dumps(esquema).encode('utf-8')).hexdigest()[:16],
+        'particoes': particoes,
+        'arquivos': len(arquivos),
+        'bytes': sum(arquivo.stat().st_size for arquivo in arquivos),
+        'modificado_em': max((arquivo.stat().st_mtime for arquivo in arquivos), default=caminho.stat().st_mtime),
+    }
+
+def registrar_snapshot(caminho_snapshot, query=None, parametros=None, forma_extracao=None, **detalhes):
+    """
+    Registra (ou atualiza) um snapshot no manifesto do seu diretório.
+
+    Args:
+        caminho_snapshot (pathlib.Path ou str): Arquivo Parquet ou diretório de dataset.
+        query (str, opcional): Query que gerou os dados.
+        parametros (sequence, opcional): Parâmetros da query.
+        forma_extracao (str, opcional): Forma de extração (ex.: 'streaming', 'cache', 'incremental', 'paralela').
+        **detalhes: Informações adicionais guardadas no registro.
+
+    Returns:
+        dict: Registro gravado, ou None em caso de erro (o snapshot continua válido).
+    """
+    try:
+        caminho = pathlib.Path(caminho_snapshot).resolve()
+        registro = {'criado_em': datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 'forma_extracao': forma_extracao,
+                    'hash_query': _hash_query(query) if query else None,
+                    'chave_consulta': chave_consulta(query, parametros) if query else None,
+                    'escopo': escopo_query(query, parametros) if query else None,
+                    **descrever_snapshot(caminho), **detalhes}
+
+        def alterar(snapshots):
+            anterior = snapshots.get(caminho.name)
+            if anterior is not None:
+                # Registro refeito (ex.: arquivo alterado): preserva a origem e a data de criação
+                for chave in ('criado_em', 'forma_extracao', 'hash_query', 'chave_consulta', 'escopo'):
+                    if registro.get(chave) is None or chave == 'criado_em':
+                        registro[chave] = anterior.get(chave, registro.get(chave))
+            snapshots[caminho.name] = registro
+
+        _atualizar_manifesto(caminho.parent, alterar)
+        return registro
+    except Exception as e:
+        print(f"AVISO: Não foi possível registrar o snapshot {caminho_snapshot} no manifesto: {e}")
+        return None
+
+def anotar_snapshot(caminho_snapshot, **detalhes):
+    """
+    Acrescenta informações ao registro de um snapshot já registrado (ex.: a
+    impressão digital das tabelas de origem). Um novo registro do mesmo
+    snapshot (arquivo alterado) descarta as anotações.
+
+    Args:
+        caminho_snapshot (pathlib.Path ou str): Arquivo Parquet ou diretório de dataset.
+        **detalhes: Informações guardadas no registro.
+
+    Returns:
+        bool: True se o snapshot estava registrado e foi anotado.
+    """
+    caminho = pathlib.Path(caminho_snapshot).resolve()
+    anotado = []
+
+    def alterar(snapshots):
+        registro = snapshots.get(caminho.name)
+        if registro is not None:
+            registro.update(detalhes)
+            anotado.append(caminho.name)
+
+    try:
+        _atualizar_manifesto(caminho.parent, alterar)
+    except Exception as e:
+        print(f"AVISO: Não foi possível anotar o snapshot {caminho.name} no manifesto: {e}")
+    return bool(anotado)
+
+def remover_do_manifesto(caminho_snapshot):
+    """
+    Remove o registro de um snapshot do manifesto do seu diretório.
+
+    Args:
+        caminho_snapshot (pathlib.Path ou str): Arquivo Parquet ou diretório de dataset.
+    """
+    caminho = pathlib.Path(caminho_snapshot).resolve()
+    _atualizar_manifesto(caminho.parent, lambda snapshots: snapshots.pop(caminho.name, None))
+
+def _eh_snapshot(caminho):
+    """Indica se um caminho do diretório de saída é um snapshot de vendas (não temporário)."""
+    if caminho.name.startswith('tmp_'):
+        return False
+    if caminho.is_file():
+        return caminho.suffix == '.parquet'
+    return caminho.name.startswith('dados_vendas_') and next(caminho.rglob('*.parquet'), None) is not None
+
+def reconstruir_manifesto(diretorio=None):
+    """
+    Registra os snapshots do diretório ainda ausentes no manifesto e remove os
+    registros de snapshots apagados. Usado na primeira listagem (snapshots
+    gravados antes do manifesto) ou após alterações manuais no diretório.
+
+    Args:
+        diretorio (pathlib.Path ou str, opcional): Diretório dos snapshots (padrão: output).
+
+    Returns:
+        dict: Manifesto atualizado.
+    """
+    diretorio = pathlib.Path(diretorio or _diretorio_padrao())
+    caminhos = [caminho for caminho in diretorio.glob("*") if _eh_snapshot(caminho)] if diretorio.exists() else []
+    existentes = {caminho.name for caminho in caminhos}
+    registrados = (carregar_manifesto(diretorio) or {}).get('snapshots', {})
+
+    novos = {}
+    for caminho in caminhos:
+        if caminho.name in registrados:
+            continue
+        print(f"Registrando snapshot no manifesto: {caminho.name}")
+        try:
+            registro = descrever_snapshot(caminho)
+        except Exception as e:
+            print(f"AVISO: Snapshot ignorado ({caminho.name}): {e}")
+            continue
+        registro['criado_em'] = datetime.fromtimestamp(registro['modificado_em']).strftime('%Y-%m-%d %H:%M:%S')
+        novos[caminho.name] = {'forma_extracao': None, 'hash_query': None, 'chave_consulta': None, 'escopo': None,
+                               **registro}
+
+    def alterar(snapshots):
+        for nome in [nome for nome in snapshots if nome not in existentes]:
+            del snapshots[nome]
+        snapshots.update(novos)
+
+    _atualizar_manifesto(diretorio, alterar)
+    return carregar_manifesto(diretorio)
+
+def _cobre_periodo(registro, data_inicio=None, data_fim=None):
+    """Indica se o período do snapshot contém o intervalo informado (datas 'AAAA-MM-DD')."""
+    if data_inicio is None and data_fim is None:
+        return True
+    minimo, maximo = registro.get('data_criacao_min'), registro.get('data_criacao_max')
+    if not minimo or not maximo:
+        return False
+    inicio = str(data_inicio or data_fim)[:10]
+    fim = str(data_fim or data_inicio)[:10]
+    return minimo[:10] <= inicio and maximo[:10] >= fim
+
+def listar_snapshots(diretorio=None, data_inicio=None, data_fim=None, hash_query=None):
+    """
+    Lista os snapshots registrados no manifesto, do mais recente para o mais
+    antigo, sem acessar os arquivos. Sem manifesto, ele é montado a partir do
+    diretório (uma única vez).
+
+    Args:
+        diretorio (pathlib.Path ou str, opcional): Diretório dos snapshots (padrão: output).
+        data_inicio (str ou date, opcional): Lista apenas snapshots cuja DataCriacao cobre esta data...
+        data_fim (str ou date, opcional): ...até esta data.
+        hash_query (str, opcional): Lista apenas snapshots gerados pela query com este hash.
+
+    Returns:
+        list: Registros do manifesto, cada um com 'nome' e 'caminho'.
+    """
+    diretorio = pathlib.Path(diretorio or _diretorio_padrao())
+    manifesto = carregar_manifesto(diretorio)
+    if manifesto is None:
+        manifesto = reconstruir_manifesto(diretorio) or {'snapshots': {}}
+
+    snapshots = [
+        {**registro, 'nome': nome, 'caminho': diretorio / nome}
+        for nome, registro in manifesto['snapshots'].items()
+        if _cobre_periodo(registro, data_inicio, data_fim)
+        and (hash_query is None or registro.get('hash_query') == hash_query)
+    ]
+    snapshots.sort(key=lambda registro: (registro.get('criado_em') or '', registro['nome']), reverse=True)
+    return snapshots
+
+def _diferencas_esquema(atual, anterior):
+    """Descreve as colunas ausentes, novas e com tipo alterado em relação ao esquema anterior."""
+    diferencas = [f"coluna ausente '{nome}'" for nome in anterior if nome not in atual]
+    diferencas += [f"nova coluna '{nome}'" for nome in atual if nome not in anterior]
+    diferencas += [f"'{nome}' de {anterior[nome]} para {tipo}" for nome, tipo in atual.items()
+                   if nome in anterior and anterior[nome] != tipo]
+    return diferencas
+
+def verificar_esquema(caminho_snapshot):
+    """
+    Verifica o esquema de um snapshot registrado antes do carregamento.
+
+    Snapshots alterados desde o registro são registrados novamente (com aviso).
+    O carregamento é recusado quando faltam colunas obrigatórias; mudanças em
+    relação ao snapshot anterior da mesma query geram um aviso. Snapshots fora
+    do manifesto (ex.: arquivos temporários e do cache) não são verificados.
+
+    Args:
+        caminho_snapshot (pathlib.Path ou str): Arquivo Parquet ou diretório de dataset.
+
+    Returns:
+        bool: False se o snapshot não deve ser carregado.
+    """
+    caminho = pathlib.Path(caminho_snapshot).resolve()
+    manifesto = carregar_manifesto(caminho.parent)
+    registro = manifesto['snapshots'].get(caminho.name) if manifesto else None
+    if registro is None:
+        return True
+
+    arquivos = arquivos_snapshot(caminho)
+    tamanho = sum(arquivo.stat().st_size for arquivo in arquivos)
+    modificado_em = max((arquivo.stat().st_mtime for arquivo in arquivos), default=None)
+    if tamanho != registro.get('bytes') or modificado_em != registro.get('modificado_em'):
+        print(f"AVISO: O snapshot {caminho.name} foi alterado depois de registrado. Atualizando o manifesto...")
+        hash_anterior = registro.get('hash_esquema')
+        registro = registrar_snapshot(caminho) or registro
+        if registro.get('hash_esquema') != hash_anterior:
+            print(f"AVISO: O esquema de {caminho.name} mudou desde o registro.")
+
+    colunas = set(registro.get('esquema', {})) | set(registro.get('particoes', []))
+    ausentes = [coluna for coluna in COLUNAS_OBRIGATORIAS if coluna not in colunas]
+    if ausentes:
+        print(f"ERRO: O snapshot {caminho.name} não possui as colunas obrigatórias: {', '.join(ausentes)}")
+        return False
+
+    if registro.get('hash_query'):
+        anteriores = [outro for outro in listar_snapshots(caminho.parent, hash_query=registro['hash_query'])
+                      if outro['nome'] != caminho.name and (outro.get('criado_em') or '') < (registro.get('criado_em') or '')]
+        if anteriores and anteriores[0].get('hash_esquema') != registro.get('hash_esquema'):
+            diferencas = _diferencas_esquema(registro.get('esquema', {}), anteriores[0].get('esquema', {}))
+            if diferencas:
+                print(f"AVISO: Esquema de {caminho.name} diferente do snapshot anterior da mesma query "
+                      f"({anteriores[0]['nome']}): {'; '.join(diferencas)}")
+    return True
@@ -0,0 +1,33 @@
+"""
+Fixtures compartilhadas pelos testes.
+
+Os testes de extração usam o banco SQLite local (benchmarks/banco_local.py)
+no lugar do SQL Server e gravam as saídas em um diretório temporário.
+"""
+
+import pytest
+
+@pytest.fixture(scope='session')
+def caminho_banco(tmp_path_factory):
+    """Banco local com poucas vendas sintéticas, criado uma vez por sessão."""
+    pytest.importorskip('pyodbc')
+    from benchmarks.banco_local import criar_banco_local
+
+    caminho = tmp_path_factory.mktemp('banco') / 'banco.sqlite'
+    criar_banco_local(caminho, linhas=3000)
+    return caminho
+
+@pytest.fixture
+def diretorio_trabalho(tmp_path, monkeypatch):
+    """Diretório de trabalho temporário: output/ e o cache de consultas ficam nele."""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+@pytest.fixture
+def banco_local(caminho_banco, diretorio_trabalho):
+    """Redireciona o pool compartilhado de data_access para o banco local."""
+    from benchmarks.banco_local import usar_banco_local
+
+    pool = usar_banco_local(caminho_banco)
+    yield caminho_banco
+    pool.fechar()
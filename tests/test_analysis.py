@@ -0,0 +1,61 @@
+"""
+Paridade das tabelas por classificação com a montagem original
+(groupby por classificação, rótulos de período por apply e pivot_table).
+
+Execução (a partir da raiz do projeto): python -m pytest -q
+"""
+
+import pandas as pd
+import pytest
+
+from benchmarks.dados_sinteticos import gerar_vendas_sinteticas
+from src.analysis import criar_tabelas_por_cluster, formatar_tabela_pivot
+from src.data_processing import classificar_vendas, preparar_dados
+from src.date_normalization import normalizar_datas
+
+@pytest.fixture(scope='module')
+def vendas():
+    df = gerar_vendas_sinteticas(20000, semente=11)
+    return preparar_dados(classificar_vendas(normalizar_datas(df)))
+
+def _detalhada_original(agregado):
+    tabela = agregado.sort_values(['Ano', 'Mes', 'Centro']).reset_index(drop=True)
+    tabela['Periodo'] = tabela['Ano'].apply(lambda x: str(int(x))) + '-' + tabela['Mes'].apply(lambda x: str(int(x)).zfill(2))
+    return tabela
+
+def _pivot_original(tabela, valor_col):
+    pivot = tabela.pivot_table(index='Centro', columns='Periodo', values=valor_col,
+                               aggfunc='sum', fill_value=0).reset_index()
+    return pivot[['Centro'] + sorted(coluna for coluna in pivot.columns if coluna != 'Centro')]
+
+def test_tabelas_iguais_a_montagem_original(vendas):
+    tabelas = criar_tabelas_por_cluster(vendas)
+    assert sorted(tabelas) == sorted(vendas['Classificacao'].unique())
+
+    for classificacao, grupo in vendas.groupby('Classificacao', observed=True):
+        celulas = grupo.groupby(['Centro', 'Ano', 'Mes'], observed=True)
+        contagem = celulas.size().reset_index(name='Contagem')
+        horas = celulas['hora'].sum().reset_index(name='Total_Horas')
+        casos = (('contagem', 'contagem_detalhada', contagem, 'Contagem'),
+                 ('horas', 'horas_detalhadas', horas, 'Total_Horas'))
+        for chave, chave_detalhada, agregado, valor_col in casos:
+            agregado['Centro'] = agregado['Centro'].astype(object)
+            esperado = _detalhada_original(agregado)
+            detalhada = tabelas[classificacao][chave_detalhada]
+
+            assert list(detalhada.columns) == ['Centro', 'Ano', 'Mes', valor_col, 'Periodo']
+            pd.testing.assert_frame_equal(detalhada.reset_index(drop=True), esperado,
+                                          check_dtype=False, check_exact=False)
+
+            pivot = tabelas[classificacao][chave]
+            pivot_esperado = _pivot_original(esperado, valor_col)
+            assert list(pivot.columns) == list(pivot_esperado.columns)
+            pd.testing.assert_frame_equal(pivot.reset_index(drop=True), pivot_esperado,
+                                          check_dtype=False, check_exact=False, check_names=False)
+
+def test_pivot_sem_ano_e_mes_usa_pivot_table():
+    tabela = pd.DataFrame({'Centro': ['RB', 'SP', 'RB'], 'Periodo': ['2024-02', '2024-01', '2024-01'],
+                           'Contagem': [1, 2, 3]})
+    pivot = formatar_tabela_pivot(tabela, 'Contagem')
+    assert list(pivot.columns) == ['Centro', '2024-01', '2024-02']
+    assert pivot.set_index('Centro').loc['RB'].tolist() == [3, 1]
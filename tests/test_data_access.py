@@ -0,0 +1,35 @@
+"""
+Carregamento de snapshots gravados com colunas decimal128.
+
+Execução (a partir da raiz do projeto): python -m pytest -q
+"""
+
+from decimal import Decimal
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+pytest.importorskip('pyodbc')
+
+from src.data_access import aplicar_esquema_vendas, carregar_do_parquet
+
+VALORES = [Decimal('1.2345'), Decimal('-0.0001'), None, Decimal('123456789.9999'), Decimal('0.1')]
+
+def test_decimal_convertido_no_arrow_igual_ao_pandas(diretorio_trabalho):
+    tabela = pa.table({
+        'Centro': ['RB', 'SP', None, 'RB', 'BL'],
+        'Quantidade': pa.array([Decimal('1.500'), Decimal('0.333'), None, Decimal('2'), Decimal('10')],
+                               pa.decimal128(19, 3)),
+        'ValorVenda': pa.array(VALORES, pa.decimal128(19, 4)),
+        'ValorTotal': pa.array(VALORES, pa.decimal128(19, 4)),
+    })
+    caminho = diretorio_trabalho / "snapshot_decimal.parquet"
+    pq.write_table(tabela, caminho)
+
+    esperado = aplicar_esquema_vendas(tabela.to_pandas())
+    resultado = carregar_do_parquet(caminho)
+
+    pd.testing.assert_frame_equal(resultado, esperado)
+    assert resultado['ValorVenda'].tolist()[:2] == [1.2345, -0.0001]
@@ -0,0 +1,89 @@
+"""
+Paridade das regras de classificação e de horas aplicadas por chave
+(aplicar_regra_por_chave) com a aplicação linha a linha de
+determinar_classificacao e determinar_hora.
+
+Execução (a partir da raiz do projeto): python -m pytest -q
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.dados_sinteticos import gerar_vendas_sinteticas
+from src.data_processing import (
+    aplicar_regra_por_chave,
+    classificar_vendas,
+    determinar_classificacao,
+    determinar_hora,
+    preparar_dados,
+)
+
+# Valores nulos e com espaços nas extremidades, que as regras normalizam
+CASOS_ESPECIAIS = [
+    (None, 'Consulta', 'RB'),
+    ('Cardiologia', None, 'SP'),
+    (None, None, None),
+    (np.nan, 'Cirurgia', 'BL'),
+    (' Cardiologia', 'Ecocardiograma', 'SJ'),
+    ('Cardiologia ', ' Consulta ', 'RB'),
+    ('  Imagem  ', 'Raio X', ' RB'),
+    ('Imagem', 'Ultrassonografia', 'RB '),
+    ('Imagem', 'Ultrassonografia', None),
+    ('Clinica Medica', 'Consultas ', 'CT'),
+    ('Clinica Medica', ' Retorno', None),
+    ('', '', ''),
+    ('cardiologia', 'consulta', 'rb'),
+]
+
+@pytest.fixture(scope='module')
+def vendas():
+    """Vendas sintéticas com os casos especiais sobrescritos nas primeiras linhas."""
+    df = gerar_vendas_sinteticas(20000, semente=7)
+    for posicao, (secao, familia, centro) in enumerate(CASOS_ESPECIAIS * 50):
+        df.loc[posicao, ['Secao', 'Familia', 'Centro']] = [secao, familia, centro]
+    return df
+
+def _classificacao_linha_a_linha(df):
+    return df.apply(lambda linha: determinar_classificacao(linha['Secao'], linha['Familia']), axis=1)
+
+def _hora_linha_a_linha(df):
+    return df.apply(lambda linha: determinar_hora(linha['Classificacao'], linha['Secao'],
+                                                  linha['Familia'], linha.get('Centro')), axis=1)
+
+def test_classificacao_igual_linha_a_linha(vendas):
+    esperado = _classificacao_linha_a_linha(vendas)
+    resultado = classificar_vendas(vendas.copy())
+
+    assert resultado['Classificacao'].tolist() == esperado.tolist()
+
+def test_hora_igual_linha_a_linha(vendas):
+    classificado = classificar_vendas(vendas.copy())
+    esperado = _hora_linha_a_linha(classificado)
+    resultado = preparar_dados(classificado)
+
+    assert resultado['hora'].dtype == np.float64
+    np.testing.assert_array_equal(resultado['hora'].to_numpy(), esperado.to_numpy(dtype=np.float64))
+
+def test_hora_sem_coluna_centro(vendas):
+    classificado = classificar_vendas(vendas.drop(columns=['Centro']))
+    esperado = _hora_linha_a_linha(classificado)
+    resultado = preparar_dados(classificado)
+
+    np.testing.assert_array_equal(resultado['hora'].to_numpy(), esperado.to_numpy(dtype=np.float64))
+
+def test_regra_recebe_valores_brutos():
+    df = pd.DataFrame({'Secao': ['Imagem', None, ' Imagem', 'Imagem'],
+                       'Familia': ['Raio X', 'Raio X', 'Raio X', None]})
+    chamadas = []
+
+    def regra(secao, familia, centro):
+        chamadas.append((secao, familia, centro))
+        return f"{secao}|{familia}"
+
+    resultado = aplicar_regra_por_chave(df, ['Secao', 'Familia', 'Centro'], regra)
+
+    # Uma chamada por combinação distinta; coluna ausente é passada como None
+    assert len(chamadas) == 4
+    assert all(centro is None for _, _, centro in chamadas)
+    assert resultado.tolist() == ['Imagem|Raio X', 'nan|Raio X', ' Imagem|Raio X', 'Imagem|nan']
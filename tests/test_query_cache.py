@@ -0,0 +1,51 @@
+"""
+Reutilização dos resultados do cache de consultas sem gravar novos snapshots.
+
+Execução (a partir da raiz do projeto): python -m pytest -q
+"""
+
+import pathlib
+
+import pytest
+
+pytest.importorskip('pyodbc')
+
+from src.data_access import buscar_dados_vendas
+from src.snapshot_manifest import listar_snapshots
+
+CAMINHO_TEMPLATE_VENDAS = pathlib.Path(__file__).resolve().parents[1] / "querys" / "templates" / "gv_vendas.sql"
+
+def _arquivos_saida(diretorio):
+    """Snapshots e arquivos do cache de consultas gravados no diretório de saída."""
+    return sorted(str(caminho.relative_to(diretorio)) for caminho in (diretorio / "output").rglob('*.parquet'))
+
+def _nomes_snapshots():
+    return sorted(registro['nome'] for registro in listar_snapshots())
+
+def test_acerto_no_cache_retorna_o_snapshot_existente(banco_local, diretorio_trabalho):
+    df_extraido, caminho_extraido = buscar_dados_vendas(caminho_query=CAMINHO_TEMPLATE_VENDAS, streaming=True)
+    snapshots = _nomes_snapshots()
+    arquivos = _arquivos_saida(diretorio_trabalho)
+
+    # No mesmo segundo da extração: o snapshot existente não pode ser sobrescrito
+    for _ in range(2):
+        df_cache, caminho_cache = buscar_dados_vendas(caminho_query=CAMINHO_TEMPLATE_VENDAS)
+        assert caminho_cache == caminho_extraido
+        assert len(df_cache) == len(df_extraido)
+
+    assert _nomes_snapshots() == snapshots == [caminho_extraido.name]
+    # Nenhuma cópia dos dados no cache de consultas
+    assert _arquivos_saida(diretorio_trabalho) == arquivos == [f"output/{caminho_extraido.name}"]
+
+def test_acerto_sem_snapshot_grava_um_unico_snapshot(banco_local, diretorio_trabalho):
+    df_extraido = buscar_dados_vendas(caminho_query=CAMINHO_TEMPLATE_VENDAS, salvar_parquet=False)
+    assert _nomes_snapshots() == []
+
+    _, caminho_primeiro = buscar_dados_vendas(caminho_query=CAMINHO_TEMPLATE_VENDAS)
+    snapshots = _nomes_snapshots()
+    df_cache, caminho_segundo = buscar_dados_vendas(caminho_query=CAMINHO_TEMPLATE_VENDAS)
+
+    assert caminho_segundo == caminho_primeiro
+    assert _nomes_snapshots() == snapshots == [caminho_primeiro.name]
+    assert len(df_cache) == len(df_extraido)
+    assert _arquivos_saida(diretorio_trabalho) == [f"output/{caminho_primeiro.name}"]
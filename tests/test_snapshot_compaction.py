@@ -0,0 +1,62 @@
+"""
+Ordem dos snapshots compactados na listagem e na política de retenção.
+
+Execução (a partir da raiz do projeto): python -m pytest -q
+"""
+
+import pandas as pd
+import pytest
+
+pytest.importorskip('pyodbc')
+
+from src.snapshot_compaction import compactar_snapshots
+from src.snapshot_manifest import anotar_snapshot, listar_snapshots, registrar_snapshot
+
+QUERY_VENDAS = "SELECT Centro, DataCriacao, ValorVenda FROM vendas WHERE Data >= ?"
+QUERY_OUTRA = "SELECT Centro, DataCriacao, ValorVenda FROM vendas WHERE Centro = 'RB' AND Data >= ?"
+
+def _gravar_snapshot(diretorio, nome, query, criado_em, datas):
+    """Grava e registra um snapshot com a data de criação informada."""
+    caminho = diretorio / f"{nome}.parquet"
+    pd.DataFrame({
+        'Centro': ['RB'] * len(datas),
+        'DataCriacao': datas,
+        'ValorVenda': [10.0] * len(datas),
+    }).to_parquet(caminho, index=False)
+    registrar_snapshot(caminho, query, [pd.Timestamp('2026-01-01').date()], 'streaming')
+    anotar_snapshot(caminho, criado_em=criado_em)
+    return caminho
+
+@pytest.fixture
+def snapshots(diretorio_trabalho):
+    """Dois snapshots do mesmo escopo e um snapshot mais recente de outro escopo."""
+    diretorio = diretorio_trabalho / "output"
+    diretorio.mkdir()
+    _gravar_snapshot(diretorio, 'dados_vendas_20260110_100000', QUERY_VENDAS, '2026-01-10 10:00:00',
+                     ['2026-01-05 08:00:00', '2026-01-06 09:00:00'])
+    _gravar_snapshot(diretorio, 'dados_vendas_20260210_100000', QUERY_VENDAS, '2026-02-10 10:00:00',
+                     ['2026-02-05 08:00:00'])
+    _gravar_snapshot(diretorio, 'dados_vendas_20260301_100000', QUERY_OUTRA, '2026-03-01 10:00:00',
+                     ['2026-02-20 08:00:00'])
+    return diretorio
+
+def test_compactado_mantem_a_data_do_mais_recente_do_grupo(snapshots):
+    resumo = compactar_snapshots(snapshots, manter=2, simular=False)
+
+    assert len(resumo['compactados']) == 1
+    assert resumo['removidos'] == []
+    listados = listar_snapshots(snapshots)
+    # O snapshot mais recente (não mesclado) continua sendo o primeiro da listagem
+    assert [registro['nome'] for registro in listados] == [
+        'dados_vendas_20260301_100000.parquet', resumo['compactados'][0].name]
+    assert listados[1]['criado_em'] == '2026-02-10 10:00:00'
+    assert listados[1]['linhas'] == 3
+
+def test_retencao_classifica_o_grupo_pela_data_do_mais_recente(snapshots):
+    resumo = compactar_snapshots(snapshots, manter=1, simular=False)
+
+    # O grupo é o segundo mais recente: fica fora da retenção e não é mesclado
+    assert resumo['compactados'] == []
+    assert sorted(resumo['removidos']) == ['dados_vendas_20260110_100000.parquet',
+                                           'dados_vendas_20260210_100000.parquet']
+    assert [registro['nome'] for registro in listar_snapshots(snapshots)] == ['dados_vendas_20260301_100000.parquet']